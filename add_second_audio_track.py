@@ -30,22 +30,24 @@ if __name__ == "__main__":
 
 	mezzanine = Path(args.input)
 	mezzanine_out = Path(str(mezzanine.parent)+'\\'+str(mezzanine.stem)+'_2ndAudio[English]'+str(mezzanine.suffix))
+	tmp_suffix = '_'+str(os.getpid()) 	# Appended to temporary file names,
+										# so concurrent jobs (see metamezz.py --jobs) do not clash
 	
 	# Generate audio to mix with mezzanine audio, creating an additional different audio track
 	engine = pyttsx3.init()
 	engine.setProperty('rate', 100)
 	engine.setProperty('volume', 1.0)
-	engine.save_to_file("English", 'temp_voice.wav')
+	engine.save_to_file("English", 'temp_voice'+tmp_suffix+'.wav')
 	engine.runAndWait()
 
 	# Normalise voice audio
-	raw = AudioSegment.from_file('temp_voice.wav', 'wav')
+	raw = AudioSegment.from_file('temp_voice'+tmp_suffix+'.wav', 'wav')
 	normalized = effects.normalize(raw)
 	# normalized = set_amplitude(raw, -23.0)
-	normalized.export("temp_nvoice.wav", format="wav")
+	normalized.export('temp_nvoice'+tmp_suffix+'.wav', format="wav")
 	
 	# Get voice audio length
-	voice_duration = str(subprocess.check_output(['ffprobe', '-i', 'temp_nvoice.wav', '-show_entries', 'format=duration', '-v', 'quiet', '-of', 'csv']))
+	voice_duration = str(subprocess.check_output(['ffprobe', '-i', 'temp_nvoice'+tmp_suffix+'.wav', '-show_entries', 'format=duration', '-v', 'quiet', '-of', 'csv']))
 	voice_duration = float(voice_duration.split(',')[1][:-5])
 	silence_duration = 15 - voice_duration
 	
@@ -56,48 +58,48 @@ if __name__ == "__main__":
 		'-f', 'lavfi',
 		'-i', 'anullsrc=channel_layout=mono:sample_rate=48000',
 		'-y',
-		'temp_silence.wav'])
+		'temp_silence'+tmp_suffix+'.wav'])
 
 	# Concatenate voice and silence
 	#ffmpeg -i temp_nvoice.wav -i temp_silence.wav -filter_complex "[0] [1] concat=n=2:v=0:a=1 [a]" -map "[a]" temp_voiceandsilence.wav
 	subprocess.call(['ffmpeg', 
-		'-i', 'temp_nvoice.wav',
-		'-i', 'temp_silence.wav',
+		'-i', 'temp_nvoice'+tmp_suffix+'.wav',
+		'-i', 'temp_silence'+tmp_suffix+'.wav',
 		'-filter_complex', '[0] [1] concat=n=2:v=0:a=1 [a]',
 		'-map', '[a]',
 		'-y',
-		'temp_voiceandsilence.wav'])
+		'temp_voiceandsilence'+tmp_suffix+'.wav'])
 
 	# Mix mezzanine audio with voice+silence
 	#ffmpeg -i <mezzanine_file> -stream_loop -1 -i temp_voiceandsilence.wav -filter_complex "[0:a] [1] amix=inputs=2:duration=first:dropout_transition=2:weights=1 1 [a]" -map "[a]" temp_audiotrack2.wav
 	subprocess.call(['ffmpeg', 
 		'-i', str(mezzanine),
 		'-stream_loop', '-1',
-		'-i', 'temp_voiceandsilence.wav',
+		'-i', 'temp_voiceandsilence'+tmp_suffix+'.wav',
 		'-filter_complex', '[0:a][1] amix=inputs=2:duration=first:dropout_transition=2:weights=1 1 [a]',
 		'-map', '[a]',
 		'-y',
-		'temp_audiotrack2.wav'])
+		'temp_audiotrack2'+tmp_suffix+'.wav'])
 
 	# Normalise mixed audio
-	raw = AudioSegment.from_file('temp_audiotrack2.wav', 'wav')
+	raw = AudioSegment.from_file('temp_audiotrack2'+tmp_suffix+'.wav', 'wav')
 	#normalized = effects.normalize(raw)
 	normalized = set_amplitude(raw, -23.0)
-	normalized.export("temp_naudiotrack2.wav", format="wav")
+	normalized.export('temp_naudiotrack2'+tmp_suffix+'.wav', format="wav")
 
 	# Encode audio track
 	subprocess.call(['ffmpeg', 
-		'-i', 'temp_naudiotrack2.wav',
+		'-i', 'temp_naudiotrack2'+tmp_suffix+'.wav',
 		'-c:a','aac',
 		'-b:a', '320k', '-ac', '2',
 		'-y',
-		'temp_audiotrack2.aac'])
+		'temp_audiotrack2'+tmp_suffix+'.aac'])
 
 	# Mux new audio track into mezzanine
 	#ffmpeg -i <mezzanine_file> -i temp_audiotrack2.aac -map 0 -map 1 -vcodec copy -acodec copy <mezzanine_file_with_2nd_audio>
 	subprocess.call(['ffmpeg', 
 		'-i', str(mezzanine),
-		'-i', 'temp_audiotrack2.aac',
+		'-i', 'temp_audiotrack2'+tmp_suffix+'.aac',
 		'-map', '0',
 		'-map', '1',
 		'-vcodec','copy',
@@ -108,12 +110,12 @@ if __name__ == "__main__":
 	# Remove the temporaray audio files
 	print("Removing temporary files...", end='', flush=True)
 
-	os.remove('temp_voice.wav')
-	os.remove('temp_nvoice.wav')
-	os.remove('temp_silence.wav')
-	os.remove('temp_voiceandsilence.wav')
-	os.remove('temp_audiotrack2.wav')
-	os.remove('temp_naudiotrack2.wav')
-	os.remove('temp_audiotrack2.aac')
+	os.remove('temp_voice'+tmp_suffix+'.wav')
+	os.remove('temp_nvoice'+tmp_suffix+'.wav')
+	os.remove('temp_silence'+tmp_suffix+'.wav')
+	os.remove('temp_voiceandsilence'+tmp_suffix+'.wav')
+	os.remove('temp_audiotrack2'+tmp_suffix+'.wav')
+	os.remove('temp_naudiotrack2'+tmp_suffix+'.wav')
+	os.remove('temp_audiotrack2'+tmp_suffix+'.aac')
 	
 	print("Done")
@@ -0,0 +1,126 @@
+# Detects the A/V sync beeps in the audio of a mezzanine stream (or a capture of one)
+# The audio is decoded by ffmpeg to mono 32-bit float samples, streamed in blocks, and processed block by block:
+#   - the level of the beep tone is measured by a sliding single frequency DFT (Goertzel) at the tone frequency,
+#     i.e. the samples are shifted to baseband and summed over a sliding window of a whole number of tone cycles,
+#     computed for all the samples of a block using a single cumulative sum,
+#   - beeps are found where the tone level exceeds a minimum level for at least a window, ignoring drops shorter than
+#     a window (e.g. caused by noise or by the source audio mixed with the beeps),
+#   - the start and end of each beep are where the tone level crosses half the peak level of the beep,
+#     interpolated between samples, the beep centre time being halfway between them.
+# Sliding the window over the start or end of a beep changes the level linearly, so the crossings are offset by half
+# the window on both sides and the centre time does not depend on the window length, nor on the beep level.
+import math
+import subprocess
+
+import numpy as np
+
+
+beep_tone_hz = 3000 		# Beep frequency (see toneHz in test_sequence_gen/src/generate.py)
+beep_window_secs = 0.005 	# Sliding window length, 5ms is 15 cycles of the beep tone
+beep_min_level = 0.05 		# Minimum tone level of a beep, relative to full scale
+beep_sample_rate = 48000 	# Sample rate the audio is decoded at
+
+
+def beep_sample_blocks(filename, sample_rate=beep_sample_rate, block_size=1 << 20):
+	# Yields the samples of the first audio stream, downmixed to mono, as arrays of up to block_size float samples
+	proc = subprocess.Popen(['ffmpeg', '-loglevel', 'error',
+		'-i', str(filename),
+		'-map', '0:a:0', '-vn', '-sn',
+		'-ac', '1', '-ar', str(sample_rate),
+		'-f', 'f32le', '-acodec', 'pcm_f32le',
+		'pipe:1'], stdout=subprocess.PIPE)
+	try:
+		while True:
+			data = proc.stdout.read(4*block_size)
+			if len(data) >= 4:
+				yield np.frombuffer(data, dtype='<f4', count=len(data)//4)
+			if len(data) < 4*block_size:
+				break
+	finally:
+		proc.stdout.close()
+		if proc.wait() != 0:
+			raise RuntimeError("ffmpeg failed to decode \""+str(filename)+"\"")
+
+
+def beep_oscillator(sample_rate, tone_hz):
+	# Returns one period of the complex oscillator shifting the tone to baseband, indexed by sample number modulo its length
+	period = sample_rate//math.gcd(sample_rate, tone_hz)
+	return np.exp(-2j*np.pi*((tone_hz*np.arange(period)) % sample_rate)/sample_rate)
+
+
+def beep_levels(samples, first_sample, oscillator, window):
+	# Returns the tone level of each window of samples (samples n..n+window-1 for level n), as an amplitude
+	baseband = samples*oscillator[(first_sample+np.arange(len(samples))) % len(oscillator)]
+	sums = np.concatenate(([0], np.cumsum(baseband)))
+	return np.abs(sums[window:]-sums[:-window])*(2/window)
+
+
+def beep_centre(levels, start, end):
+	# Returns the position (in levels) halfway between the half peak crossings of the beep with levels start..end-1
+	beep = levels[start:end]
+	half = beep.max()/2
+	above = np.flatnonzero(beep >= half)
+	rise, fall = start+above[0], start+above[-1]
+	if rise > 0:
+		rise = rise-1+(half-levels[rise-1])/(levels[rise]-levels[rise-1])
+	if fall+1 < len(levels):
+		fall = fall+(levels[fall]-half)/(levels[fall]-levels[fall+1])
+	return (rise+fall)/2
+
+
+def beep_detect_blocks(sample_blocks, sample_rate, tone_hz=beep_tone_hz, min_level=beep_min_level,
+					   window_secs=beep_window_secs):
+	# Returns the number of samples and the beep centre times (in seconds) of the samples yielded in blocks
+	window = max(1, int(round(window_secs*sample_rate)))
+	oscillator = beep_oscillator(sample_rate, tone_hz)
+
+	centre_times = []
+	pending = np.empty(0, dtype='<f4') 	# Samples carried over to the next block, starting at sample first
+	first = 0
+	samples = 0
+
+	def process(buffer, first, final):
+		# Processes the beeps in the buffer, returns the position in the buffer from which samples must be carried over
+		levels = beep_levels(buffer, first, oscillator, window)
+		above = np.concatenate(([False], levels >= min_level, [False]))
+		runs = []
+		for start, end in np.flatnonzero(above[1:] != above[:-1]).reshape((-1, 2)).tolist():
+			if runs and start-runs[-1][1] < window:
+				runs[-1][1] = end
+			else:
+				runs.append([start, end])
+		carry = max(0, len(buffer)-window+1)
+		for start, end in runs:
+			if end > len(levels)-window and not final:
+				# Beep continuing in the next block, carried over with the level before it for the interpolation
+				carry = max(0, start-1)
+				break
+			if end-start < window:
+				continue
+			centre_times.append((first+beep_centre(levels, start, end)+window/2)/sample_rate)
+		return carry
+
+	for block in sample_blocks:
+		samples += len(block)
+		buffer = np.concatenate((pending, block))
+		if len(buffer) < window:
+			pending = buffer
+			continue
+		carry = process(buffer, first, False)
+		pending = buffer[carry:]
+		first += carry
+	if len(pending) >= window:
+		process(pending, first, True)
+	return samples, centre_times
+
+
+def beep_detect(filename, sample_rate=beep_sample_rate, tone_hz=beep_tone_hz, min_level=beep_min_level,
+				window_secs=beep_window_secs, block_size=1 << 20):
+	# Returns a dict with the sample rate, the number of samples and the beep centre times (in seconds)
+	samples, centre_times = beep_detect_blocks(beep_sample_blocks(filename, sample_rate, block_size), sample_rate,
+											   tone_hz, min_level, window_secs)
+	return {
+		'sampleRate': sample_rate,
+		'samples': samples,
+		'eventCentreTimes': centre_times,
+	}
@@ -0,0 +1,116 @@
+# Compares detected A/V sync event times (beeps or flashes) with the expected event times of the A/V sync metadata,
+# or with each other (e.g. the beeps with the flashes, to measure the A/V sync offset),
+# and locates detected events within the A/V sync pattern when their offset is unknown (e.g. in a capture).
+import sys
+
+import numpy as np
+
+from pathlib import Path
+
+
+test_sequence_gen_dir = Path(__file__).resolve().parent.parent / 'test_sequence_gen' / 'src' 	# Generates the A/V sync pattern
+
+
+def event_offsets(detected, expected, max_offset):
+	# Matches each detected event with the nearest expected event, at most max_offset seconds away,
+	# and returns a dict with the number of matched, missed and unexpected events and statistics of the offsets
+	# (detected minus expected, in seconds)
+	detected = np.asarray(detected, dtype='float64')
+	expected = np.asarray(expected, dtype='float64')
+	offsets = np.empty(0)
+	if len(detected) > 0 and len(expected) > 0:
+		after = np.clip(np.searchsorted(expected, detected), 1, len(expected)-1) if len(expected) > 1 \
+			else np.zeros(len(detected), dtype='int64')
+		before = np.maximum(after-1, 0)
+		nearest = np.where(np.abs(detected-expected[before]) <= np.abs(detected-expected[after]), before, after)
+		offsets = detected-expected[nearest]
+		matched = np.abs(offsets) <= max_offset
+		# Each expected event is only matched once, with the first detected event
+		nearest, first = np.unique(np.where(matched, nearest, -1), return_index=True)
+		offsets = offsets[first[nearest >= 0]]
+
+	summary = {
+		'matched': len(offsets),
+		'missed': len(expected)-len(offsets),
+		'unexpected': len(detected)-len(offsets),
+	}
+	if len(offsets) > 0:
+		summary.update({
+			'meanOffsetSecs': float(offsets.mean()),
+			'minOffsetSecs': float(offsets.min()),
+			'maxOffsetSecs': float(offsets.max()),
+		})
+	return summary
+
+
+def pattern_frame_rates():
+	# Returns the frame rates the A/V sync pattern is defined for
+	if str(test_sequence_gen_dir) not in sys.path:
+		sys.path.insert(0, str(test_sequence_gen_dir))
+	from generate import fpsBitTimings
+	return sorted(fpsBitTimings.keys())
+
+
+def event_locations(detected, window_len, fps, tolerance=None):
+	# Locates the detected events within the A/V sync pattern (see genEventCentreTimes() in test_sequence_gen),
+	# e.g. to synchronise a capture with the mezzanine it was captured from.
+	# The event times are decoded back into bits, then each window of window_len consecutive bits is looked up
+	# in the maximal-length sequence. Any window of bits occurs somewhere in the sequence, so an incorrectly decoded
+	# bit (e.g. caused by a missed or spurious event) is only detected by the positions of the windows containing it
+	# not following on from each other: windows are only kept when part of a chain of more than window_len windows
+	# at consecutive positions. Returns a list of dicts, one per window located, with "positionSecs" (the time in the
+	# pattern at which the window starts, modulo the 2^window_len-1 seconds period), "offsetSecs" (the offset of the
+	# detected times relative to the pattern, averaged over the window) and "startSecs" (the detected time at which
+	# the window starts). tolerance is the maximum error in the detected times, None for half a frame duration.
+	if str(test_sequence_gen_dir) not in sys.path:
+		sys.path.insert(0, str(test_sequence_gen_dir))
+	from eventTimingGen import decodePulseTimingsAsBitStream, locateMlsWindows
+	from generate import fpsBitTimings
+
+	if tolerance is None:
+		tolerance = 0.5/fps
+	bit_interval = 1.0
+	period = 2**window_len-1
+
+	locations = []
+	for bits, bit_starts in decodePulseTimingsAsBitStream(list(detected), bit_interval, fpsBitTimings[fps][0],
+														  fpsBitTimings[fps][1], tolerance):
+		positions = locateMlsWindows(bits, window_len)
+
+		# Splits the windows into chains of windows at consecutive positions
+		chains = []
+		for n, position in enumerate(positions):
+			if len(chains) > 0 and position is not None and positions[n-1] is not None \
+					and position == (positions[n-1]+1) % period:
+				chains[-1].append(n)
+			else:
+				chains.append([n])
+
+		for chain in chains:
+			if len(chain) <= window_len or positions[chain[0]] is None:
+				continue
+			for n in chain:
+				offsets = [bit_starts[n+i]-(positions[n]+i)*bit_interval for i in range(window_len)]
+				locations.append({
+					'positionSecs': positions[n]*bit_interval,
+					'offsetSecs': sum(offsets)/window_len,
+					'startSecs': bit_starts[n],
+				})
+	return locations
+
+
+def pattern_offsets(locations, window_len):
+	# Summarises the windows located within the A/V sync pattern (see event_locations()).
+	# The positions are modulo the pattern period, so the offsets are brought within half a period of the first one.
+	summary = {'located': len(locations)}
+	if len(locations) > 0:
+		period = 2**window_len-1
+		first = locations[0]['offsetSecs']
+		offsets = [first+(location['offsetSecs']-first+period/2) % period-period/2 for location in locations]
+		summary.update({
+			'firstPositionSecs': locations[0]['positionSecs'],
+			'meanOffsetSecs': float(np.mean(offsets)),
+			'minOffsetSecs': float(np.min(offsets)),
+			'maxOffsetSecs': float(np.max(offsets)),
+		})
+	return summary
@@ -0,0 +1,109 @@
+# Detects the A/V sync flashes in a video (a mezzanine stream or a capture of one)
+# Only the flash region is extracted by ffmpeg, cropped in the filter graph and converted to 8-bit luma,
+# so full resolution frames never leave ffmpeg, and the frames are processed in blocks:
+#   - the mean luma of the region of all frames in a block is computed using a single array operation,
+#   - the frames are classified as flash/no flash by thresholding the means of the whole stream at once,
+#   - the flash intervals are found from the changes of state between consecutive frames.
+# The flash centre times are reported in the same format as the "eventCentreTimes" of the A/V sync metadata.
+import json
+import subprocess
+
+import numpy as np
+
+
+flash_block_scale = 0.125 	# Flash block size relative to the video height (see mezzanine.py)
+flash_region_inset = 0.25 	# Fraction of the block size left out on each side, allows for scaled or shifted captures
+flash_min_contrast = 32 	# Minimum luma difference between flash and no flash, below which no flash is detected
+
+
+def video_properties(filename):
+	# Returns the width, height and frame rate (as a float) of the first video stream
+	video_properties = subprocess.check_output(
+		['ffprobe', '-i', str(filename), '-show_streams', '-select_streams', 'v:0', '-loglevel', '0', '-print_format', 'json'])
+	stream = json.loads(video_properties)['streams'][0]
+	num, den = stream['r_frame_rate'].split('/')
+	return int(stream['width']), int(stream['height']), int(num)/int(den)
+
+
+def flash_region(width, height, inset=flash_region_inset):
+	# Returns the region (x, y, w, h) of the flash block drawn by mezzanine.py at x=iw*0.925-size, y=ih*0.1,
+	# less inset*size on each side
+	size = int(round(height*flash_block_scale, 0))
+	margin = int(size*inset)
+	return (int(width*0.925-size)+margin, int(height*0.1)+margin, max(1, size-2*margin), max(1, size-2*margin))
+
+
+def flash_luma_blocks(filename, region, block_size=1000):
+	# Yields the mean luma of the region of each frame, as arrays of up to block_size values
+	x, y, w, h = region
+	proc = subprocess.Popen(['ffmpeg', '-loglevel', 'error',
+		'-i', str(filename),
+		'-map', '0:v:0', '-an', '-sn',
+		'-vf', 'crop='+str(w)+':'+str(h)+':'+str(x)+':'+str(y)+',format=gray',
+		'-vsync', 'passthrough',
+		'-f', 'rawvideo', '-pix_fmt', 'gray',
+		'pipe:1'], stdout=subprocess.PIPE)
+	frame_size = w*h
+	try:
+		while True:
+			data = proc.stdout.read(frame_size*block_size)
+			frames = len(data)//frame_size
+			if frames > 0:
+				yield np.frombuffer(data, dtype='uint8', count=frames*frame_size).reshape((frames, frame_size)).mean(axis=1)
+			if frames < block_size:
+				break
+	finally:
+		proc.stdout.close()
+		if proc.wait() != 0:
+			raise RuntimeError("ffmpeg failed to decode \""+str(filename)+"\"")
+
+
+def flash_threshold(luma):
+	# Returns the luma threshold halfway between the darkest and brightest frames (ignoring the extremes),
+	# or None when there is not enough contrast for any flash to be present
+	low, high = np.percentile(luma, [1, 99])
+	if high-low < flash_min_contrast:
+		return None
+	return (low+high)/2
+
+
+def flash_intervals(luma, threshold):
+	# Returns the frame intervals (start, end) during which the flash is on, 'end' being the first frame after the flash,
+	# as generated by the test sequence generator (see genFlashIntervals())
+	on = np.concatenate(([False], np.asarray(luma) > threshold, [False]))
+	changes = np.flatnonzero(on[1:] != on[:-1])
+	return [tuple(interval) for interval in changes.reshape((-1, 2)).tolist()]
+
+
+def flash_centre_times(intervals, fps, flash_frames=3):
+	# Returns the centre time (in seconds) of each flash, frame n being shown from n/fps to (n+1)/fps
+	# Consecutive flashes are merged into one interval, which is split back into flashes of flash_frames frames
+	centre_times = []
+	for start, end in intervals:
+		count = max(1, int(round((end-start)/flash_frames)))
+		for i in range(count):
+			centre_times.append((start+(end-start)*(2*i+1)/(2*count))/fps)
+	return centre_times
+
+
+def flash_detect(filename, region=None, fps=None, threshold=None, block_size=1000):
+	# Returns a dict with the frame rate, the threshold, the flash intervals and the flash centre times
+	width, height, probed_fps = video_properties(filename)
+	if region is None:
+		region = flash_region(width, height)
+	if fps is None:
+		fps = probed_fps
+
+	luma = np.concatenate([np.empty(0)]+list(flash_luma_blocks(filename, region, block_size)))
+	if threshold is None:
+		threshold = flash_threshold(luma) if len(luma) > 0 else None
+	intervals = flash_intervals(luma, threshold) if threshold is not None else []
+
+	return {
+		'fps': fps,
+		'frames': len(luma),
+		'region': list(region),
+		'threshold': threshold,
+		'flashIntervals': intervals,
+		'eventCentreTimes': flash_centre_times(intervals, fps),
+	}
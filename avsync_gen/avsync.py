@@ -0,0 +1,99 @@
+# Caches the A/V sync pattern assets generated by the test sequence generator:
+#   - the beeps, as raw signed 16 bit little-endian mono samples
+#     (only one period of the pattern when shorter than the duration, as it is looped by ffmpeg)
+#   - the frame intervals of the flashes
+#   - the metadata describing the timings of the beeps and flashes
+# The assets only depend on the A/V sync frame rate, duration, pattern window length and audio sample rate
+# (not on the resolution), so they are generated once and shared by all the mezzanine streams using the same parameters.
+# Each cache entry is a folder containing the assets and a manifest with the parameters and the SHA-256 hash of each file,
+# entries that are incomplete or do not match their manifest are ignored (and replaced when stored again).
+import hashlib
+import json
+import os
+import shutil
+
+from pathlib import Path
+
+
+avsync_version = 2 	# Part of the cache key, to be incremented when the generated assets change
+avsync_files = {'beeps': 'beeps.raw', 'flashes': 'flashes.json', 'metadata': 'metadata.json'}
+avsync_manifest = 'manifest.json'
+
+
+def avsync_cache_entry(avsync_cache_dir, window_len, fps, duration, sample_rate):
+	return Path(avsync_cache_dir, 'w'+str(window_len)+'_'+str(fps)+'fps_'+str(duration)+'s_'+str(sample_rate)+'Hz'
+				+'_v'+str(avsync_version))
+
+
+def avsync_parameters(window_len, fps, duration, sample_rate):
+	return {'version': avsync_version, 'window_len': window_len, 'fps': fps, 'duration': duration,
+			'sample_rate': sample_rate}
+
+
+def avsync_file_sha256(filename):
+	file_hash = hashlib.sha256()
+	with open(filename, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			file_hash.update(block)
+	return file_hash.hexdigest()
+
+
+def avsync_cache_load(entry, window_len, fps, duration, sample_rate):
+	# Returns the assets of a cache entry as a dict with "beeps" (filename of the raw samples), "flashIntervals"
+	# and "metadata", or None when the entry is missing, was stored for other parameters or fails the integrity check
+	try:
+		with open(Path(entry, avsync_manifest), 'r') as manifest_file:
+			manifest = json.load(manifest_file)
+		if manifest['parameters'] != avsync_parameters(window_len, fps, duration, sample_rate):
+			return None
+		for name, filename in avsync_files.items():
+			if avsync_file_sha256(Path(entry, filename)) != manifest['sha256'][filename]:
+				print("A/V sync cache: "+str(Path(entry, filename))+" does not match its hash, ignored")
+				return None
+		with open(Path(entry, avsync_files['flashes']), 'r') as flashes_file:
+			flash_intervals = [tuple(interval) for interval in json.load(flashes_file)]
+		with open(Path(entry, avsync_files['metadata']), 'r') as metadata_file:
+			metadata = json.load(metadata_file)
+	except (OSError, ValueError, KeyError):
+		return None
+	return {'beeps': Path(entry, avsync_files['beeps']), 'flashIntervals': flash_intervals, 'metadata': metadata}
+
+
+def avsync_cache_store(entry, window_len, fps, duration, sample_rate, sample_chunks, flash_intervals, metadata):
+	# Writes the assets to a temporary folder first, which is then renamed to the entry,
+	# so concurrent jobs never read a partially written entry. The raw samples are written chunk by chunk.
+	os.makedirs(Path(entry).parent, exist_ok=True)
+	tmp_entry = Path(entry).with_name(Path(entry).name+'.'+str(os.getpid())+'.tmp')
+	shutil.rmtree(tmp_entry, ignore_errors=True)
+	os.makedirs(tmp_entry)
+
+	with open(Path(tmp_entry, avsync_files['beeps']), 'wb') as beeps_file:
+		for chunk in sample_chunks:
+			beeps_file.write(chunk)
+	with open(Path(tmp_entry, avsync_files['flashes']), 'w') as flashes_file:
+		json.dump(flash_intervals, flashes_file)
+	with open(Path(tmp_entry, avsync_files['metadata']), 'w') as metadata_file:
+		json.dump(metadata, metadata_file)
+	with open(Path(tmp_entry, avsync_manifest), 'w') as manifest_file:
+		json.dump({'parameters': avsync_parameters(window_len, fps, duration, sample_rate),
+				   'sha256': {filename: avsync_file_sha256(Path(tmp_entry, filename)) for filename in avsync_files.values()}},
+				  manifest_file, indent=4)
+
+	try:
+		os.replace(tmp_entry, entry)
+	except OSError:
+		# The entry exists: it is kept when stored by another job in the meantime, otherwise it is invalid and replaced
+		if avsync_cache_load(entry, window_len, fps, duration, sample_rate) is None:
+			shutil.rmtree(entry, ignore_errors=True)
+			try:
+				os.replace(tmp_entry, entry)
+			except OSError:
+				pass
+		shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def avsync_read_chunks(filename, chunk_size):
+	# Yields the content of a file in chunks, so it is never held in memory in full
+	with open(filename, 'rb') as f:
+		for chunk in iter(lambda: f.read(chunk_size), b''):
+			yield chunk
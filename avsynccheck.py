@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+This program detects the A/V sync flashes and beeps in a WAVE mezzanine file (MP4), or in a capture of one,
+and writes their timings to a JSON file, in the same format as the A/V sync metadata written by mezzanine.py.
+When the A/V sync metadata is available, the detected timings are compared with the expected timings.
+The detected timings are also located within the A/V sync pattern, which gives their offset from the mezzanine
+timeline even when it is unknown (e.g. in a capture).
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+
+from avsync_check.beeps import beep_detect
+from avsync_check.events import event_locations, event_offsets, pattern_frame_rates, pattern_offsets
+from avsync_check.flashes import flash_detect, video_properties
+from pathlib import Path
+from shutil import which
+
+
+# Check FFMPEG and FFPROBE are installed
+if which('ffmpeg') is None:
+	sys.exit("FFMPEG was not found, ensure FFMPEG is added to the system PATH or is in the same folder as this script.")
+if which('ffprobe') is None:
+	sys.exit("FFMPEG was not found, ensure FFPROBE is added to the system PATH or is in the same folder as this script.")
+
+# Basic argument handling
+flashes = 'enabled'
+beeps = 'enabled'
+max_offset = 0.1
+window_len = 5 	# See --window-len in mezzanine.py
+
+parser = argparse.ArgumentParser(description="WAVE Mezzanine A/V sync check: flash and beep detection.")
+
+parser.add_argument(
+	'--flashes', 
+	required=False, 
+	choices=['enabled', 'disabled'],
+	help="Detects the flashes in the video. May be \"enabled\" or \"disabled\". Default: "+flashes)
+
+parser.add_argument(
+	'--beeps', 
+	required=False, 
+	choices=['enabled', 'disabled'],
+	help="Detects the beeps in the audio. May be \"enabled\" or \"disabled\". Default: "+beeps)
+
+parser.add_argument(
+	'--metadata', 
+	required=False, 
+	help="A/V sync metadata JSON file the detected timings are compared with. "
+		 "Default: the input file name with an \"_avsync.json\" suffix, when present.")
+
+parser.add_argument(
+	'--max-offset', 
+	required=False, 
+	type=float,
+	help="Maximum offset (in seconds) between a detected event and the expected event it is matched with. "
+		 "Default: "+str(max_offset))
+
+parser.add_argument(
+	'--window-len', 
+	required=False, 
+	type=int,
+	help="A/V sync pattern window length (in bits) used to locate the detected timings within the pattern. "
+		 "Default: the window length of the A/V sync metadata when present, otherwise "+str(window_len))
+
+parser.add_argument(
+	'--region', 
+	required=False, 
+	help="Region containing the flash, in the format x:y:w:h (in pixels). "
+		 "Default: the centre of the flash block of a mezzanine with the resolution of the input.")
+
+parser.add_argument(
+	'--threshold', 
+	required=False, 
+	type=float,
+	help="Mean luma (0-255) above which the flash is on. "
+		 "Default: halfway between the darkest and brightest frames of the region.")
+
+parser.add_argument(
+	'--fps', 
+	required=False, 
+	type=float,
+	help="Frame rate used to compute the flash times. Default: the frame rate of the input.")
+
+parser.add_argument('input', help="Mezzanine or captured video file.")
+parser.add_argument(
+	'output', 
+	nargs='?', 
+	help="Output JSON file. Default: the input file name with an \"_avsync_detected.json\" suffix.")
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.input):
+	sys.exit("Source file \""+args.input+"\" does not exist.")
+if args.flashes is not None:
+	flashes = args.flashes
+if args.beeps is not None:
+	beeps = args.beeps
+if args.max_offset is not None:
+	max_offset = args.max_offset
+
+region = None
+if args.region is not None:
+	match = re.match(r'^([0-9]+):([0-9]+):([1-9][0-9]*):([1-9][0-9]*)$', args.region)
+	if not match:
+		sys.exit("Region not provided in format x:y:w:h, e.g. 1632:108:136:136")
+	region = tuple(int(v) for v in match.groups())
+
+source = Path(args.input)
+if args.output is not None:
+	output = Path(args.output)
+else:
+	output = source.with_name(source.stem+'_avsync_detected.json')
+
+expected = None
+pattern_fps = None
+metadata = Path(args.metadata) if args.metadata is not None else source.with_name(source.stem+'_avsync.json')
+if args.metadata is not None or os.path.isfile(metadata):
+	with open(metadata, 'r') as metadata_file:
+		avsync_metadata = json.load(metadata_file)
+	expected = avsync_metadata['eventCentreTimes']
+	window_len = avsync_metadata['patternWindowLength']
+	pattern_fps = avsync_metadata['fps']
+if args.window_len is not None:
+	window_len = args.window_len
+if pattern_fps is None:
+	# Same rounding as the frame rate the pattern is generated for by mezzanine.py
+	pattern_fps = math.ceil((args.fps if args.fps is not None else video_properties(source)[2])*2)/2
+
+
+def print_offsets(name, offsets):
+	if 'located' in offsets:
+		print(name+": "+str(offsets['located'])+" pattern windows located", end='')
+	else:
+		print(name+": "+str(offsets['matched'])+" matched, "+str(offsets['missed'])+" missed, "
+			  +str(offsets['unexpected'])+" unexpected", end='')
+	if 'meanOffsetSecs' in offsets:
+		print(", offset (ms) mean "+'{:.3f}'.format(offsets['meanOffsetSecs']*1000)
+			  +" min "+'{:.3f}'.format(offsets['minOffsetSecs']*1000)+" max "+'{:.3f}'.format(offsets['maxOffsetSecs']*1000))
+	else:
+		print()
+
+
+detected = {}
+if flashes == 'enabled':
+	print("Detecting flashes in "+str(source))
+	detected['flashes'] = flash_detect(source, region, args.fps, args.threshold)
+	if detected['flashes']['threshold'] is None:
+		print("No flash detected ("+str(detected['flashes']['frames'])+" frames)")
+	else:
+		print(str(len(detected['flashes']['eventCentreTimes']))+" flashes detected ("+str(detected['flashes']['frames'])
+			  +" frames, threshold "+'{:.1f}'.format(detected['flashes']['threshold'])+")")
+if beeps == 'enabled':
+	print("Detecting beeps in "+str(source))
+	detected['beeps'] = beep_detect(source)
+	print(str(len(detected['beeps']['eventCentreTimes']))+" beeps detected ("+str(detected['beeps']['samples'])+" samples)")
+
+# Offsets of the detected events from the A/V sync pattern, from the expected events,
+# and of the beeps from the flashes (i.e. A/V sync offset)
+for name in detected:
+	if pattern_fps not in pattern_frame_rates():
+		print("The A/V sync pattern is not defined for "+str(pattern_fps)+"fps, the detected timings are not located")
+		break
+	detected[name]['pattern'] = pattern_offsets(event_locations(detected[name]['eventCentreTimes'], window_len, 
+																pattern_fps), window_len)
+	print_offsets(name.capitalize()+" vs A/V sync pattern", detected[name]['pattern'])
+if expected is not None:
+	for name in detected:
+		detected[name]['offsets'] = event_offsets(detected[name]['eventCentreTimes'], expected, max_offset)
+		print_offsets(name.capitalize()+" vs "+str(metadata), detected[name]['offsets'])
+if 'flashes' in detected and 'beeps' in detected:
+	detected['beepsVsFlashes'] = event_offsets(detected['beeps']['eventCentreTimes'],
+											   detected['flashes']['eventCentreTimes'], max_offset)
+	print_offsets("Beeps vs flashes", detected['beepsVsFlashes'])
+
+with open(output, 'w') as output_file:
+	json.dump(detected, output_file, indent=4)
+print("Done")
@@ -2,71 +2,179 @@
 # Step 1: define bit pattern for 240x135 video
 # Step 2: upscale as needed towards target resolution
 # Note: intended for 480x270 video with 2x2 bit pattern "bit" size as the lowest resolution
-def bp_create(bitpat_file_dir, frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame):
-	import cv2
-	import numpy as np
-
-	from pathlib import Path
-
-	bits_per_ln = 96		# coded_bits_per_line (data payload, excluding calibration bits)
-	nof_data_ln = 2			# number_of_data_lines
-	nof_black_ln_bef = 2		# number_of_black_lines_before
-	nof_black_ln_aft = 1		# number_of_black_lines_after
-	nof_black_px_bef = 5		# number_of_black_pixels_before
-	nof_black_px_aft = 3		# number_of_black_pixels_after
-	y_dim = nof_black_ln_bef + 1 + nof_data_ln + nof_black_ln_aft 	# total lines in bit pattern,
-																	# includes 1 calibration line
-	x_dim = nof_black_px_bef + 2 + bits_per_ln + nof_black_px_aft 	# total pixels per bit pattern line,
-																	# includes 2 calibration bits
-																	# (note: 1px = 1bit at this stage of the process)
-
-	vact_ref = 135.0		# make float, as target result must be float
-	hact_ref = 240.0		# 
+# The bit patterns of a block of frames are generated at once:
+#   - the calibration bits and the upscaling index map only depend on the resolution and are computed once,
+#   - the data bits of all frames in the block are set using a single array operation,
+#   - the upscaling is a single lookup using the precomputed index map.
+# Bit patterns do not depend on the label, so cached bit patterns are shared across label variants (e.g. I1/I2).
+# Alternatively, bit patterns can be yielded in order as arrays (e.g. to stream them to ffmpeg), without saving them.
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+
+bits_per_ln = 96		# coded_bits_per_line (data payload, excluding calibration bits)
+nof_data_ln = 2			# number_of_data_lines
+nof_black_ln_bef = 2		# number_of_black_lines_before
+nof_black_ln_aft = 1		# number_of_black_lines_after
+nof_black_px_bef = 5		# number_of_black_pixels_before
+nof_black_px_aft = 3		# number_of_black_pixels_after
+y_dim = nof_black_ln_bef + 1 + nof_data_ln + nof_black_ln_aft 	# total lines in bit pattern,
+																# includes 1 calibration line
+x_dim = nof_black_px_bef + 2 + bits_per_ln + nof_black_px_aft 	# total pixels per bit pattern line,
+																# includes 2 calibration bits
+																# (note: 1px = 1bit at this stage of the process)
+vact_ref = 135.0		# make float, as target result must be float
+hact_ref = 240.0		#
+
+
+@lru_cache(maxsize=None)
+def bp_template(pix_per_ln, ln_per_frame):
+	# Returns the bit pattern without data bits (i.e. only the calibration bits),
+	# and the index map used to upscale the bit pattern to the target resolution
 	vinc = vact_ref / ln_per_frame
 	hinc = hact_ref / pix_per_ln
 
+	ibp = np.zeros((y_dim, x_dim), dtype='uint8')
+
+	ycur = nof_black_ln_bef
+	xcur = nof_black_px_bef
+
+	ibp[ycur, xcur:xcur+bits_per_ln+2] = 1-(np.arange(bits_per_ln+2) % 2) 	# calibration line
+	for j in range(nof_data_ln): 											# calibration pixels per data line
+		ibp[ycur+1+j, xcur:xcur+2] = (np.arange(2)+j) % 2
+
+	xstop = int(x_dim/hinc)
+	ystop = int(y_dim/vinc)
+	y_map = (np.arange(ystop)*vinc).astype(int)
+	x_map = (np.arange(xstop)*hinc).astype(int)
+
+	return ibp, y_map, x_map
+
+
+def bp_settings(frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame):
 	# Settings consist of: frame_number | nof_frames | framerate | pix_per_ln | ln_per_frame
 	# Each setting is followed by the number of bits used to encode it
-	settings = [(frame_number, 24), (nof_frames, 24), (int(framerate*1000), 17), (pix_per_ln, 13), (ln_per_frame, 13)]
-	ibp = np.zeros((y_dim, x_dim), dtype='uint8')
+	return [(frame_number, 24), (nof_frames, 24), (int(framerate*1000), 17), (pix_per_ln, 13), (ln_per_frame, 13)]
+
 
-	bitinppat = np.zeros((bits_per_ln*nof_data_ln,), dtype='uint8')
+def bp_data_bits(frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame):
+	# Returns the data bits (least significant bit of each setting first) as an array of shape (frames, 192),
+	# the bits following the settings are set to 0
+	frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+	bitinppat = np.zeros((len(frame_numbers), bits_per_ln*nof_data_ln), dtype='uint8')
 	pnt = 0
-	for x in settings:
-		setting = x[0]
-		for i in range(x[1]):
-			bitinppat[pnt] = setting % 2
-			pnt = pnt + 1 
-			setting = setting >> 1
+	for setting, nof_bits in bp_settings(frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame):
+		setting = np.broadcast_to(np.asarray(setting, dtype=np.int64), frame_numbers.shape)
+		bitinppat[:, pnt:pnt+nof_bits] = (setting[:, np.newaxis] >> np.arange(nof_bits)) & 1
+		pnt = pnt + nof_bits
+	return bitinppat
 
-	ycur = nof_black_ln_bef
-	xcur = nof_black_px_bef
 
-	for i in range((bits_per_ln+2)):
-		ibp[ycur, xcur + i] = 1-(i % 2) 	# calibration line
+def bp_create_batch(frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame):
+	# Returns the upscaled bit patterns of all frames as an array of shape (frames, lines, pixels_per_line)
+	ibp, y_map, x_map = bp_template(pix_per_ln, ln_per_frame)
 
-	for j in range(nof_data_ln): 			# calibration pixels per data line
-		for i in range(2):
-			ibp[ycur+1+j, xcur + i] = ((i+j) % 2)
+	ibps = np.repeat(ibp[np.newaxis, :, :], len(frame_numbers), axis=0)
+	ibps[:, nof_black_ln_bef+1:nof_black_ln_bef+1+nof_data_ln, nof_black_px_bef+2:nof_black_px_bef+2+bits_per_ln] = \
+		bp_data_bits(frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame).reshape(
+			(len(frame_numbers), nof_data_ln, bits_per_ln))
 
-	for j in range(nof_data_ln):
-		for i in range(bits_per_ln):
-			ibp[ycur+1+j, xcur+2+i] = bitinppat[j*bits_per_ln + i]
+	return ibps[:, y_map[:, np.newaxis], x_map[np.newaxis, :]]*255
+
+
+def bp_filename(bitpat_file_dir, frame_number):
+	return Path(str(bitpat_file_dir)+'\\'+str(frame_number).zfill(5)+'.png')
+
+
+def bp_cache_filename(bp_cache_dir, frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame):
+	return Path(bp_cache_dir, str(pix_per_ln)+'x'+str(ln_per_frame)+'_'+str(nof_frames)+'_'+str(int(framerate*1000)),
+				str(frame_number).zfill(5)+'.png')
+
+
+def bp_save(filename, bp):
+	# Bit patterns are saved as 3 channel images
+	return cv2.imwrite(str(filename), np.repeat(bp[:, :, np.newaxis], 3, axis=2))
 
-	xstart = 0
-	xstop = int(x_dim/hinc)
-	ystart = 0
-	ystop = int(y_dim/vinc)
 
-	i00 = np.zeros((ystop, xstop, 3), dtype='uint8')
+def bp_link(source, destination):
+	# Hard link cached bit patterns to avoid copying them, fall back to a copy (e.g. when on another drive)
+	try:
+		os.remove(destination)
+	except FileNotFoundError:
+		pass
+	try:
+		os.link(source, destination)
+	except OSError:
+		shutil.copyfile(source, destination)
 
-	print(str(xstop)+"x"+str(ystop), end='', flush=True)
 
-	for j in range(ystart, ystop): 			# ystart, ystop, xstart, xstop
-		for i in range(xstart, xstop):
-			ycur = int(j*vinc)
-			xcur = int(i*hinc)
-			i00[j, i, :] = ibp[ycur, xcur]*255.0
+def bp_generate(bitpat_file_dir, frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame,
+				bp_cache_dir=None, workers=None, block_size=100):
+	frame_numbers = list(frame_numbers)
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	# Only bit patterns not found in the cache are generated
+	if bp_cache_dir is not None:
+		todo = []
+		for frame_number in frame_numbers:
+			cache_filename = bp_cache_filename(bp_cache_dir, frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame)
+			if os.path.isfile(cache_filename):
+				bp_link(cache_filename, bp_filename(bitpat_file_dir, frame_number))
+			else:
+				todo.append(frame_number)
+		print("Bitpattern cache: "+str(len(frame_numbers)-len(todo))+" found, "+str(len(todo))+" to generate")
+		if len(todo) > 0:
+			os.makedirs(bp_cache_filename(bp_cache_dir, 0, nof_frames, framerate, pix_per_ln, ln_per_frame).parent,
+						exist_ok=True)
+	else:
+		todo = frame_numbers
+
+	def save(frame_number, bp):
+		if bp_cache_dir is None:
+			return bp_save(bp_filename(bitpat_file_dir, frame_number), bp)
+		# Write to a temporary file first, so concurrent jobs never read a partially written cache entry
+		cache_filename = bp_cache_filename(bp_cache_dir, frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame)
+		tmp_filename = cache_filename.with_name(cache_filename.stem+'.'+str(os.getpid())+'.tmp.png')
+		status = bp_save(tmp_filename, bp)
+		os.replace(tmp_filename, cache_filename)
+		bp_link(cache_filename, bp_filename(bitpat_file_dir, frame_number))
+		return status
+
+	# PNG encoding releases the GIL, so the images of a block are saved using a pool of threads
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		for i in range(0, len(todo), block_size):
+			block = todo[i:i+block_size]
+			bps = bp_create_batch(block, nof_frames, framerate, pix_per_ln, ln_per_frame)
+			statuses = list(executor.map(save, block, bps))
+			print(str(bps.shape[2])+"x"+str(bps.shape[1])+"| "
+				  +str(bp_settings(block[0], nof_frames, framerate, pix_per_ln, ln_per_frame))+" .. frame "+str(block[-1])
+				  +" | "+{True: 'saved', False: 'failed'}[all(statuses)])
+
+
+def bp_frames(frame_numbers, nof_frames, framerate, pix_per_ln, ln_per_frame, block_size=100, channels=3):
+	# Yields the bit patterns of each frame in order, as 3 channel images (or single channel images when channels is 1)
+	frame_numbers = list(frame_numbers)
+	for i in range(0, len(frame_numbers), block_size):
+		bps = bp_create_batch(frame_numbers[i:i+block_size], nof_frames, framerate, pix_per_ln, ln_per_frame)
+		if channels == 1:
+			yield from bps
+		else:
+			yield from np.repeat(bps[:, :, :, np.newaxis], channels, axis=3)
+
+
+def bp_create(bitpat_file_dir, frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame):
+	bp = bp_create_batch([frame_number], nof_frames, framerate, pix_per_ln, ln_per_frame)[0]
+
+	print(str(bp.shape[1])+"x"+str(bp.shape[0]), end='', flush=True)
 
-	status = cv2.imwrite(str(Path(str(bitpat_file_dir)+'\\'+str(frame_number).zfill(5)+'.png')), i00)
-	print("| "+str(settings)+" | "+{True: 'saved', False: 'failed'}[status])
+	status = bp_save(bp_filename(bitpat_file_dir, frame_number), bp)
+	print("| "+str(bp_settings(frame_number, nof_frames, framerate, pix_per_ln, ln_per_frame))+" | "
+		  +{True: 'saved', False: 'failed'}[status])
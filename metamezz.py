@@ -1,12 +1,44 @@
 #!/usr/bin/env python
 
+import hashlib
+import json
+import math
 import os
 import subprocess
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+
+
+# Files and Python modules used by mezzanine.py, part of the fingerprint of each job (see job_fingerprint())
+boundaries = Path('assets/boundaries.png') 	# Default boundary markers used by mezzanine.py, relative to the script
+tool_module_dirs = ['avsync_gen', 'bp_gen', 'overlay_gen', 'qr_gen', Path('test_sequence_gen', 'src')]
+
+# Output video codec selected by mezzanine.py based on the source colorspace (see output_video_encoding_selection),
+# H.264 is used when the source colorspace is not signalled or when tone mapping is enabled
+codec_selection = {'bt2020nc': 'H.265', 'bt709': 'H.264', 'bt470bg': 'H.264', 'smpte170m': 'H.264'}
+
+# Resource weights used to decide which jobs run at the same time (see job_weight() and run_jobs()).
+# These are rough estimates for the "slower" preset and crf 5 used by mezzanine.py.
+job_memory_base = 512*1024**2 	# Memory used by a job whatever the resolution (annotations, audio, ffmpeg), in bytes
+job_memory_per_pixel = {'H.264': 160, 'H.265': 480} 	# Additional memory used by the encoder per pixel of a frame, in bytes
+# Pixel rows of a frame per encoder thread kept busy: x264 frame threads each need about 4 macroblock rows (16px)
+# ahead of the next frame, x265 wavefront threads 2 CTU rows (64px) each, over about 3 frames encoded in parallel
+job_rows_per_thread = {'H.264': 4*16, 'H.265': 2*64/3}
+job_backfill_limit = 4 	# Number of jobs that may start before a job waiting for resources, after which it is started first
+
+# Cost model used to predict the duration of each job (see job_cost_model()), calibrated from the durations of
+# previous jobs recorded in the job history file. For codecs without recorded jobs, these defaults are used:
+job_cost_per_pixel_frame = {'H.264': 2.0e-7, 'H.265': 8.0e-7} 	# CPU seconds per pixel of each frame
+job_cost_overhead = 30 		# CPU seconds per job whatever the resolution and duration (probing, audio, metadata)
+job_history_max = 500 		# Number of jobs kept in the job history file, per codec
 
 
 def generate_streams(input, source_duration, mezzanine_gen_script, font, qr_positions, resolutions,
 					start_end_indicators, window_len, tonemap, version, specification_version, metadata_only,
-					output, second_audio_gen_script, test):
+					output, second_audio_gen_script, test, jobs=None, codec='H.264', incremental='disabled', cpu_slots=None):
 	"""
 	Calls the WAVE mezzanine generation script to create annotated mezzanine streams using the input source content
 	for each of the combinations defined in the resolutions parameter.
@@ -39,8 +71,29 @@ def generate_streams(input, source_duration, mezzanine_gen_script, font, qr_posi
 	:param second_audio_gen_script: The path to the second audio track generation Python script.
 	:param test: When this flag (bool) is set, stream creation is disabled.
 				Used to create a list of the output streams without generating them.
+	:param jobs: When None, the streams are generated one at a time before returning.
+				Otherwise, a dictionary the jobs generating the streams are added to instead, to be run later
+				(see run_jobs()). Keys are the output mezzanine files, values are jobs, each a dictionary with 
+				"name" (str), "commands" (list of command lines to run in order), "weight" (see job_weight())
+				"cost" (see job_duration()), "generate" (bool, set when the first command generates the mezzanine),
+				"fingerprint" (see job_fingerprint(), None when not generating the mezzanine 
+				or when incremental generation is disabled) and "up_to_date" (bool).
+	:param codec: The output video codec used by the mezzanine generation script for the input source content,
+				"H.264" or "H.265" (see codec_selection), used to estimate the resources needed by each job.
+	:param incremental: Only generates the mezzanine streams whose fingerprint changed (see job_fingerprint()),
+						i.e. generated from a different source, with different parameters, assets or tools,
+						or that are missing. May be "enabled" or "disabled".
+	:param cpu_slots: The number of CPU slots the jobs are run with, None for the number of CPUs. 
+					The mezzanine generation script of each job uses as many workers as the CPU slots of the job
+					(see job_weight()), so the jobs run at the same time do not use more CPUs than the slots.
 	"""
 	
+	run = jobs is None
+	if run:
+		jobs = {}
+	if cpu_slots is None:
+		cpu_slots = os.cpu_count() or 1
+	
 	for res in resolutions.keys():
 		for variant in resolutions.get(res):
 			fps = variant[0]
@@ -51,18 +104,23 @@ def generate_streams(input, source_duration, mezzanine_gen_script, font, qr_posi
 			variant_label_range = range(nb_variant_labels)
 			for variant_label in list(variant_label_range): 
 				label_str = variant[3]+str(variant_label+1)
+				mezzanine_output = str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'.mp4'
 				if tonemap == 'enabled':
 					print('[->BT.709 SDR] ', end="")
 				if add_second_audio_track:
 					print(str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'_2ndAudio[English].mp4')
 				else:
-					print(str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'.mp4')
-				if not test:
-					if not add_second_audio_track \
-							or (add_second_audio_track
-								and not os.path.isfile(
-									str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'.mp4')):
-						subprocess.run(['python', mezzanine_gen_script, 
+					print(mezzanine_output)
+				
+				# The second audio track is added by the same job as its mezzanine, after the mezzanine is generated,
+				# the mezzanine is only generated once even when also listed without a second audio track
+				job = jobs.setdefault(mezzanine_output, {
+					'name': mezzanine_output, 'commands': [],
+					'weight': job_weight(int(res.split('x')[0]), int(res.split('x')[1]), codec),
+					'cost': {'codec': codec, 'pixels': int(res.split('x')[0])*int(res.split('x')[1]), 
+							 'frames': int(eval(fps)*duration), 'encode': False},
+					'generate': False, 'fingerprint': None, 'up_to_date': False})
+				mezzanine_command = ['python', str(mezzanine_gen_script), 
 									'--duration', str(duration),
 									'--framerate', fps,
 									'--label', label_str,
@@ -72,28 +130,510 @@ def generate_streams(input, source_duration, mezzanine_gen_script, font, qr_posi
 												   seek if x > ((int(seek.split(':')[0])*60*60+int(seek.split(':')[1])*60+int(seek.split(':')[2]))+duration)
 												   else '00:00:00')(source_duration)),
 									'--start-end-indicators', start_end_indicators,
-									'--font', font,
+									'--font', str(font),
 									'--window-len', str(window_len),
 									'--tonemap', tonemap,
 									'--version', str(version),
 									'--spec-version', str(specification_version),
 									'--metadata-only', metadata_only,
+									'--workers', str(min(job['weight']['cpus'], cpu_slots)),
 									str(input),
-									str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'.mp4'
-									])		
-					if add_second_audio_track:
-						subprocess.run(['python', second_audio_gen_script, 
-								str(output)+'_'+label_str+'_'+res+'@'+str(round(eval(fps), 3))+'_'+str(duration)+'.mp4'
-								])
+									mezzanine_output
+									]
+				if mezzanine_command not in job['commands'] and not job['up_to_date']:
+					if incremental == 'enabled' and metadata_only == 'disabled':
+						fingerprint = job_fingerprint(input, mezzanine_command, font, mezzanine_gen_script)
+						job['up_to_date'] = fingerprint_up_to_date(mezzanine_output, fingerprint)
+						generate = not job['up_to_date']
+					else:
+						fingerprint = None
+						generate = not add_second_audio_track or not os.path.isfile(mezzanine_output)
+					if generate:
+						job['commands'].insert(0, mezzanine_command)
+						job['cost']['encode'] = metadata_only == 'disabled'
+						job['generate'] = True
+						job['fingerprint'] = fingerprint
+				if job['up_to_date']:
+					print('  (up to date)')
+				if add_second_audio_track:
+					second_audio_output = mezzanine_output[:-len('.mp4')]+'_2ndAudio[English].mp4'
+					if not job['up_to_date'] or not os.path.isfile(second_audio_output):
+						job['commands'].append(['python', str(second_audio_gen_script), mezzanine_output])
+	
+	if run and not test:
+		print_job_summary(run_jobs(jobs.values(), 1))
+
+
+def source_codec(source_videoproperties_json, tonemap):
+	"""
+	Determines the output video codec used by the mezzanine generation script for a source.
+	
+	:param source_videoproperties_json: The ffprobe video stream properties of the source content.
+	:param tonemap: Tone mapping to BT.709 SDR setting, "enabled" or "disabled".
+	
+	:returns: "H.264" or "H.265".
+	"""
+	
+	stream = source_videoproperties_json['streams'][0]
+	if 'color_space' in stream and tonemap == 'disabled':
+		return codec_selection.get(stream['color_space'], 'H.265')
+	return 'H.264'
+
+
+def job_weight(width, height, codec):
+	"""
+	Estimates the resources used by a mezzanine generation job.
+	The CPU slots are the number of threads the encoder can keep busy, which depends on the frame height 
+	(see job_rows_per_thread), not on the frame rate: a higher frame rate makes the job longer, not wider.
+	
+	:param width: The horizontal resolution in pixels.
+	:param height: The vertical resolution in pixels.
+	:param codec: The output video codec, "H.264" or "H.265".
+	
+	:returns: Dictionary with "cpus" (number of CPU slots, at least 1, capped at the CPU slots available 
+			when the jobs are run, see select_jobs()) and "memory" (peak memory, in bytes).
+	"""
+	
+	return {'cpus': max(1, math.ceil(height/job_rows_per_thread[codec])),
+			'memory': job_memory_base+width*height*job_memory_per_pixel[codec]}
+
+
+def available_memory():
+	"""
+	:returns: The memory available for new processes (in bytes), or None when it cannot be determined.
+	"""
+	
+	try:
+		import psutil
+		return psutil.virtual_memory().available
+	except ImportError:
+		pass
+	try:
+		with open('/proc/meminfo', 'r') as meminfo:
+			for line in meminfo:
+				if line.startswith('MemAvailable:'):
+					return int(line.split()[1])*1024
+	except (OSError, ValueError):
+		pass
+	return None
+
+
+@lru_cache(maxsize=None)
+def file_sha256(filename, size, mtime):
+	# The size and modification time are part of the cache key, so a file modified after it was hashed is hashed again
+	file_hash = hashlib.sha256()
+	with open(filename, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			file_hash.update(block)
+	return file_hash.hexdigest()
+
+
+def file_fingerprint(filename):
+	"""
+	:param filename: The path to a file, or a name (e.g. a font name).
+	
+	:returns: The SHA-256 hash of the file, or the name when it is not a file.
+	"""
+	
+	if not os.path.isfile(filename):
+		return str(filename)
+	file_stat = os.stat(filename)
+	return file_sha256(str(filename), file_stat.st_size, file_stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def tool_version(mezzanine_gen_script):
+	"""
+	:param mezzanine_gen_script: The path to the mezzanine generation Python script.
+	
+	:returns: The version of the tools used to generate the mezzanine streams: a hash of the mezzanine generation script 
+			and of the Python modules it uses, followed by the first line of the ffmpeg version.
+	"""
+	
+	tool_hash = hashlib.sha256()
+	script_dir = Path(mezzanine_gen_script).resolve().parent
+	for filename in [Path(mezzanine_gen_script)]+sorted(
+			f for module_dir in tool_module_dirs for f in Path(script_dir, module_dir).glob('*.py')):
+		tool_hash.update(file_fingerprint(filename).encode('utf-8'))
+	try:
+		ffmpeg_version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+	except OSError:
+		ffmpeg_version = ''
+	return tool_hash.hexdigest()+' '+ffmpeg_version
+
+
+def job_fingerprint(input, mezzanine_command, font, mezzanine_gen_script):
+	"""
+	Determines the fingerprint of a mezzanine generation job: everything the generated mezzanine stream depends on.
+	
+	:param input: The path to the source content.
+	:param mezzanine_command: The mezzanine generation command line.
+	:param font: The path to/name of the font file used when generating the annotations.
+	:param mezzanine_gen_script: The path to the mezzanine generation Python script.
+	
+	:returns: Dictionary with "source" (hash of the source content), "arguments" (mezzanine generation script arguments
+			but the number of workers), "assets" (hashes of the font and boundary markers files) and "tool" (see tool_version()).
+	"""
+	
+	# The number of workers only changes how fast the stream is generated, e.g. when the CPU slots change
+	arguments = [str(arg) for arg in mezzanine_command[2:]]
+	if '--workers' in arguments:
+		del arguments[arguments.index('--workers'):arguments.index('--workers')+2]
+	
+	return {'source': file_fingerprint(input), 'arguments': arguments,
+			'assets': {'font': file_fingerprint(font), 
+					   'boundaries': file_fingerprint(Path(mezzanine_gen_script).parent.joinpath(boundaries))},
+			'tool': tool_version(str(mezzanine_gen_script))}
+
+
+def fingerprint_filename(mezzanine_output):
+	# Stored next to the mezzanine metadata JSON file (<mezzanine_stream_name>.json)
+	return Path(mezzanine_output).with_name(Path(mezzanine_output).stem+'_fingerprint.json')
+
+
+def output_state(mezzanine_output):
+	"""
+	:param mezzanine_output: The path to the mezzanine stream.
+	
+	:returns: Dictionary with the "size" and "mtime" (in nanoseconds) of the mezzanine stream, 
+			and the "md5" recorded in its metadata JSON file, or None when either of them is missing or invalid.
+	"""
+	
+	# Same path as the metadata JSON file written by mezzanine.py
+	metadata_filepath = Path(str(Path(mezzanine_output).parent)+'\\'+str(Path(mezzanine_output).stem)+'.json')
+	try:
+		output_stat = os.stat(mezzanine_output)
+		with open(metadata_filepath, 'r') as metadata_file:
+			md5 = json.load(metadata_file)['Mezzanine']['md5']
+	except (OSError, ValueError, KeyError, TypeError):
+		return None
+	return {'size': output_stat.st_size, 'mtime': output_stat.st_mtime_ns, 'md5': md5}
+
+
+def fingerprint_up_to_date(mezzanine_output, fingerprint):
+	"""
+	:param mezzanine_output: The path to the mezzanine stream.
+	:param fingerprint: The fingerprint of the job generating it (see job_fingerprint()).
+	
+	:returns: True when the mezzanine stream and its metadata exist, were generated by a job with the same fingerprint,
+			and were not modified or replaced since (see output_state()).
+	"""
+	
+	state = output_state(mezzanine_output)
+	if state is None:
+		return False
+	try:
+		with open(fingerprint_filename(mezzanine_output), 'r') as fingerprint_file:
+			stored = json.load(fingerprint_file)
+	except (OSError, ValueError):
+		return False
+	return isinstance(stored, dict) and stored.get('fingerprint') == fingerprint and stored.get('output') == state
+
+
+def load_job_history(filename):
+	"""
+	:param filename: The path to the job history file (JSON).
+	
+	:returns: List of the jobs recorded in the job history file (see record_job_history()), 
+			empty when the file does not exist or is invalid.
+	"""
+	
+	try:
+		with open(filename, 'r') as history_file:
+			return json.load(history_file)
+	except (OSError, ValueError):
+		return []
+
+
+def record_job_history(filename, jobs, results, cpu_slots):
+	"""
+	Adds the jobs that generated a mezzanine stream successfully to the job history file, 
+	keeping the job_history_max most recent jobs for each codec.
+	Each record has the duration of the mezzanine generation command only (not of the second audio track), 
+	the CPU slots planned for the job and the largest number of jobs that ran at the same time as it.
+	
+	:param filename: The path to the job history file (JSON).
+	:param jobs: Dictionary of the jobs, see generate_streams().
+	:param results: List of the results of each job (see run_job() and run_jobs()).
+	:param cpu_slots: The number of CPU slots the jobs were run with.
+	"""
+	
+	history = load_job_history(filename)
+	for result in results:
+		cost = jobs[result['name']].get('cost')
+		if result['returncode'] == 0 and cost is not None and cost['encode'] \
+				and result.get('generate_duration') is not None:
+			history.append({'codec': cost['codec'], 'pixels': cost['pixels'], 'frames': cost['frames'], 
+							'cpus': min(jobs[result['name']]['weight']['cpus'], cpu_slots), 
+							'concurrent': result.get('concurrent', 1),
+							'duration': round(result['generate_duration'], 3)})
+	history = [record for i, record in enumerate(history) 
+			   if len([r for r in history[i:] if r['codec'] == record['codec']]) <= job_history_max]
+	
+	os.makedirs(Path(filename).parent, exist_ok=True)
+	with open(filename, 'w') as history_file:
+		json.dump(history, history_file, indent=4)
+
+
+def job_cost_model(history):
+	"""
+	Fits the cost model to the recorded jobs: the CPU time (duration multiplied by the number of CPU slots) 
+	of a job is a linear function of the number of pixels of all its frames, for each codec.
+	This is an approximation: the CPU time is estimated from the wall time and the CPU slots planned for the job,
+	i.e. the encoder is assumed to scale linearly up to these slots and to use no idle CPU beyond them.
+	The durations recorded include the slowdown caused by the jobs that ran at the same time (memory bandwidth, 
+	disk), so the predictions match runs with a similar number of concurrent jobs best.
+	
+	:param history: List of the recorded jobs (see load_job_history()).
+	
+	:returns: Dictionary with the codecs as keys and (CPU seconds per pixel per frame, CPU seconds per job) as values.
+	"""
+	
+	model = {}
+	for codec, cost_per_pixel_frame in job_cost_per_pixel_frame.items():
+		records = [record for record in history if record['codec'] == codec]
+		x = [record['pixels']*record['frames'] for record in records]
+		y = [record['duration']*record['cpus'] for record in records]
+		model[codec] = (cost_per_pixel_frame, job_cost_overhead)
+		if len(set(x)) >= 2:
+			# Least squares fit
+			n = len(x)
+			slope = (n*sum(xi*yi for xi, yi in zip(x, y))-sum(x)*sum(y))/(n*sum(xi*xi for xi in x)-sum(x)**2)
+			if slope > 0:
+				model[codec] = (slope, max(0, (sum(y)-slope*sum(x))/n))
+		elif len(x) == 1 and y[0] > job_cost_overhead:
+			model[codec] = ((y[0]-job_cost_overhead)/x[0], job_cost_overhead)
+	return model
+
+
+def job_duration(job, model, cpu_slots):
+	"""
+	Predicts the duration of a job using the cost model.
+	The speedup is assumed linear in the CPU slots of the job (see job_cost_model()), which underestimates 
+	the duration of jobs with many CPU slots when the encoder threads do not keep all of them busy.
+	
+	:param job: Dictionary with "weight" (see job_weight()) and "cost", a dictionary with "codec", "pixels" 
+				(per frame), "frames" and "encode" (whether the job generates a mezzanine stream), see generate_streams().
+	:param model: The cost model (see job_cost_model()).
+	:param cpu_slots: The number of CPU slots.
+	
+	:returns: The predicted duration of the job, in seconds.
+	"""
+	
+	cost_per_pixel_frame, overhead = model[job['cost']['codec']]
+	if not job['cost']['encode']:
+		return overhead 	# Only adds a second audio track, or only (re)generates the metadata
+	return (cost_per_pixel_frame*job['cost']['pixels']*job['cost']['frames']+overhead) \
+		/ max(1, min(job['weight']['cpus'], cpu_slots))
+
+
+def simulate_jobs(jobs, durations, nb_jobs, cpu_slots, max_memory):
+	"""
+	Simulates running jobs with run_jobs(), using their predicted durations.
+	
+	:param jobs: List of jobs, in the order they are run (see generate_streams()).
+	:param durations: Dictionary with the job names as keys and the predicted durations (in seconds) as values.
+	:param nb_jobs: The maximum number of jobs to run at the same time, 0 for no limit other than the resources.
+	:param cpu_slots: The number of CPU slots.
+	:param max_memory: The memory (in bytes) the jobs may use, None for no limit.
+	
+	:returns: The predicted total duration (in seconds) and a dictionary with the job names as keys 
+			and the predicted start times (in seconds) as values.
+	"""
+	
+	pending = list(jobs)
+	running = [] 	# (end time, job)
+	starts = {}
+	now = 0
+	backfilled = 0
+	while len(pending) > 0 or len(running) > 0:
+		selected, backfilled = select_jobs(pending, [job for end, job in running], 
+										   nb_jobs if nb_jobs > 0 else cpu_slots, cpu_slots, max_memory, backfilled)
+		for job in selected:
+			starts[job['name']] = now
+			running.append((now+durations[job['name']], job))
+		now = min(end for end, job in running)
+		running = [(end, job) for end, job in running if end > now]
+	return now, starts
+
+
+def run_job(job, log=False):
+	"""
+	Runs the command lines of a job in order, stopping at the first one that fails.
+	
+	:param job: Dictionary with "name" (str), "commands" (list of command lines), "generate" and "fingerprint",
+				see generate_streams().
+	:param log: When this flag (bool) is set, the output of the commands is written to a log file 
+				named after the job (<name>.log) instead of the console.
+	
+	:returns: Dictionary with "name", "returncode" (of the last command run), "command" (the last command run),
+			"duration" (in seconds), "generate_duration" (of the mezzanine generation command in seconds, 
+			None when the job does not generate the mezzanine) and "log" (the log file, or None).
+	"""
+	
+	start = time.perf_counter()
+	generate_duration = None
+	returncode = 0
+	command = None
+	log_filename = str(Path(job['name']).with_suffix('.log')) if log else None
+	log_file = open(log_filename, 'w') if log else None
+	try:
+		for n, command in enumerate(job['commands']):
+			# Any previous fingerprint is removed before the mezzanine (the first command) is generated,
+			# and the new one is only stored once the mezzanine is generated successfully
+			if n == 0 and job.get('generate', False):
+				try:
+					os.remove(fingerprint_filename(job['name']))
+				except FileNotFoundError:
+					pass
+			command_start = time.perf_counter()
+			returncode = subprocess.run(command, stdout=log_file, stderr=subprocess.STDOUT if log else None).returncode
+			if n == 0 and job.get('generate', False):
+				generate_duration = time.perf_counter()-command_start
+			if returncode != 0:
+				break
+			# The fingerprint is stored with the state of the generated stream and metadata, 
+			# so that a stream modified or replaced afterwards is generated again
+			if n == 0 and job.get('fingerprint') is not None:
+				with open(fingerprint_filename(job['name']), 'w') as fingerprint_file:
+					json.dump({'fingerprint': job['fingerprint'], 'output': output_state(job['name'])}, 
+							  fingerprint_file, indent=4)
+	finally:
+		if log_file is not None:
+			log_file.close()
+	return {'name': job['name'], 'returncode': returncode, 'command': command, 
+			'duration': time.perf_counter()-start, 'generate_duration': generate_duration, 'log': log_filename}
+
+
+def select_jobs(pending, running, nb_jobs, cpu_slots, max_memory, backfilled, memory=None):
+	"""
+	Selects the pending jobs to start, in order, as long as the resources they need are available (see job_weight()):
+	the CPU slots of the running jobs must not exceed cpu_slots, and their memory must not exceed max_memory 
+	nor the memory currently available. Smaller jobs may start before a job waiting for resources, 
+	up to job_backfill_limit of them, then no other job starts until it is started. 
+	A job is always started when no other job is running, even when it needs more resources than available.
+	A job never counts for more than cpu_slots CPU slots, as the encoder does not use more threads than CPUs.
+	
+	:param pending: List of the jobs waiting to start, in order. The selected jobs are removed from it.
+	:param running: List of the jobs running.
+	:param nb_jobs: The maximum number of jobs to run at the same time.
+	:param cpu_slots: The number of CPU slots.
+	:param max_memory: The memory (in bytes) the jobs may use, None for no limit.
+	:param backfilled: The number of jobs started while the first pending job was waiting for resources.
+	:param memory: Function returning the memory currently available (see available_memory()), None for no check.
+	
+	:returns: The list of the jobs to start and the updated number of jobs started while the first pending job
+			was waiting for resources.
+	"""
+	
+	default_weight = {'cpus': 1, 'memory': 0}
+	committed = [job.get('weight', default_weight) for job in running]
+	
+	def admissible(weight):
+		if len(committed) == 0:
+			return True
+		if len(committed) >= nb_jobs or \
+				sum(min(w['cpus'], cpu_slots) for w in committed)+min(weight['cpus'], cpu_slots) > cpu_slots:
+			return False
+		if max_memory is not None and sum(w['memory'] for w in committed)+weight['memory'] > max_memory:
+			return False
+		available = memory() if memory is not None else None
+		return available is None or weight['memory'] <= available
+	
+	selected = []
+	for job in list(pending):
+		if admissible(job.get('weight', default_weight)):
+			if job is not pending[0]:
+				backfilled += 1
+			else:
+				backfilled = 0
+			pending.remove(job)
+			selected.append(job)
+			committed.append(job.get('weight', default_weight))
+		elif job is pending[0] and backfilled >= job_backfill_limit:
+			break
+	return selected, backfilled
+
+
+def run_jobs(jobs, nb_jobs, cpu_slots=None, max_memory=None):
+	"""
+	Runs jobs concurrently, each in a thread waiting for the commands of the job.
+	The commands of a job are always run in order, e.g. the second audio track is only added once its mezzanine is ready.
+	Jobs are started in order, when the resources they need are available (see select_jobs()).
+	
+	:param jobs: Iterable of jobs, see generate_streams().
+	:param nb_jobs: The maximum number of jobs to run at the same time, 0 for no limit other than the resources.
+					When not 1, the output of each job is written to a log file (see run_job()).
+	:param cpu_slots: The number of CPU slots, None for the number of CPUs.
+	:param max_memory: The memory (in bytes) the jobs may use, None for the memory available when starting.
+	
+	:returns: List of the results of each job, in the order the jobs finished (see run_job()), 
+			with "concurrent", the largest number of jobs running at the same time while the job ran.
+	"""
+	
+	pending = [job for job in jobs if len(job['commands']) > 0]
+	total = len(pending)
+	if cpu_slots is None:
+		cpu_slots = os.cpu_count() or 1
+	if max_memory is None:
+		max_memory = available_memory()
+		if max_memory is None:
+			print("Warning: the available memory cannot be determined (install psutil), "
+				  "concurrent jobs are only limited by the number of jobs and CPU slots. "
+				  "Use --max-memory to set the memory the jobs may use.")
+	if nb_jobs <= 0:
+		nb_jobs = cpu_slots
+	
+	results = []
+	running = {}
+	concurrent = {}
+	backfilled = 0
+	with ThreadPoolExecutor(max_workers=max(1, min(nb_jobs, total))) as executor:
+		while len(pending) > 0 or len(running) > 0:
+			selected, backfilled = select_jobs(pending, list(running.values()), nb_jobs, cpu_slots, max_memory, 
+											   backfilled, available_memory)
+			for job in selected:
+				running[executor.submit(run_job, job, nb_jobs != 1)] = job
+				print("Started: "+job['name']+" ("+str(min(job.get('weight', {}).get('cpus', 1), cpu_slots))+" CPU slot(s), "
+					  +str(round(job.get('weight', {}).get('memory', 0)/1024**3, 1))+"GB)")
+			for future in running:
+				concurrent[future] = max(concurrent.get(future, 0), len(running))
+			
+			done, not_done = wait(running.keys(), return_when=FIRST_COMPLETED)
+			for future in done:
+				del running[future]
+				result = dict(future.result(), concurrent=concurrent.pop(future))
+				results.append(result)
+				print('['+str(len(results))+'/'+str(total)+'] '
+					  +{True: 'Done', False: 'FAILED'}[result['returncode'] == 0]+' ('+str(round(result['duration']))+'s): '
+					  +result['name'])
+	return results
+
+
+def print_job_summary(results):
+	"""
+	Prints the number of jobs that succeeded and failed, with the failed command and log file of each failed job.
+	
+	:param results: List of the results of each job (see run_job()).
+	
+	:returns: The number of jobs that failed.
+	"""
+	
+	failed = [result for result in results if result['returncode'] != 0]
+	print()
+	print("Summary: "+str(len(results)-len(failed))+" job(s) succeeded, "+str(len(failed))+" job(s) failed.")
+	for result in failed:
+		print("! "+result['name']+": "+' '.join(result['command'])+" returned "+str(result['returncode'])
+			  +(" (see "+result['log']+")" if result['log'] is not None else ""))
+	return len(failed)
 
 
 if __name__ == "__main__":
 
 	import argparse
-	import json
 	import sys
 	
-	from pathlib import Path
+	from datetime import timedelta
 	
 	# Default parameters
 	
@@ -157,9 +697,63 @@ if __name__ == "__main__":
 	version = 0
 	specification_version = 0
 	
+	# Number of mezzanine streams generated at the same time, 
+	# limited by the CPU slots and memory needed by each stream (see job_weight())
+	nb_jobs = 1
+	cpu_slots = os.cpu_count() or 1
+	max_memory = None 	# Memory available when starting
+	
+	# Incremental generation: only generates the streams whose fingerprint changed (see job_fingerprint())
+	incremental = 'enabled'
+	
+	# Durations of the previous jobs, used to predict the duration of each job (see job_cost_model())
+	job_history_file = Path('_mezzanine_cache', 'metamezz_history.json')
+	
 	# Basic argument handling
 	parser = argparse.ArgumentParser(description="WAVE Mezzanine Batch Content Creator.")
 	
+	parser.add_argument(
+		'--cpu-slots', 
+		required=False, 
+		type=int, 
+		help="The number of CPU slots shared by the mezzanine streams generated at the same time, "
+			 "each stream uses slots depending on its resolution and codec, and as many mezzanine.py workers. "
+			 "Default: "+str(cpu_slots))
+	
+	parser.add_argument(
+		'--incremental', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Only generates the mezzanine streams that are missing or whose fingerprint changed, i.e. "
+			 "generated from a different source, with different parameters, font, boundary markers or tools. "
+			 "The fingerprint is stored next to the mezzanine JSON metadata (<mezzanine_stream_name>_fingerprint.json), "
+			 "with the size and modification time of the stream and its metadata MD5, so that streams modified or replaced "
+			 "since they were generated are generated again. "
+			 "May be \"enabled\" or \"disabled\". Default: "+incremental)
+	
+	parser.add_argument(
+		'-j', '--jobs', 
+		required=False, 
+		type=int, 
+		help="The maximum number of mezzanine streams to generate at the same time, 0 for no limit other than "
+			 "the CPU slots and memory available. Streams only start when the CPU slots and memory they need are available. "
+			 "When not 1, the output of each stream generation is written to a log file named after the stream. "
+			 "Default: "+str(nb_jobs))
+	
+	parser.add_argument(
+		'--job-history', 
+		required=False, 
+		help="JSON file in which the durations of the mezzanine streams generated are recorded, "
+			 "used to predict the duration of each stream, so the longest streams are generated first. "
+			 "Default: "+str(job_history_file))
+	
+	parser.add_argument(
+		'--max-memory', 
+		required=False, 
+		type=float, 
+		help="The memory (in GB) shared by the mezzanine streams generated at the same time, "
+			 "each stream uses memory depending on its resolution and codec. Default: the memory available when starting")
+	
 	parser.add_argument(
 		'-m', '--metadata-only', 
 		required=False, 
@@ -224,6 +818,21 @@ if __name__ == "__main__":
 	
 	args = parser.parse_args()
 	
+	if args.cpu_slots is not None:
+		cpu_slots = args.cpu_slots
+	
+	if args.incremental is not None:
+		incremental = args.incremental
+	
+	if args.jobs is not None:
+		nb_jobs = args.jobs
+	
+	if args.job_history is not None:
+		job_history_file = Path(args.job_history)
+	
+	if args.max_memory is not None:
+		max_memory = int(args.max_memory*1024**3)
+	
 	if args.metadata_only is not None:
 		metadata_only = args.metadata_only
 	
@@ -339,6 +948,8 @@ if __name__ == "__main__":
 	print("Generating annotated mezzanine streams:")
 	
 	# For each of the input source files, generate all the combinations defined in the resolutions parameter
+	# The jobs generating the streams are collected first, then run concurrently
+	jobs = {}
 	for i, input in enumerate(inputs):
 		# Get the input source file video properties using ffprobe, as the duration is needed
 		source_videoproperties = subprocess.check_output(
@@ -362,14 +973,41 @@ if __name__ == "__main__":
 					for resolutions_group in resolutions:
 						generate_streams(input, source_duration, mezzanine_gen_script, font, qr_positions, resolutions_group,
 										start_end_indicators, window_len, tonemap[0], version, specification_version, metadata_only, outputs[0],
-										second_audio_gen_script, test)
+										second_audio_gen_script, test, jobs, source_codec(source_videoproperties_json, tonemap[0]), incremental, cpu_slots)
 				# If there are multiple input files and JSON files containing the resolutions, we match them in order
 				else:
 					generate_streams(input, source_duration, mezzanine_gen_script, font, qr_positions, resolutions[i],
 									start_end_indicators, window_len, tonemap[j], version, specification_version, metadata_only, outputs[i],
-									second_audio_gen_script, test)
+									second_audio_gen_script, test, jobs, source_codec(source_videoproperties_json, tonemap[j]), incremental, cpu_slots)
 			# Handle a single JSON file/object containing the resolutions
 			else:
 				generate_streams(input, source_duration, mezzanine_gen_script, font, qr_positions, resolutions,
 								start_end_indicators, window_len, tonemap[j], version, specification_version, metadata_only, outputs[i],
-								second_audio_gen_script, test)
+								second_audio_gen_script, test, jobs, source_codec(source_videoproperties_json, tonemap[j]), incremental, cpu_slots)
+	
+	# Predict the duration of each job using the cost model calibrated with the durations of previous jobs,
+	# and run the longest jobs first, so the total duration is not extended by a long job started last
+	cost_model = job_cost_model(load_job_history(job_history_file))
+	durations = {job['name']: job_duration(job, cost_model, cpu_slots) for job in jobs.values()}
+	ordered_jobs = sorted([job for job in jobs.values() if len(job['commands']) > 0], 
+						  key=lambda job: durations[job['name']], reverse=True)
+	total_duration, starts = simulate_jobs(ordered_jobs, durations, nb_jobs, cpu_slots, 
+										   max_memory if max_memory is not None else available_memory())
+	print()
+	if incremental == 'enabled':
+		print(str(len([job for job in jobs.values() if job['up_to_date']]))+" mezzanine stream(s) up to date, "
+			  +str(len([job for job in jobs.values() if job['cost']['encode']]))+" to generate.")
+	if test:
+		print("Predicted durations (start time + duration):")
+		for job in ordered_jobs:
+			print(str(timedelta(seconds=round(starts[job['name']])))+' + '
+				  +str(timedelta(seconds=round(durations[job['name']])))+' '+job['name'])
+	print("Predicted total duration: "+str(timedelta(seconds=round(total_duration)))
+		  +" ("+str(nb_jobs if nb_jobs > 0 else 'unlimited')+" job(s), "+str(cpu_slots)+" CPU slot(s))")
+	
+	if not test:
+		print()
+		results = run_jobs(ordered_jobs, nb_jobs, cpu_slots, max_memory)
+		record_job_history(job_history_file, jobs, results, cpu_slots)
+		if print_job_summary(results) > 0:
+			sys.exit("Mezzanine creation failed for some streams.")
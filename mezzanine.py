@@ -9,14 +9,21 @@ import os
 import re
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 
-import qrcode
-
-from bp_gen.bitpattern import bp_create
+from avsync_gen.avsync import avsync_cache_entry, avsync_cache_load, avsync_cache_store, avsync_files, avsync_read_chunks
+from bp_gen.bitpattern import bp_frames, bp_generate, bp_template
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from decimal import *
 from json import JSONEncoder
+from overlay_gen.annotations import annotation_frames, annotation_generate, annotation_layout
+from overlay_gen.overlay import overlay_cache_filename, overlay_generate
+from overlay_gen.sidecar import sidecar_filename, sidecar_generate
 from pathlib import Path
+from qr_gen.qrcodes import qr_file_ext, qr_frames, qr_generate, qr_payloads
 from shutil import which
 
 
@@ -191,881 +198,1287 @@ class MezzanineEncoder(JSONEncoder):
 		return JSONEncoder.default(self, o)
 
 
+def pipe_frames(pipe_filename, frames):
+	# Writes raw frames to a named pipe read by ffmpeg, generation and encoding overlap as the pipe has a limited size
+	try:
+		with open(pipe_filename, 'wb') as pipe:
+			for frame in frames:
+				pipe.write(frame)
+	except BrokenPipeError:
+		pass 	# ffmpeg stops reading once the output duration is reached
+
+
+def write_stdin(proc, chunks):
+	# Writes chunks of data to the standard input of a process, which may stop reading before the end
+	# (e.g. ffmpeg reading -t seconds). Chunks can be generated lazily, so the data is never held in memory in full.
+	try:
+		for chunk in chunks:
+			proc.stdin.write(chunk)
+		proc.stdin.close()
+	except BrokenPipeError:
+		pass
+
+
+def unblock_pipe(pipe_filename):
+	# Opening a named pipe for writing blocks until it is opened for reading.
+	# Ensures writers do not wait forever when ffmpeg exited before opening all its inputs.
+	try:
+		os.close(os.open(pipe_filename, os.O_RDONLY | os.O_NONBLOCK))
+	except OSError:
+		pass
+
+
+def beep_expression(beep_ranges, period_samples, tone_hz, amplitude):
+	# Builds an aevalsrc expression synthesizing the beeps: a tone starting at phase 0 at the start of each beep,
+	# silence in between. Beeps are looked up using a binary tree of comparisons on the sample number within the period,
+	# so only a few comparisons are evaluated per sample, whatever the number of beeps.
+	# The sample number within the period is stored in variable 0.
+	def lookup(first, last):
+		if last-first == 1:
+			start, end = beep_ranges[first]
+			return 'if(between(ld(0),'+str(start)+','+str(end-1)+'),sin(2*PI*'+str(tone_hz)+'*(ld(0)-'+str(start)+')/s),0)'
+		middle = (first+last)//2
+		return 'if(lt(ld(0),'+str(beep_ranges[middle][0])+'),'+lookup(first, middle)+','+lookup(middle, last)+')'
+
+	if len(beep_ranges) == 0:
+		return '0'
+	return 'st(0,mod(n,'+str(period_samples)+'));'+str(amplitude/32768)+'*'+lookup(0, len(beep_ranges))
+
+
+def run_stages(stages):
+	# Runs the stages of a mezzanine job concurrently, each stage starts as soon as the stages it depends on are done.
+	# Stages are provided as a dict of name: (function, [names of the stages it depends on]),
+	# in an order where dependencies come before the stages depending on them.
+	# Returns the start and end wall clock time of each stage, in seconds since the stages were started.
+	start_time = time.perf_counter()
+	stage_futures = {}
+	stage_timings = {}
+
+	def run_stage(name, function, dependencies):
+		for dependency in dependencies:
+			stage_futures[dependency].result() 	# Raises the exception of a failed dependency
+		stage_timings[name] = (time.perf_counter()-start_time, None)
+		function()
+		stage_timings[name] = (stage_timings[name][0], time.perf_counter()-start_time)
+
+	with ThreadPoolExecutor(max_workers=max(1, len(stages))) as executor:
+		for name, (function, dependencies) in stages.items():
+			stage_futures[name] = executor.submit(run_stage, name, function, dependencies)
+		for stage_future in stage_futures.values():
+			stage_future.result()
+	return stage_timings
+
+
+def print_stage_timings(stages, stage_timings):
+	print("Stage wall times:")
+	for name, (stage_start, stage_end) in sorted(stage_timings.items(), key=lambda x: x[1][0]):
+		print("  {:<12}{:8.2f}s (from {:.2f}s to {:.2f}s)".format(name, stage_end-stage_start, stage_start, stage_end))
+	# The critical path ends with the last stage to finish, and goes through the dependency that finished last
+	name = max(stage_timings, key=lambda x: stage_timings[x][1])
+	critical_path = [name]
+	while len(stages[name][1]) > 0:
+		name = max(stages[name][1], key=lambda x: stage_timings[x][1])
+		critical_path.insert(0, name)
+	print("Critical path: "+" -> ".join(critical_path))
+
+
 # Video output encoding presets
 H264 = ['libx264', '-preset', 'slower', '-crf', '5']
 H265 = ['libx265', '-preset', 'slower', '-crf', '5']
 
 
-# Check FFMPEG and FFPROBE are installed
-if which('ffmpeg') is None:
-	sys.exit("FFMPEG was not found, ensure FFMPEG is added to the system PATH or is in the same folder as this script.")
-if which('ffprobe') is None:
-	sys.exit("FFMPEG was not found, ensure FFPROBE is added to the system PATH or is in the same folder as this script.")
-
-
-# Default parameters
-# General mezzanine defaults
-duration = 60
-font = 'monospace'
-frame_number_padding = 7
-framerate = '30'
-label = 'mezz'
-resolution = '1920x1080'
-seek = '00:00:00.000'
-start_frame = 1 	# Set to 0 or 1. Determines starting point for annotations,
-					# i.e. frame 0 00:00:00 or frame 1 00:00:<frame duration>
-width = '' 		# Extracted from resolution string, see below
-height = '' 	# Extracted from resolution string, see below
-
-# Audio defaults
-audio_samplerate = 48000 	# Fixed audio sample rate in Hz (set to 0 to use source audio sample rate)
-
-# AV-sync flashes
-avsync_pattern_window_len = '5'
-avsync_metadata_filepath = Path('avsyncmetadata.json')
-beep_file = 'beeps.wav'
-beep_audio_samplerate = '48000'
-flash_file_dir = Path('_tmp_flash')
-test_sequence_gen_script = Path('test_sequence_gen/src/generate.py')  # Script used to generate AV-sync flashes & beeps
-
-# Bit pattern
-bitpat_file_dir = Path('_tmp_bp')
-
-# Boundary indicators
-boundaries = Path('assets/boundaries.png')
-
-# Metadata
-metadata_gen_only = False 	# Flag to disable content generation and only (re)generate the JSON metadata.
-							# The source and output mezzanine files must both be present.
-mezz_version = 0
-mezz_specification_version = 0
-metadata_properties_range = {
-	'unknown': "unknown", 'unspecified': "unknown",
-	'limited': "limited", 'tv': "limited", 'mpeg': "limited",
-	'full': "full", 'pc': "full", 'jpeg': "full"} 	# Mapping source range terminology to unknown/limited/full
-mezz_source_cdn_path = 'https://dash-large-files.akamaized.net/WAVE/Original/' 	# Mezzanine source file URI prefix
-output_video_codec_name = {
-	'libx264': "H.264",
-	'libx265': "H.265",
-	'prores': "ProRes",
-	'prores-aw': "ProRes", 'prores-ks': "ProRes"} 	# Mapping between encoder and codec for metadata output
-
-# Output video encoding command line
-output_video_encoding_cl = H265		# Defined based on original source content colorspace, default H.265/HEVC
-output_video_encoding_selection = {
-	'bt2020nc': H265, 'bt709': H264,
-	'bt470bg': H264, 'smpte170m': H264} 	# Mapping between source content colorspace and output video codec
-
-# QR codes
-qr_file_dir = Path('_tmp_qr')
-qr_positions = 4
-
-# Start/end indicator frame configuration
-start_indicator_nb_frames = 0		# Number of frames used for the start indicator,
-									# default 0, value is calculated based on start/end indicator argument
-end_indicator_nb_frames = 0			# Number of frames used for the end indicator,
-									# default 0, value is calculated based on start/end indicator argument
-start_end_indicators = 'disabled'
-start_end_indicator_nb_frames = 1 	# Number of indicator frames to insert at the start and/or end
-start_end_indicators_cl = [] 		# Input content ffmpeg parameters,
+if __name__ == "__main__":
+
+	# Check FFMPEG and FFPROBE are installed
+	if which('ffmpeg') is None:
+		sys.exit("FFMPEG was not found, ensure FFMPEG is added to the system PATH or is in the same folder as this script.")
+	if which('ffprobe') is None:
+		sys.exit("FFMPEG was not found, ensure FFPROBE is added to the system PATH or is in the same folder as this script.")
+
+
+	# Default parameters
+	# General mezzanine defaults
+	duration = 60
+	font = 'monospace'
+	frame_number_padding = 7
+	framerate = '30'
+	label = 'mezz'
+	resolution = '1920x1080'
+	seek = '00:00:00.000'
+	start_frame = 1 	# Set to 0 or 1. Determines starting point for annotations,
+						# i.e. frame 0 00:00:00 or frame 1 00:00:<frame duration>
+	width = '' 		# Extracted from resolution string, see below
+	height = '' 	# Extracted from resolution string, see below
+	tmp_suffix = '_'+str(os.getpid()) 	# Appended to temporary file and folder names, 
+										# so concurrent jobs (see metamezz.py --jobs) do not clash
+
+	# Audio defaults
+	audio_samplerate = 48000 	# Fixed audio sample rate in Hz (set to 0 to use source audio sample rate)
+
+	# AV-sync flashes
+	avsync_pattern_window_len = '5'
+	avsync_cache = 'enabled'
+	avsync_metadata_filepath = Path('avsyncmetadata.json')
+	beep_audio_samplerate = '48000'
+	beep_block_size = 65536 	# Number of beep audio samples generated and streamed to ffmpeg at a time
+	beep_file = Path('_tmp_beeps'+tmp_suffix+'.raw') 	# One period of the beeps, looped by ffmpeg when shorter than the duration
+	beep_synthesis = 'samples' 	# Generate the beep samples and feed them to ffmpeg ("samples"),
+								# or synthesize the beeps in the ffmpeg filter graph ("filter")
+	flash_cmd_file = Path('flashes'+tmp_suffix+'.cmd') 	# ffmpeg sendcmd script switching the flash on and off
+	test_sequence_gen_dir = Path(__file__).resolve().parent / 'test_sequence_gen' / 'src'  # Generates AV-sync flashes & beeps
+
+	# Bit pattern
+	bitpat_file_dir = Path('_tmp_bp'+tmp_suffix)
+	bitpattern_cache = 'enabled'
+
+	# Boundary indicators
+	boundaries = Path('assets/boundaries.png')
+	
+	# Caching of annotation images that can be reused across mezzanine streams, runs and releases
+	cache_dir = Path('_mezzanine_cache')
+	qr_cache = 'enabled'
+
+	# Metadata
+	metadata_gen_only = False 	# Flag to disable content generation and only (re)generate the JSON metadata.
+								# The source and output mezzanine files must both be present.
+	mezz_version = 0
+	mezz_specification_version = 0
+	frame_sidecar = 'disabled' 	# Binary file describing the annotations of each frame (see overlay_gen/sidecar.py)
+	metadata_properties_range = {
+		'unknown': "unknown", 'unspecified': "unknown",
+		'limited': "limited", 'tv': "limited", 'mpeg': "limited",
+		'full': "full", 'pc': "full", 'jpeg': "full"} 	# Mapping source range terminology to unknown/limited/full
+	mezz_source_cdn_path = 'https://dash-large-files.akamaized.net/WAVE/Original/' 	# Mezzanine source file URI prefix
+	output_video_codec_name = {
+		'libx264': "H.264",
+		'libx265': "H.265",
+		'prores': "ProRes",
+		'prores-aw': "ProRes", 'prores-ks': "ProRes"} 	# Mapping between encoder and codec for metadata output
+
+	# Output video encoding command line
+	output_video_encoding_cl = H265		# Defined based on original source content colorspace, default H.265/HEVC
+	output_video_encoding_selection = {
+		'bt2020nc': H265, 'bt709': H264,
+		'bt470bg': H264, 'smpte170m': H264} 	# Mapping between source content colorspace and output video codec
+
+	# QR codes
+	qr_file_dir = Path('_tmp_qr'+tmp_suffix)
+	qr_positions = 4
+	qr_raster = 'pil' 	# Draw QR codes using PIL and scale them using ffmpeg ("pil"),
+						# or rasterize them at their final size from the QR code matrix ("matrix")
+	qr_scale_cl = 'null' 	# QR code scaling ffmpeg parameters, depends on the QR code rasterization
+	
+	# Annotation frames (QR codes and bit patterns) transport to ffmpeg
+	annotation_transport = 'files' 	# Write image sequences to temporary folders read by ffmpeg ("files"), 
+									# or stream raw frames to ffmpeg through named pipes ("pipes")
+	annotation_compositing = 'disabled' 	# Composite the QR code and bit pattern of each frame into a single image
+										# overlayed once ("enabled"), or overlay them separately ("disabled")
+	annotation_file_dir = Path('_tmp_annotations'+tmp_suffix)
+	
+	# Parallel processing
+	workers = os.cpu_count() or 1 	# Number of worker processes used to generate the annotation images
+
+	# Start/end indicator frame configuration
+	start_indicator_nb_frames = 0		# Number of frames used for the start indicator,
+										# default 0, value is calculated based on start/end indicator argument
+	end_indicator_nb_frames = 0			# Number of frames used for the end indicator,
+										# default 0, value is calculated based on start/end indicator argument
+	start_end_indicators = 'disabled'
+	start_end_indicator_nb_frames = 1 	# Number of indicator frames to insert at the start and/or end
+	start_end_indicators_cl = [] 		# Input content ffmpeg parameters,
+										# depends on whether start_end_indicators are included or not
+	start_end_indicators_vmix_cl = '[content_video] concat=n=1:v=1:a=0 [video_with_start_indicator]; ' \
+									'[bg_video][video_with_start_indicator] overlay=[main_video];'
+									# Video mixing ffmpeg parameters,
+									# depends on whether start_end_indicators are included or not
+	start_end_indicators_amix_cl = '[audio_with_avsync] concat=n=1:v=0:a=1 [aout]'
+									# Audio mixing ffmpeg parameters,
 									# depends on whether start_end_indicators are included or not
-start_end_indicators_vmix_cl = '[content_video] concat=n=1:v=1:a=0 [video_with_start_indicator]; ' \
-								'[bg_video][video_with_start_indicator] overlay=[main_video];'
-								# Video mixing ffmpeg parameters,
-								# depends on whether start_end_indicators are included or not
-start_end_indicators_amix_cl = '[audio_with_avsync] concat=n=1:v=0:a=1 [aout]'
-								# Audio mixing ffmpeg parameters,
-								# depends on whether start_end_indicators are included or not
-start_indicator_offset = 0			# Defines the time offset for the start of the content
-									# when showing a start indicator, else 0
-start_indicator_color = '0x006400' 	# Color in hexadecimal 0xRRGGBB
-end_indicator_color = '0x8B0000' 	# Color in hexadecimal 0xRRGGBB
-
-# Tone-mapping
-tonemap = 'disabled'
-tonemap_cl = ''
-tonemap_cl_hdr2sdr = 'zscale=transfer=linear,tonemap=hable:desat=0,zscale=transfer=709,'
-					# Rudimentary tone mapping to BT.709 SDR from BT.2020 HDR
-tonemap_cl_non709 = 'zscale=primaries=709,zscale=matrix=709,zscale=transfer=709,' 	# Rudimentary conversion to BT.709
-
-
-# Basic argument handling
-parser = argparse.ArgumentParser(description="WAVE Mezzanine Content Creator.")
-
-parser.add_argument(
-	'-b', '--boundaries', 
-	required=False, 
-	help="Specifies a file that contains boundary markers. Default: "+str(boundaries))
+	start_indicator_offset = 0			# Defines the time offset for the start of the content
+										# when showing a start indicator, else 0
+	start_indicator_color = '0x006400' 	# Color in hexadecimal 0xRRGGBB
+	end_indicator_color = '0x8B0000' 	# Color in hexadecimal 0xRRGGBB
+
+	# Tone-mapping
+	tonemap = 'disabled'
+	tonemap_cl = ''
+	tonemap_cl_hdr2sdr = 'zscale=transfer=linear,tonemap=hable:desat=0,zscale=transfer=709,'
+						# Rudimentary tone mapping to BT.709 SDR from BT.2020 HDR
+	tonemap_cl_non709 = 'zscale=primaries=709,zscale=matrix=709,zscale=transfer=709,' 	# Rudimentary conversion to BT.709
+
+
+	# Basic argument handling
+	parser = argparse.ArgumentParser(description="WAVE Mezzanine Content Creator.")
+
+	parser.add_argument(
+		'--avsync-cache', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Reuses the A/V sync beeps, flashes and metadata generated by previous runs with the same frame rate, duration, "
+			 "window length and audio sample rate, stored in the cache folder. "
+			 "May be \"enabled\" or \"disabled\". Default: "+avsync_cache)
 	
-parser.add_argument(
-	'-d', '--duration', 
-	required=False, 
-	type=float, 
-	help="The duration, in seconds, of the source file to process from the seek position in. Default: "+str(duration))
+	parser.add_argument(
+		'--beep-synthesis', 
+		required=False, 
+		choices=['samples', 'filter'],
+		help="Generate the A/V sync beep samples and feed them to ffmpeg (\"samples\"), "
+			 "or synthesize the beeps from the beep timings in the ffmpeg filter graph (\"filter\"), "
+			 "without generating any beep samples. Filter synthesized samples may differ by 1 (16 bit) from the generated ones, "
+			 "as ffmpeg rounds where the generator truncates. Default: "+beep_synthesis)
 	
-parser.add_argument(
-	'-f', '--framerate', 
-	required=False, 
-	help="The target framerate of the output file. "
-		 "Fractional rates must be specified as division operations \"30000/1001\". Default: "+framerate)
+	parser.add_argument(
+		'--bitpattern-cache', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Reuses bit pattern images generated by previous runs (e.g. for another label variant), "
+			 "stored in the cache folder. May be \"enabled\" or \"disabled\". Default: "+bitpattern_cache)
 	
-parser.add_argument(
-	'--frame-number-padding', 
-	required=False, 
-	type=int, 
-	help="The amount of zero padding to use when displaying the current frame number. Default: "+str(frame_number_padding))
+	parser.add_argument(
+		'--annotation-compositing', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Composites the QR code and bit pattern of each frame into a single image, so ffmpeg only needs one overlay. "
+			 "Requires \"--qr-raster matrix\", which is used when \"--qr-raster\" is not set. "
+			 "May be \"enabled\" or \"disabled\". Default: "+annotation_compositing)
 	
-parser.add_argument(
-	'-l', '--label', 
-	required=False, 
-	help="Provide a label for this mezzanine, will exist in qrcodes and on-screen. Default: "+label)
-
-parser.add_argument(
-	'-m', '--metadata-only', 
-	required=False, 
-	choices=['enabled', 'disabled'],
-	help="Disables mezzanine generation and only (re)generates JSON metadata using an existing mezzanine file. "
-		 "The source and output mezzanine files must both be present at the paths provided. "
-		 "May be \"enabled\" or \"disabled\". Default: disabled")
-
-parser.add_argument(
-	'-q', '--qr-positions', 
-	required=False, 
-	type=int, choices=[2, 4],
-	help="The number of on-screen QR code positions to use, may be 2 or 4. Default: "+str(qr_positions))
+	parser.add_argument(
+		'--annotation-transport', 
+		required=False, 
+		choices=['files', 'pipes'],
+		help="Write the QR code and bit pattern frames to temporary image files read by ffmpeg, "
+			 "or stream raw frames to ffmpeg through named pipes while they are generated, without writing them to disk. "
+			 "Pipes require named pipe (FIFO) support and \"--qr-raster matrix\", which is used when \"--qr-raster\" is not set. "
+			 "May be \"files\" or \"pipes\". Default: "+annotation_transport)
 	
-parser.add_argument(
-	'-r', '--resolution', 
-	required=False, 
-	help="The target resolution of the output, video will be scaled and padded to fit resolution. "
-		 "Should be specified as \"<width>x<height>\". Default: "+resolution)
-
-parser.add_argument(
-	'-s', '--seek', 
-	required=False, 
-	help="Seeks the source file to a starting position. Format must follow ffmpeg -ss parameter. Default: "+seek)
-
-parser.add_argument(
-	'--spec-version', 
-	required=False, 
-	type=int, 
-	help="The version of the mezzanine annotation specification that the mezzanine generated will be compliant with. "
-		 "Default: "+str(mezz_specification_version))
-
-parser.add_argument(
-	'--start-end-indicators', 
-	required=False, 
-	choices=['enabled', 'disabled', 'start', 'end'],
-	help="Append a single frame before and after the source content, to signal the start and end of the test sequence. "
-		 "May be \"enabled\", \"disabled\", \"start\" (only) or \"end\" (only). Default: disabled")
+	parser.add_argument(
+		'-b', '--boundaries', 
+		required=False, 
+		help="Specifies a file that contains boundary markers. Default: "+str(boundaries))
 	
-parser.add_argument(
-	'-t', '--font', 
-	required=False, 
-	help="The font to utilize for drawing timecodes on frames, must be full path to file. Default: "+font)
-
-parser.add_argument(
-	'--tonemap', 
-	required=False, 
-	choices=['enabled', 'disabled'],
-	help="Enables rudimentary tone mapping of BT.2020nc HDR content to BT.709 SDR. Forces output in H.264/AVC. "
-		 "May be \"enabled\" or \"disabled\". Default: disabled")
+	parser.add_argument(
+		'--cache-dir', 
+		required=False, 
+		help="Folder used to cache annotation images and A/V sync assets that can be reused across runs and releases. "
+			 "Default: "+str(cache_dir))
+	
+	parser.add_argument(
+		'-d', '--duration', 
+		required=False, 
+		type=float, 
+		help="The duration, in seconds, of the source file to process from the seek position in. Default: "+str(duration))
+	
+	parser.add_argument(
+		'-f', '--framerate', 
+		required=False, 
+		help="The target framerate of the output file. "
+			 "Fractional rates must be specified as division operations \"30000/1001\". Default: "+framerate)
+	
+	parser.add_argument(
+		'--frame-sidecar', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Writes a memory-mappable NumPy file (<output>_frames.npy) with one row per frame containing "
+			 "the frame number, timecode, QR code position, bit pattern and A/V sync flash state, e.g. for test harnesses. "
+			 "The file is not part of the released mezzanine content. May be \"enabled\" or \"disabled\". Default: "+frame_sidecar)
+	
+	parser.add_argument(
+		'--frame-number-padding', 
+		required=False, 
+		type=int, 
+		help="The amount of zero padding to use when displaying the current frame number. Default: "+str(frame_number_padding))
+	
+	parser.add_argument(
+		'-l', '--label', 
+		required=False, 
+		help="Provide a label for this mezzanine, will exist in qrcodes and on-screen. Default: "+label)
+
+	parser.add_argument(
+		'-m', '--metadata-only', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Disables mezzanine generation and only (re)generates JSON metadata using an existing mezzanine file. "
+			 "The source and output mezzanine files must both be present at the paths provided. "
+			 "May be \"enabled\" or \"disabled\". Default: disabled")
+
+	parser.add_argument(
+		'-q', '--qr-positions', 
+		required=False, 
+		type=int, choices=[2, 4],
+		help="The number of on-screen QR code positions to use, may be 2 or 4. Default: "+str(qr_positions))
+	
+	parser.add_argument(
+		'--qr-cache', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Reuses QR code images rendered by previous runs, stored in the cache folder. "
+			 "May be \"enabled\" or \"disabled\". Default: "+qr_cache)
+	
+	parser.add_argument(
+		'--qr-raster', 
+		required=False, 
+		choices=['matrix', 'pil'],
+		help="Rasterize QR codes directly from the QR code matrix at their final on-screen size (\"matrix\"), "
+			 "or draw them using PIL and scale them using ffmpeg (\"pil\"). Default: "+qr_raster)
+	
+	parser.add_argument(
+		'-r', '--resolution', 
+		required=False, 
+		help="The target resolution of the output, video will be scaled and padded to fit resolution. "
+			 "Should be specified as \"<width>x<height>\". Default: "+resolution)
+
+	parser.add_argument(
+		'-s', '--seek', 
+		required=False, 
+		help="Seeks the source file to a starting position. Format must follow ffmpeg -ss parameter. Default: "+seek)
+
+	parser.add_argument(
+		'--spec-version', 
+		required=False, 
+		type=int, 
+		help="The version of the mezzanine annotation specification that the mezzanine generated will be compliant with. "
+			 "Default: "+str(mezz_specification_version))
+
+	parser.add_argument(
+		'--start-end-indicators', 
+		required=False, 
+		choices=['enabled', 'disabled', 'start', 'end'],
+		help="Append a single frame before and after the source content, to signal the start and end of the test sequence. "
+			 "May be \"enabled\", \"disabled\", \"start\" (only) or \"end\" (only). Default: disabled")
+	
+	parser.add_argument(
+		'-t', '--font', 
+		required=False, 
+		help="The font to utilize for drawing timecodes on frames, must be full path to file. Default: "+font)
+
+	parser.add_argument(
+		'--tonemap', 
+		required=False, 
+		choices=['enabled', 'disabled'],
+		help="Enables rudimentary tone mapping of BT.2020nc HDR content to BT.709 SDR. Forces output in H.264/AVC. "
+			 "May be \"enabled\" or \"disabled\". Default: disabled")
+
+	parser.add_argument(
+		'-v', '--version', 
+		required=False, 
+		type=int, 
+		help="The official mezzanine release version that the mezzanine generated are intended for. "
+			 "Default: "+str(mezz_version))
+
+	parser.add_argument(
+		'-w', '--window-len', 
+		required=False, 
+		help="Unique pattern window length (in seconds). Beep/flash sequence will repeat after 2^n -1 seconds. "
+			 "Default is "+avsync_pattern_window_len+", meaning the sequence repeats after "
+			 + str(2**int(avsync_pattern_window_len)-1)+" seconds.")
+
+	parser.add_argument(
+		'--workers', 
+		required=False, 
+		type=int, 
+		help="The number of worker processes (or threads) used to generate the QR code and bit pattern images. "
+			 "Default: number of CPU cores ("+str(workers)+")")
+	
+	parser.add_argument('input', help="Source file.")
+	parser.add_argument('output', help="Output file.")
 
-parser.add_argument(
-	'-v', '--version', 
-	required=False, 
-	type=int, 
-	help="The official mezzanine release version that the mezzanine generated are intended for. "
-		 "Default: "+str(mezz_version))
+	args = parser.parse_args()
 
-parser.add_argument(
-	'-w', '--window-len', 
-	required=False, 
-	help="Unique pattern window length (in seconds). Beep/flash sequence will repeat after 2^n -1 seconds. "
-		 "Default is "+avsync_pattern_window_len+", meaning the sequence repeats after "
-		 + str(2**int(avsync_pattern_window_len)-1)+" seconds.")
 
-parser.add_argument('input', help="Source file.")
-parser.add_argument('output', help="Output file.")
+	# Set parameters to values provided in arguments
+	if args.annotation_compositing is not None:
+		annotation_compositing = args.annotation_compositing
+	
+	if args.annotation_transport is not None:
+		annotation_transport = args.annotation_transport
+	
+	if args.window_len is not None:
+		avsync_pattern_window_len = args.window_len
 
-args = parser.parse_args()
+	if args.avsync_cache is not None:
+		avsync_cache = args.avsync_cache
+	
+	if args.beep_synthesis is not None:
+		beep_synthesis = args.beep_synthesis
+	
+	if args.bitpattern_cache is not None:
+		bitpattern_cache = args.bitpattern_cache
+	
+	if args.boundaries is not None:
+		boundaries = Path(args.boundaries)
 
+	if args.cache_dir is not None:
+		cache_dir = Path(args.cache_dir)
+	
+	if args.duration is not None:
+		duration = args.duration
 
-# Set parameters to values provided in arguments
-if args.window_len is not None:
-	avsync_pattern_window_len = args.window_len
+	if args.font is not None:
+		font = Path(args.font)
 
-if args.boundaries is not None:
-	boundaries = Path(args.boundaries)
+	if args.frame_sidecar is not None:
+		frame_sidecar = args.frame_sidecar
 
-if args.duration is not None:
-	duration = args.duration
+	if args.frame_number_padding is not None:
+		frame_number_padding = args.frame_number_padding
 
-if args.font is not None:
-	font = Path(args.font)
+	if args.framerate is not None:
+		framerate = args.framerate
 
-if args.frame_number_padding is not None:
-	frame_number_padding = args.frame_number_padding
+	if args.label is not None:
+		label = args.label
 
-if args.framerate is not None:
-	framerate = args.framerate
+	if args.metadata_only is not None:
+		if args.metadata_only == 'enabled':
+			metadata_gen_only = True
 
-if args.label is not None:
-	label = args.label
+	if args.qr_positions is not None:
+		qr_positions = args.qr_positions
+	
+	if args.qr_cache is not None:
+		qr_cache = args.qr_cache
+	
+	if args.qr_raster is not None:
+		qr_raster = args.qr_raster
 
-if args.metadata_only is not None:
-	if args.metadata_only == 'enabled':
-		metadata_gen_only = True
+	if args.resolution is not None:
+		resolution = args.resolution
 
-if args.qr_positions is not None:
-	qr_positions = args.qr_positions
+	if args.seek is not None:
+		seek = args.seek
+	
+	if args.spec_version is not None:
+		mezz_specification_version = args.spec_version
+	
+	if args.start_end_indicators is not None:
+		start_end_indicators = args.start_end_indicators
 
-if args.resolution is not None:
-	resolution = args.resolution
+	if args.tonemap is not None:
+		tonemap = args.tonemap
 
-if args.seek is not None:
-	seek = args.seek
+	if args.version is not None:
+		mezz_version = args.version
 	
-if args.spec_version is not None:
-	mezz_specification_version = args.spec_version
+	if args.workers is not None:
+		workers = max(1, args.workers)
 	
-if args.start_end_indicators is not None:
-	start_end_indicators = args.start_end_indicators
+	# Named pipes carry fixed size raw frames and composited annotation frames contain the QR codes as placed in the video,
+	# so QR codes have to be rasterized at their final size
+	if annotation_transport == 'pipes' and not hasattr(os, 'mkfifo'):
+		print("Named pipes are not supported on this platform, annotation frames will be written to files.")
+		annotation_transport = 'files'
+	if (annotation_transport == 'pipes' or annotation_compositing == 'enabled') and qr_raster != 'matrix':
+		if args.qr_raster is not None:
+			sys.exit("Named pipes and annotation compositing require QR codes rasterized from the QR code matrix, "
+					 "use \"--qr-raster matrix\".")
+		qr_raster = 'matrix'
+
+	# Check that source, boundaries and font files are present
+	input = Path(args.input)
+	if not os.path.isfile(input):
+		sys.exit("Source file \""+str(input)+"\" does not exist.")
+	
+	if not os.path.isfile(boundaries):
+		sys.exit("Boundaries image file \""+str(boundaries)+"\" does not exist.")
+	
+	if not os.path.isfile(font):
+		sys.exit("Font file \""+str(font)+"\" does not exist.")
+	else:
+		font_file = Path(font) 	# Used to render the static overlay layer
+		# Font file path formatting to accommodate ffmpeg/fontconfig required syntax 
+		if str(font)[1:3] == ':\\':
+			font = str(font).replace('\\', '/').replace(':', '\\:')
+		elif str(font)[0] != ('\\' and '/' and '.'):
+			font = './'+str(font).replace('\\', '/')
+		elif str(font)[0] == ('/' or '\\'):
+			font = '.'+str(font).replace('\\', '/')
+
+	# Create output file directory if it does not exist
+	output = Path(args.output)
+	if not os.path.isdir(output.parent):
+		try:
+			Path.mkdir(output.parent, parents=True)
+		except OSError:
+			print("Failed to create the directory for output mezzanine stream.")
 
-if args.tonemap is not None:
-	tonemap = args.tonemap
+	# Check that output exists if only (re)generating metadata
+	if metadata_gen_only and not os.path.isfile(output):
+		sys.exit("Mezzanine file \""+str(output)+"\" does not exist. \n"
+				"Cannot generate metadata without the corresponding mezzanine file. \n"
+				"Set --metadata-only to 'disabled' to generate mezzanine and metadata.")
 
-if args.version is not None:
-	mezz_version = args.version
+	# Set width and height based on resolution
+	width = resolution.split('x')[0]
+	height = resolution.split('x')[1]
 
-# Check that source, boundaries and font files are present
-input = Path(args.input)
-if not os.path.isfile(input):
-	sys.exit("Source file \""+str(input)+"\" does not exist.")
-	
-if not os.path.isfile(boundaries):
-	sys.exit("Boundaries image file \""+str(boundaries)+"\" does not exist.")
-	
-if not os.path.isfile(font):
-	sys.exit("Font file \""+str(font)+"\" does not exist.")
-else:
-	# Font file path formatting to accommodate ffmpeg/fontconfig required syntax 
-	if str(font)[1:3] == ':\\':
-		font = str(font).replace('\\', '/').replace(':', '\\:')
-	elif str(font)[0] != ('\\' and '/' and '.'):
-		font = './'+str(font).replace('\\', '/')
-	elif str(font)[0] == ('/' or '\\'):
-		font = '.'+str(font).replace('\\', '/')
-
-# Create output file directory if it does not exist
-output = Path(args.output)
-if not os.path.isdir(output.parent):
+
+	# Configure metadata output paths
+	avsync_metadata_filepath = Path(str(output.parent)+'\\'+str(output.stem)+'_avsync.json')
+	mezz_metadata_filepath = Path(str(output.parent)+'\\'+str(output.stem)+'.json')
+	frame_sidecar_filepath = sidecar_filename(output)
+
+	# Initialise mezzanine properties metadata
+	mezz_properties = MezzanineProperties(int(width), int(height), round(eval(framerate), 3))
+	mezz_properties.qr_positions = qr_positions
+	mezz_properties.label = label
+
+	# Set mezzanine source metadata
+	mezz_source_license = ""
 	try:
-		Path.mkdir(output.parent, parents=True)
+		mezz_source_license_file = open(str(Path(str(input.parent)+'\\'+input.stem+'_LICENSE.txt')), encoding="utf-8")
+		mezz_source_license = mezz_source_license_file.read()
 	except OSError:
-		print("Failed to create the directory for output mezzanine stream.")
-
-# Check that output exists if only (re)generating metadata
-if metadata_gen_only and not os.path.isfile(output):
-	sys.exit("Mezzanine file \""+str(output)+"\" does not exist. \n"
-			"Cannot generate metadata without the corresponding mezzanine file. \n"
-			"Set --metadata-only to 'disabled' to generate mezzanine and metadata.")
-
-# Set width and height based on resolution
-width = resolution.split('x')[0]
-height = resolution.split('x')[1]
-
-
-# Configure metadata output paths
-avsync_metadata_filepath = Path(str(output.parent)+'\\'+str(output.stem)+'_avsync.json')
-mezz_metadata_filepath = Path(str(output.parent)+'\\'+str(output.stem)+'.json')
-
-# Initialise mezzanine properties metadata
-mezz_properties = MezzanineProperties(int(width), int(height), round(eval(framerate), 3))
-mezz_properties.qr_positions = qr_positions
-mezz_properties.label = label
-
-# Set mezzanine source metadata
-mezz_source_license = ""
-try:
-	mezz_source_license_file = open(str(Path(str(input.parent)+'\\'+input.stem+'_LICENSE.txt')), encoding="utf-8")
-	mezz_source_license = mezz_source_license_file.read()
-except OSError:
-	print("Failed to load source LICENSE file. "
-		  "Ensure the file is located in the same folder as the source with the name <source_file_name>_LICENSE.txt.")
-mezz_source = MezzanineSource(input.name, mezz_source_cdn_path+input.name, mezz_source_license)
-
-
-# Set output video encoding parameters based on the following properties of the original source video:
-# color range, color space, pixel format, primaries and transfer function
-source_videoproperties = subprocess.check_output(
-	['ffprobe', '-i', str(input), '-show_streams', '-select_streams', 'v', '-loglevel', '0', '-print_format', 'json'])
-source_videoproperties_json = json.loads(source_videoproperties)
-if 'streams' in source_videoproperties_json:
-	if 'color_space' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
-		output_video_encoding_cl = \
-			output_video_encoding_selection.get(source_videoproperties_json['streams'][0]['color_space'], H265)
-		mezz_properties.codec = output_video_codec_name.get(output_video_encoding_cl[0], "other")
-		if 'color_space' in source_videoproperties_json['streams'][0] == ('bt470bg' or 'smpte170m'):
-			tonemap = 'enabled'
-			tonemap_cl = tonemap_cl_non709
+		print("Failed to load source LICENSE file. "
+			  "Ensure the file is located in the same folder as the source with the name <source_file_name>_LICENSE.txt.")
+	mezz_source = MezzanineSource(input.name, mezz_source_cdn_path+input.name, mezz_source_license)
+
+
+	# Set output video encoding parameters based on the following properties of the original source video:
+	# color range, color space, pixel format, primaries and transfer function
+	source_videoproperties = subprocess.check_output(
+		['ffprobe', '-i', str(input), '-show_streams', '-select_streams', 'v', '-loglevel', '0', '-print_format', 'json'])
+	source_videoproperties_json = json.loads(source_videoproperties)
+	if 'streams' in source_videoproperties_json:
+		if 'color_space' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
+			output_video_encoding_cl = \
+				output_video_encoding_selection.get(source_videoproperties_json['streams'][0]['color_space'], H265)
+			mezz_properties.codec = output_video_codec_name.get(output_video_encoding_cl[0], "other")
+			if 'color_space' in source_videoproperties_json['streams'][0] == ('bt470bg' or 'smpte170m'):
+				tonemap = 'enabled'
+				tonemap_cl = tonemap_cl_non709
+				output_video_encoding_cl.append('-colorspace')
+				output_video_encoding_cl.append('bt709')
+				output_video_encoding_cl.append('-pix_fmt')
+				output_video_encoding_cl.append('yuv420p')
+				output_video_encoding_cl.append('-color_primaries')
+				output_video_encoding_cl.append('bt709')
+				output_video_encoding_cl.append('-color_trc')
+				output_video_encoding_cl.append('bt709')
+			else:
+				output_video_encoding_cl.append('-colorspace')
+				output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_space'])
+			mezz_properties.matrix_coefficients = output_video_encoding_cl[output_video_encoding_cl.index('-colorspace')+1]
+
+		else:
+			# Either source is assumed to be BT.709 SDR in the absence of signalling or tone-mapping to BT.709 SDR
+			output_video_encoding_cl = H264
+			mezz_properties.codec = output_video_codec_name.get(output_video_encoding_cl[0], "other")
 			output_video_encoding_cl.append('-colorspace')
 			output_video_encoding_cl.append('bt709')
+			mezz_properties.matrix_coefficients = output_video_encoding_cl[output_video_encoding_cl.index('-colorspace')+1]
+			if tonemap == 'enabled':
+				tonemap_cl = tonemap_cl_hdr2sdr
+				output_video_encoding_cl.append('-pix_fmt')
+				output_video_encoding_cl.append('yuv420p')
+				output_video_encoding_cl.append('-color_primaries')
+				output_video_encoding_cl.append('bt709')
+				output_video_encoding_cl.append('-color_trc')
+				output_video_encoding_cl.append('bt709')
+	
+		if 'pix_fmt' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
+			output_video_encoding_cl.append('-pix_fmt')
+			output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['pix_fmt'])
+		elif tonemap == 'disabled':
 			output_video_encoding_cl.append('-pix_fmt')
 			output_video_encoding_cl.append('yuv420p')
+		mezz_properties.pixel_format = output_video_encoding_cl[output_video_encoding_cl.index('-pix_fmt')+1]
+		px_fmt_bit_depth = mezz_properties.pixel_format.split("p")[1][0:2]
+		if px_fmt_bit_depth == '':
+			mezz_properties.bit_depth = 8
+		else:
+			mezz_properties.bit_depth = int(px_fmt_bit_depth)
+	
+		if 'color_primaries' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
+			output_video_encoding_cl.append('-color_primaries')
+			output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_primaries'])
+		elif tonemap == 'disabled':
 			output_video_encoding_cl.append('-color_primaries')
 			output_video_encoding_cl.append('bt709')
+		mezz_properties.color_primaries = output_video_encoding_cl[output_video_encoding_cl.index('-color_primaries')+1]
+	
+		if 'color_transfer' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
+			output_video_encoding_cl.append('-color_trc')
+			output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_transfer'])
+		elif tonemap == 'disabled':
 			output_video_encoding_cl.append('-color_trc')
 			output_video_encoding_cl.append('bt709')
+		mezz_properties.transfer_characteristics = output_video_encoding_cl[output_video_encoding_cl.index('-color_trc')+1]
+	
+		if 'color_range' in source_videoproperties_json['streams'][0]:
+			output_video_encoding_cl.append('-color_range')
+			output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_range'])
 		else:
-			output_video_encoding_cl.append('-colorspace')
-			output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_space'])
-		mezz_properties.matrix_coefficients = output_video_encoding_cl[output_video_encoding_cl.index('-colorspace')+1]
+			output_video_encoding_cl.append('-color_range')
+			output_video_encoding_cl.append('tv')
+		mezz_properties.range = metadata_properties_range.get(
+			output_video_encoding_cl[output_video_encoding_cl.index('-color_range')+1], 'unknown')
+	
+		if 'r_frame_rate' in source_videoproperties_json['streams'][0] \
+				and 'avg_frame_rate' in source_videoproperties_json['streams'][0]:
+			if round(eval(source_videoproperties_json['streams'][0]['r_frame_rate']), 3) \
+					== round(eval(source_videoproperties_json['streams'][0]['avg_frame_rate']), 3):
+				mezz_properties.scan = 'progressive'
+			elif round(eval(source_videoproperties_json['streams'][0]['r_frame_rate']), 2) \
+					== 2*round(eval(source_videoproperties_json['streams'][0]['avg_frame_rate']), 2):
+				mezz_properties.scan = 'interlaced'
+
+	# Display output video encoding parameters
+	output_video_encoding = ' '.join(output_video_encoding_cl)
+	print("Output video encoding parameters: "+output_video_encoding)
+	print()
 
+	# Align A/V sync beep audio sample rate with the sample rate of the source file audio
+	if audio_samplerate != 0:
+		beep_audio_samplerate = str(audio_samplerate)
 	else:
-		# Either source is assumed to be BT.709 SDR in the absence of signalling or tone-mapping to BT.709 SDR
-		output_video_encoding_cl = H264
-		mezz_properties.codec = output_video_codec_name.get(output_video_encoding_cl[0], "other")
-		output_video_encoding_cl.append('-colorspace')
-		output_video_encoding_cl.append('bt709')
-		mezz_properties.matrix_coefficients = output_video_encoding_cl[output_video_encoding_cl.index('-colorspace')+1]
-		if tonemap == 'enabled':
-			tonemap_cl = tonemap_cl_hdr2sdr
-			output_video_encoding_cl.append('-pix_fmt')
-			output_video_encoding_cl.append('yuv420p')
-			output_video_encoding_cl.append('-color_primaries')
-			output_video_encoding_cl.append('bt709')
-			output_video_encoding_cl.append('-color_trc')
-			output_video_encoding_cl.append('bt709')
+		source_audioproperties = subprocess.check_output(
+			['ffprobe', '-i', str(input), '-show_streams', '-select_streams', 'a', '-loglevel', '0', '-print_format', 'json'])
+		source_audioproperties_json = json.loads(source_audioproperties)
+		if 'streams' in source_audioproperties_json:
+			if 'sample_rate' in source_audioproperties_json['streams'][0]:
+				beep_audio_samplerate = source_audioproperties_json['streams'][0]['sample_rate']
+
+
+	# Set default content duration = total duration 
+	# If start/end indicator frames are added then 
+	# content duration < total duration = content duration + start/end indicator frames
+	content_duration = duration
+
+	# Set start/end indicator frame FFMPEG parameters 
+	# and associated filter parameters to concatenate with source test sequence before output
+	if start_end_indicators == 'enabled':
+		content_duration = Decimal(content_duration-(2*start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
+		start_indicator_offset = start_end_indicator_nb_frames/eval(framerate)
+		start_indicator_nb_frames = start_end_indicator_nb_frames
+		end_indicator_nb_frames = start_end_indicator_nb_frames
+		indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
+		start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'color='+start_indicator_color+':size='+width+'x'+height+':rate='+framerate,
+								   '-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate,
+								   '-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'color='+end_indicator_color+':size='+width+'x'+height+':rate='+framerate,
+								   '-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
+		start_end_indicators_vmix_cl = '[4][content_video][6]\
+											concat=\
+											n=3:v=1:a=0\
+										[video_with_start_end_indicators];\
+										[bg_video][video_with_start_end_indicators]\
+											overlay=\
+										[main_video];'
+		start_end_indicators_amix_cl = '[5][audio_with_avsync][7]\
+											concat=\
+												n=3:v=0:a=1\
+										[aout]'
+		mezz_properties.start_indicator = True
+		mezz_properties.end_indicator = True
 	
-	if 'pix_fmt' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
-		output_video_encoding_cl.append('-pix_fmt')
-		output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['pix_fmt'])
-	elif tonemap == 'disabled':
-		output_video_encoding_cl.append('-pix_fmt')
-		output_video_encoding_cl.append('yuv420p')
-	mezz_properties.pixel_format = output_video_encoding_cl[output_video_encoding_cl.index('-pix_fmt')+1]
-	px_fmt_bit_depth = mezz_properties.pixel_format.split("p")[1][0:2]
-	if px_fmt_bit_depth == '':
-		mezz_properties.bit_depth = 8
-	else:
-		mezz_properties.bit_depth = int(px_fmt_bit_depth)
+	elif start_end_indicators == 'start':
+		content_duration = Decimal(content_duration-(start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
+		start_indicator_offset = start_end_indicator_nb_frames/eval(framerate)
+		start_indicator_nb_frames = start_end_indicator_nb_frames
+		indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
+		start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'color='+start_indicator_color+':size='+width+'x'+height+':rate='+framerate, 
+								   '-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
+		start_end_indicators_vmix_cl = '[4][content_video]\
+											concat=\
+											n=2:v=1:a=0\
+										[video_with_start_indicator];\
+										[bg_video][video_with_start_indicator]\
+											overlay=\
+										[main_video];'
+		start_end_indicators_amix_cl = '[5][audio_with_avsync]\
+											concat=\
+												n=2:v=0:a=1\
+										[aout]'
+		mezz_properties.start_indicator = True
 	
-	if 'color_primaries' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
-		output_video_encoding_cl.append('-color_primaries')
-		output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_primaries'])
-	elif tonemap == 'disabled':
-		output_video_encoding_cl.append('-color_primaries')
-		output_video_encoding_cl.append('bt709')
-	mezz_properties.color_primaries = output_video_encoding_cl[output_video_encoding_cl.index('-color_primaries')+1]
+	elif start_end_indicators == 'end':
+		content_duration = Decimal(content_duration-(start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
+		end_indicator_nb_frames = start_end_indicator_nb_frames
+		indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
+		start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'color='+end_indicator_color+':size='+width+'x'+height+':rate='+framerate,
+								   '-t', indicator_duration, '-f', 'lavfi', 
+								   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
+		start_end_indicators_vmix_cl = '[content_video][4]\
+											concat=\
+											n=2:v=1:a=0\
+										[video_with_end_indicator];\
+										[bg_video][video_with_end_indicator]\
+											overlay=\
+										[main_video];'
+		start_end_indicators_amix_cl = '[audio_with_avsync][5]\
+											concat=\
+												n=2:v=0:a=1\
+										[aout]'
+		mezz_properties.end_indicator = True
+
+
+	# Compute the size of various overlay blocks, so they are consistently placed
+	qr_size = int(round(int(height)*0.25, 0))
+	flash_block_size = int(round(int(height)*0.125, 0))
 	
-	if 'color_transfer' in source_videoproperties_json['streams'][0] and tonemap == 'disabled':
-		output_video_encoding_cl.append('-color_trc')
-		output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_transfer'])
-	elif tonemap == 'disabled':
-		output_video_encoding_cl.append('-color_trc')
-		output_video_encoding_cl.append('bt709')
-	mezz_properties.transfer_characteristics = output_video_encoding_cl[output_video_encoding_cl.index('-color_trc')+1]
+	# QR codes rasterized from the QR code matrix already have their final size, otherwise ffmpeg scales them
+	if qr_raster == 'pil':
+		qr_scale_cl = 'scale=w='+str(qr_size)+':h=-1'
+
+	# Generates a series of timestamped QR codes at the frame rate of the target output
+	# Each QR code is saved to a PNG file in the qr directory, using a pool of worker processes.
+	# QR codes already present in the QR code cache are reused instead of being encoded again.
+	frame_duration = round(1/eval(framerate), 10)
+	frame_count = int(eval(framerate)*duration)
+	frame_rate = round(eval(framerate), 3)
+
+	mezz_properties.duration = round(frame_count/eval(framerate), 3)
+	mezz_properties.frame_count = frame_count
+	mezz_properties.start_frame = start_frame
+
+	qr_cache_dir = (lambda x: Path(cache_dir, 'qr') if x == 'enabled' else None)(qr_cache)
+	qr_frame_payloads = qr_payloads(label, frame_count, start_frame, frame_number_padding, frame_rate, frame_duration)
 	
-	if 'color_range' in source_videoproperties_json['streams'][0]:
-		output_video_encoding_cl.append('-color_range')
-		output_video_encoding_cl.append(source_videoproperties_json['streams'][0]['color_range'])
-	else:
-		output_video_encoding_cl.append('-color_range')
-		output_video_encoding_cl.append('tv')
-	mezz_properties.range = metadata_properties_range.get(
-		output_video_encoding_cl[output_video_encoding_cl.index('-color_range')+1], 'unknown')
+	# Stages generating the inputs of ffmpeg, they run concurrently (see below)
+	stages = {}
 	
-	if 'r_frame_rate' in source_videoproperties_json['streams'][0] \
-			and 'avg_frame_rate' in source_videoproperties_json['streams'][0]:
-		if round(eval(source_videoproperties_json['streams'][0]['r_frame_rate']), 3) \
-				== round(eval(source_videoproperties_json['streams'][0]['avg_frame_rate']), 3):
-			mezz_properties.scan = 'progressive'
-		elif round(eval(source_videoproperties_json['streams'][0]['r_frame_rate']), 2) \
-				== 2*round(eval(source_videoproperties_json['streams'][0]['avg_frame_rate']), 2):
-			mezz_properties.scan = 'interlaced'
-
-# Display output video encoding parameters
-output_video_encoding = ' '.join(output_video_encoding_cl)
-print("Output video encoding parameters: "+output_video_encoding)
-print()
-
-# Align A/V sync beep audio sample rate with the sample rate of the source file audio
-if audio_samplerate != 0:
-	beep_audio_samplerate = str(audio_samplerate)
-else:
-	source_audioproperties = subprocess.check_output(
-		['ffprobe', '-i', str(input), '-show_streams', '-select_streams', 'a', '-loglevel', '0', '-print_format', 'json'])
-	source_audioproperties_json = json.loads(source_audioproperties)
-	if 'streams' in source_audioproperties_json:
-		if 'sample_rate' in source_audioproperties_json['streams'][0]:
-			beep_audio_samplerate = source_audioproperties_json['streams'][0]['sample_rate']
-
-
-# Set default content duration = total duration 
-# If start/end indicator frames are added then 
-# content duration < total duration = content duration + start/end indicator frames
-content_duration = duration
-
-# Set start/end indicator frame FFMPEG parameters 
-# and associated filter parameters to concatenate with source test sequence before output
-if start_end_indicators == 'enabled':
-	content_duration = Decimal(content_duration-(2*start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
-	start_indicator_offset = start_end_indicator_nb_frames/eval(framerate)
-	start_indicator_nb_frames = start_end_indicator_nb_frames
-	end_indicator_nb_frames = start_end_indicator_nb_frames
-	indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
-	start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'color='+start_indicator_color+':size='+width+'x'+height+':rate='+framerate,
-							   '-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate,
-							   '-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'color='+end_indicator_color+':size='+width+'x'+height+':rate='+framerate,
-							   '-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
-	start_end_indicators_vmix_cl = '[7][content_video][9]\
-										concat=\
-										n=3:v=1:a=0\
-									[video_with_start_end_indicators];\
-									[bg_video][video_with_start_end_indicators]\
-										overlay=\
-									[main_video];'
-	start_end_indicators_amix_cl = '[8][audio_with_avsync][10]\
-										concat=\
-											n=3:v=0:a=1\
-									[aout]'
-	mezz_properties.start_indicator = True
-	mezz_properties.end_indicator = True
+	def generate_qr_codes():
+		print("Generating QR codes...")
+
+		if not os.path.isdir(qr_file_dir):
+			try:
+				os.mkdir(qr_file_dir)
+			except OSError:
+				print("Failed to create the directory for the QR code image files.")
+
+		qr_generate(qr_file_dir, qr_frame_payloads, workers, qr_cache_dir, qr_raster, qr_size)
 	
-elif start_end_indicators == 'start':
-	content_duration = Decimal(content_duration-(start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
-	start_indicator_offset = start_end_indicator_nb_frames/eval(framerate)
-	start_indicator_nb_frames = start_end_indicator_nb_frames
-	indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
-	start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'color='+start_indicator_color+':size='+width+'x'+height+':rate='+framerate, 
-							   '-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
-	start_end_indicators_vmix_cl = '[7][content_video]\
-										concat=\
-										n=2:v=1:a=0\
-									[video_with_start_indicator];\
-									[bg_video][video_with_start_indicator]\
-										overlay=\
-									[main_video];'
-	start_end_indicators_amix_cl = '[8][audio_with_avsync]\
-										concat=\
-											n=2:v=0:a=1\
-									[aout]'
-	mezz_properties.start_indicator = True
+		print("QR codes done")
 	
-elif start_end_indicators == 'end':
-	content_duration = Decimal(content_duration-(start_end_indicator_nb_frames/eval(framerate))).quantize(Decimal('.001'), rounding=ROUND_UP)
-	end_indicator_nb_frames = start_end_indicator_nb_frames
-	indicator_duration = str(Decimal(start_end_indicator_nb_frames/eval(framerate)).quantize(Decimal('.001'), rounding=ROUND_DOWN))
-	start_end_indicators_cl = ['-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'color='+end_indicator_color+':size='+width+'x'+height+':rate='+framerate,
-							   '-t', indicator_duration, '-f', 'lavfi', 
-							   '-i', 'sine=frequency=1000:beep_factor=1:sample_rate='+beep_audio_samplerate]
-	start_end_indicators_vmix_cl = '[content_video][7]\
-										concat=\
-										n=2:v=1:a=0\
-									[video_with_end_indicator];\
-									[bg_video][video_with_end_indicator]\
-										overlay=\
-									[main_video];'
-	start_end_indicators_amix_cl = '[audio_with_avsync][8]\
-										concat=\
-											n=2:v=0:a=1\
-									[aout]'
-	mezz_properties.end_indicator = True
-
-
-# Compute the size of various overlay blocks, so they are consistently placed
-qr_size = int(round(int(height)*0.25, 0))
-flash_block_size = int(round(int(height)*0.125, 0))
-
-# Generates a series of timestamped QR codes at the frame rate of the target output
-# Each QR code is saved to a PNG file in the qr directory.
-frame_duration = round(1/eval(framerate), 10)
-frame_count = int(eval(framerate)*duration)
-frame_pts = start_frame*round(frame_duration, 10)
-frame_rate = round(eval(framerate), 3)
-
-mezz_properties.duration = round(frame_count/eval(framerate), 3)
-mezz_properties.frame_count = frame_count
-mezz_properties.start_frame = start_frame
-
-if not metadata_gen_only:
-	print("Generating QR codes...")
-
-	if not os.path.isdir(qr_file_dir):
-		try:
-			os.mkdir(qr_file_dir)
-		except OSError:
-			print("Failed to create the directory for the QR code image files.")
+	if not metadata_gen_only and annotation_transport == 'files' and annotation_compositing == 'disabled':
+		stages['qr'] = (generate_qr_codes, [])
+
+	# Generate the bit patterns containing:
+	#   current frame (24 bit), total frames (24 bit), frame rate (17 bit),
+	#   horizontal (13 bit) and vertical (13 bit) resolution
+	# These bit patterns enable easier extraction of this metadata from each frame by automation tools
+	# (e.g. for white-box device testing)
+	# Bit patterns do not depend on the label, so bit patterns cached for another label variant are reused.
+	def generate_bitpatterns():
+		print("Generating bitpatterns...")
+
+		if not os.path.isdir(bitpat_file_dir):
+			try:
+				os.mkdir(bitpat_file_dir)
+			except OSError:
+				print("Failed to create the directory for the bitpattern image files.")
+
+		bp_generate(bitpat_file_dir, range(start_frame, frame_count+start_frame), frame_count, frame_rate, 
+					int(width), int(height), 
+					(lambda x: Path(cache_dir, 'bp') if x == 'enabled' else None)(bitpattern_cache), 
+					workers)
+		
+		print("Bitpatterns done")
+	
+	if not metadata_gen_only and annotation_transport == 'files' and annotation_compositing == 'disabled':
+		stages['bp'] = (generate_bitpatterns, [])
+
+	# Composite the QR code and bit pattern of each frame into a single gray + alpha image,
+	# covering the smallest area containing the bit pattern and all QR code positions
+	bp_height, bp_width = [len(m) for m in bp_template(int(width), int(height))[1:]]
+	annotation_layout_xywh = annotation_layout(int(width), int(height), qr_size, bp_width, bp_height)
+	if annotation_compositing == 'enabled':
+		annotation_composites = lambda: annotation_frames(
+			qr_frames(qr_frame_payloads, qr_size, workers, qr_cache_dir),
+			bp_frames(range(start_frame, frame_count+start_frame), frame_count, frame_rate, int(width), int(height), channels=1),
+			annotation_layout_xywh, qr_positions)
+	
+	def generate_annotations():
+		print("Generating annotation frames...")
+
+		if not os.path.isdir(annotation_file_dir):
+			try:
+				os.mkdir(annotation_file_dir)
+			except OSError:
+				print("Failed to create the directory for the annotation image files.")
+
+		annotation_generate(annotation_file_dir, annotation_composites(), workers)
+		
+		print("Annotation frames done")
+	
+	if not metadata_gen_only and annotation_transport == 'files' and annotation_compositing == 'enabled':
+		stages['annotations'] = (generate_annotations, [])
+
+	# Render the static overlay layer containing the annotations identical on every frame:
+	#   label, black box behind the QR codes, 2px wide border around the video edge and boundary markers
+	# The layer only depends on the resolution, label, font and boundaries image, so it is reused from the cache
+	static_overlay_file = overlay_cache_filename(Path(cache_dir, 'overlay'), int(width), int(height), label, 
+												 font_file, boundaries, qr_size)
+	def generate_static_overlay():
+		print("Generating static overlay...")
+		overlay_generate(Path(cache_dir, 'overlay'), int(width), int(height), label, font_file, boundaries, qr_size)
+		print("Static overlay done")
+	
+	if not metadata_gen_only:
+		stages['overlay'] = (generate_static_overlay, [])
+
+	# Generate the irregular A/V sync pattern consisting of the audio samples of the "beeps",
+	# the frame intervals of the corresponding "flashes" and the metadata describing their timings
+	# The pattern is generated in memory by the test sequence generator, the beeps are streamed to ffmpeg
+	# and the flashes are drawn by ffmpeg, switched on and off by a sendcmd script containing the frame intervals
+	# The pattern does not depend on the resolution, so it is reused from the cache when generated by a previous run
+	# The pattern repeats every 2^n-1 seconds (n being the window length): when shorter than the duration,
+	# only one period of beeps is generated, written to a file looped by ffmpeg
+	# When beeps are synthesized by ffmpeg, only the beep timings are needed, no beep samples are generated
+	avsync_sequence = {}
+	avsync_parameters = (
+		int(avsync_pattern_window_len),
+		math.ceil(eval(framerate)*2)/2, 	# float needed (used for 12.5fps support)
+		math.ceil(duration), 				# int duration in seconds needed
+		int(beep_audio_samplerate))
+	avsync_periodic = 2**int(avsync_pattern_window_len)-1 < math.ceil(duration)
+	avsync_entry = avsync_cache_entry(Path(cache_dir, 'avsync'), *avsync_parameters)
+	# A cached period of beeps is looped by ffmpeg directly from the cache, which is never modified once stored
+	beep_file_cached = avsync_cache == 'enabled' and beep_synthesis == 'samples' and avsync_periodic
+	if beep_file_cached:
+		beep_file = Path(avsync_entry, avsync_files['beeps'])
+	
+	sys.path.insert(0, str(test_sequence_gen_dir))
+	
+	def generate_avsync_pattern():
+		print("Generating A/V sync pattern...")
 
-	for i in range(0, frame_count):
-		frame_pts_rounded = round(frame_pts, 3)
-		timecode = '{:02d}:{:02d}:{:06.3f}'.format(int(frame_pts_rounded/3600), int(frame_pts_rounded/60) % 60, frame_pts_rounded % 60)
-		padded_frame = str(i+start_frame).zfill(frame_number_padding)
+		from generate import genAvSyncSequence
+		from audio import samplesToBytes
+		
+		def avsync_generate():
+			avsync_generated = genAvSyncSequence(*avsync_parameters, blockSize=beep_block_size, periodic=avsync_periodic)
+			avsync_generated['sampleData'] = map(samplesToBytes, avsync_generated['samples']) 	# s16le
+			return avsync_generated
+		
+		avsync_cached = None
+		if beep_synthesis == 'filter':
+			# beep samples are generated lazily, so are never generated as they are not used
+			avsync_sequence.update(genAvSyncSequence(*avsync_parameters, blockSize=beep_block_size))
+		elif avsync_cache == 'enabled':
+			avsync_cached = avsync_cache_load(avsync_entry, *avsync_parameters)
+			if avsync_cached is None:
+				print("A/V sync cache: not found, generating")
+				avsync_generated = avsync_generate()
+				avsync_cache_store(avsync_entry, *avsync_parameters, avsync_generated['sampleData'], 
+								   avsync_generated['flashIntervals'], avsync_generated['metadata'])
+				avsync_cached = avsync_cache_load(avsync_entry, *avsync_parameters)
+			else:
+				print("A/V sync cache: found")
+		
+		if avsync_cached is not None:
+			# beeps are streamed to ffmpeg from the cache, block by block
+			avsync_sequence.update(avsync_cached)
+			avsync_sequence['sampleData'] = avsync_read_chunks(avsync_cached['beeps'], 2*beep_block_size)
+		elif beep_synthesis == 'samples':
+			# beeps are generated while streamed to ffmpeg, block by block
+			avsync_sequence.update(avsync_generate())
+		if beep_file_cached and avsync_cached is None:
+			raise RuntimeError("A/V sync cache entry \""+str(avsync_entry)+"\" could not be read")
+		if beep_synthesis == 'samples' and avsync_periodic and not beep_file_cached:
+			with open(beep_file, 'wb') as beeps:
+				for chunk in avsync_sequence['sampleData']:
+					beeps.write(chunk)
+		with open(avsync_metadata_filepath, 'w') as avsync_metadata_file:
+			json.dump(avsync_sequence['metadata'], avsync_metadata_file)
+
+	def generate_flash_commands():
+		# Flash frame n of the A/V sync pattern is shown on output frame n, 
+		# commands are sent half a frame early so they are not affected by timestamp rounding
+		with open(flash_cmd_file, 'w') as flash_cmd:
+			for flash_start, flash_end in avsync_sequence['flashIntervals']:
+				flash_cmd.write('{:.6f}-{:.6f} [enter] drawbox@flash enable 1, [leave] drawbox@flash enable 0;\n'.format(
+					max(0, (flash_start-0.5)/eval(framerate)), (flash_end-0.5)/eval(framerate)))
+		print("A/V sync pattern done")
+	
+	if not metadata_gen_only:
+		stages['avsync'] = (generate_avsync_pattern, [])
+		stages['flash'] = (generate_flash_commands, ['avsync'])
+
+	# Write the sidecar describing the annotations of each frame: frame number, timecode, QR code position,
+	# bit pattern and A/V sync flash state, so test tools do not have to derive them again for each frame
+	def generate_frame_sidecar():
+		print("Generating frame sidecar...")
+		sidecar_generate(frame_sidecar_filepath, frame_count, start_frame, frame_rate, frame_duration, 
+						 int(width), int(height), qr_positions, avsync_sequence['flashIntervals'])
+		print("Frame sidecar done")
+	
+	if not metadata_gen_only and frame_sidecar == 'enabled':
+		stages['sidecar'] = (generate_frame_sidecar, ['avsync'])
+
+	# Set up the ffmpeg inputs of the annotation frames (composited, or QR code and bit pattern frames), 
+	# either image sequences or raw frames streamed through named pipes
+	if annotation_compositing == 'enabled':
+		annotation_input_cl = ['-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
+							   '-i', str(Path(str(annotation_file_dir)+'\\'+'%05d.png'))]
+	else:
+		annotation_input_cl = ['-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
+							   '-i', str(Path(str(qr_file_dir)+'\\'+'%05d'+qr_file_ext[qr_raster])),
+							   '-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
+							   '-i', str(Path(str(bitpat_file_dir)+'\\'+'%05d.png'))]
+	pipe_writers = []
+	
+	if annotation_transport == 'pipes':
+		pipe_dir = Path('_tmp_pipes')
+		if not metadata_gen_only:
+			pipe_dir = Path(tempfile.mkdtemp(prefix='_tmp_pipes_', dir='.')) 	# Unique, so concurrent jobs do not clash
+		if annotation_compositing == 'enabled':
+			pipes = {
+				'annotations': (pipe_dir / 'annotations', 'ya8', 
+								str(annotation_layout_xywh[0][2])+'x'+str(annotation_layout_xywh[0][3]))}
+		else:
+			pipes = {
+				'qr': (pipe_dir / 'qr', 'gray', str(qr_size)+'x'+str(qr_size)),
+				'bp': (pipe_dir / 'bp', 'bgr24', str(bp_width)+'x'+str(bp_height))}
+		annotation_input_cl = []
+		for name, (pipe_filename, pipe_pix_fmt, pipe_size) in pipes.items():
+			if not metadata_gen_only:
+				os.mkfifo(pipe_filename)
+			annotation_input_cl += ['-f', 'rawvideo', '-pix_fmt', pipe_pix_fmt, '-video_size', pipe_size, 
+									'-framerate', framerate, '-thread_queue_size', '1024', '-i', str(pipe_filename)]
 		
-		qr_filename = Path(str(qr_file_dir)+'\\'+(str(i).zfill(5)+'.png'))
-		qr = qrcode.QRCode(
-			version=None,
-			error_correction=qrcode.constants.ERROR_CORRECT_H,
-			box_size=6,
-			border=4,
-			)
-		qr.add_data(label+';'+timecode+';'+padded_frame+';'+str(frame_rate))
-		qr.make(fit=True)
+		if not metadata_gen_only:
+			if annotation_compositing == 'enabled':
+				pipe_sources = [('annotations', annotation_composites())]
+			else:
+				pipe_sources = [
+					('qr', qr_frames(qr_frame_payloads, qr_size, workers, qr_cache_dir)),
+					('bp', bp_frames(range(start_frame, frame_count+start_frame), frame_count, frame_rate, 
+									 int(width), int(height)))]
+			for name, frames in pipe_sources:
+				pipe_writers.append(threading.Thread(target=pipe_frames, args=(pipes[name][0], frames), daemon=True))
+
+	# Overlay the annotation frames, which are the last inputs (after the optional start/end indicator inputs)
+	annotation_input = 4+start_end_indicators_cl.count('-i')
+	if annotation_compositing == 'enabled':
+		annotation_overlay_cl = '[bounded_video]['+str(annotation_input)+']\
+				overlay=\
+					x='+str(annotation_layout_xywh[0][0])+':\
+					y='+str(annotation_layout_xywh[0][1])+':\
+					shortest=1:\
+					repeatlast=0\
+			[vout];'
+	else:
+		annotation_overlay_cl = '['+str(annotation_input)+']\
+				'+qr_scale_cl+'\
+			[qrs];\
+			[bounded_video][qrs]\
+				overlay=\
+					x=\'(main_w*0.1)+if(between(mod(n,'+str(qr_positions)+'),2,3),overlay_w)\':\
+					y=\'(main_h/2)-ifnot(between(mod(n,'+str(qr_positions)+'),1,2),overlay_h)\':\
+					shortest=1:\
+					repeatlast=0\
+			[bounded_video_with_qrs];\
+			[bounded_video_with_qrs]['+str(annotation_input+1)+']\
+				overlay=\
+					x=4/480*'+width+':\
+					y=4/270*'+height+'\
+			[vout];'
+
+
+	# This large command accomplishes the Mezzanine transform :
+	# - Starts FFMPEG with 5 input sources:
+	#   [0] An audio source that contains an irregular pattern of beeps for AV-sync, streamed to the standard input,
+	#       or when the pattern repeats within the duration, a file containing one period of the pattern, looped
+	#       or when beeps are synthesized by ffmpeg, an aevalsrc source generating the beeps from their timings
+	#   [1] The original video source seek-ed to the desired point
+	#   [2] An image file of the static overlay layer generated in a previous step
+	#   [3] Black background used as the background video.
+	#       Ensures the PTS and frame counter correctly start from the first frame.
+	#   [4],[5],[6],[7] Are single colored frames with silent audio, used to signal the start and end of the stream,
+	#                   see above for the command line definitions
+	#   Followed by a series of composited annotation images (QR code and bit pattern) generated in a previous step,
+	#   or when annotation compositing is disabled, a series of QR code images and a series of bit pattern images
+	#   When annotation frames are streamed through named pipes, these are raw frames
+	#   generated while ffmpeg is encoding instead of image sequences
+	# - Applies the following complex filter to the demuxed inputs:
+	#     - Takes the black background video stream and sets the start PTS, start time and frame rate
+	#     - Takes the video stream from the original source and:
+	#       - Applies rudimentary tone mapping from HDR to SDR when --tonemap enabled
+	#       - Scales it to the desired output size while preserving original ratio
+	#       - Adds top/bottom black bars to enforce a 16:9 frame
+	#       - Fixes the output format based on the desired output (SDR/BT.709 or HDR/BT.2020)
+	#       - Forces the frame rate to the desired frame rate
+	#     - Frames signalling the start/end of the content are overlayed on the first/last frames
+	#       of the video from the original source
+	#     - Full screen overlays the static overlay layer, containing the label, the black box behind the QR codes,
+	#       the 2px wide border around the video edge and the boundary markers scaled to the desired output size
+	#     - Draws the video frame rate, frame number and timecode of the current frame onto it
+	#     - Draws the AV-sync flash block:
+	#       - A black box, relative to its final positioning in the composition
+	#       - A white box on top of it, enabled by the sendcmd script during the flashes matching the beeps of [0]
+	#     - Takes the composited annotation stream and:
+	#       - Places it in a fixed position, the QR codes in the composites already follow a pattern based on frame number
+	#     - Or, when annotation compositing is disabled:
+	#       - Takes the QR code stream and scales it relative to its final positioning in the composition,
+	#         unless the QR codes were rasterized at their final size from the QR code matrix
+	#       - Places the QR codes in a pattern based on frame number
+	#       - Takes the bitpattern stream and places the bitpatterns in a fixed position relative to the resolution
+	#         at the top left of the video 
+	#     - Takes the audio stream from the original source and:
+	#       - Resamples it to the chosen sample rate
+	#       - Mixes it with the audio stream containing the AV-sync beeps
+	#       - Mixes it with the audio streams containing the start/end indicator beeps
+	# - Post filter the output is mapped as follows:
+	#     - Video is the output of the last overlay composition
+	#     - Audio is the output of the audio mix filter
+	# - The mapped outputs are then:
+	#     - Encoded in h264 or h265 for video depending on the source content, and aac for audio
+	#     - Fixed to the desired output frame rate
+	#     - Fixed to the desired duration
+	#     - Written to the supplied output location (overwriting is enabled)
+	beep_input_cl = ['-t', str(content_duration), '-f', 's16le', '-ar', beep_audio_samplerate, '-ac', '1', '-i']
+	if beep_synthesis == 'filter':
+		from generate import genBeepRanges, toneHz, amplitude
+		beep_ranges = genBeepRanges(*avsync_parameters, periodic=avsync_periodic)
+		beep_period = 2**int(avsync_pattern_window_len)-1 if avsync_periodic else math.ceil(duration)
+		beep_input_cl = ['-t', str(content_duration), '-f', 'lavfi', '-i',
+			'aevalsrc=exprs=\''+beep_expression(beep_ranges, beep_period*int(beep_audio_samplerate), toneHz, amplitude)
+			+'\':s='+beep_audio_samplerate+':c=mono']
+	elif avsync_periodic:
+		beep_input_cl = ['-stream_loop', '-1'] + beep_input_cl + [str(beep_file)]
+	else:
+		beep_input_cl = beep_input_cl + ['pipe:0']
+	
+	ffmpeg_cl = ['ffmpeg'] \
+		+ beep_input_cl \
+		+ [
+		'-ss', seek, '-t', str(content_duration), '-stream_loop', '-1', '-i', str(input),
+		'-framerate', framerate, '-i', str(static_overlay_file),
+		'-f', 'lavfi', '-i', 'color=black:d='+str(duration)+':s='+width+'x'+height] \
+		+ start_end_indicators_cl \
+		+ annotation_input_cl \
+		+ ['-filter_complex',
+			'[3]\
+				setpts=PTS-STARTPTS,\
+				fps=\
+					fps='+framerate+':\
+					start_time=0\
+			[bg_video];\
+			[1:v]\
+				'+tonemap_cl+'\
+				scale=\
+					size='+width+'x'+height+':\
+					force_original_aspect_ratio=decrease,\
+				setsar=1,\
+				pad=\
+					w='+width+':\
+					h='+height+':\
+					x=(ow-iw)/2:\
+					y=(oh-ih)/2,\
+				format='+output_video_encoding_cl[output_video_encoding_cl.index('-pix_fmt')+1]+',\
+				fps=\
+					fps='+framerate+':\
+					start_time='+str(round(start_indicator_offset, 3))+'\
+			[content_video];\
+			'+start_end_indicators_vmix_cl+'\
+			[main_video][2]\
+				overlay=\
+					repeatlast=1,\
+				drawtext=\
+					fontfile=\''+font+'\':\
+					text=\'%{pts\:hms\:'
+						+str((lambda x: x/eval(framerate) if x > 0 else 0)(start_frame))
+						+'};%{eif\:n+'+str(start_frame)+'\:d\:'+str(frame_number_padding)
+						+'};'+str(frame_rate)+'\':\
+					x=(w-tw)/2:\
+					y=h-(4*lh):\
+					fontcolor=white:\
+					fontsize=h*0.06:\
+					box=1:\
+					boxborderw=10:\
+					boxcolor=black,\
+				sendcmd=\
+					f=\''+str(flash_cmd_file).replace('\\', '/')+'\',\
+				drawbox=\
+					x=\'iw*0.925-'+str(flash_block_size)+'\':\
+					y=\'ih*0.1\':\
+					w='+str(flash_block_size)+':\
+					h='+str(flash_block_size)+':\
+					t=fill:\
+					color=black,\
+				drawbox@flash=\
+					x=\'iw*0.925-'+str(flash_block_size)+'\':\
+					y=\'ih*0.1\':\
+					w='+str(flash_block_size)+':\
+					h='+str(flash_block_size)+':\
+					t=fill:\
+					color=white:\
+					enable=0\
+			[bounded_video];\
+			'+annotation_overlay_cl+'\
+			[1:a]\
+				aresample='+str(audio_samplerate)+'\
+			[resampled_main_audio];\
+			[0][resampled_main_audio]\
+				amix=\
+					inputs=2:\
+					duration=shortest:\
+			[audio_with_avsync];'+start_end_indicators_amix_cl,
+		'-map', '[vout]',
+		'-map', '[aout]',
+		'-c:v'] + output_video_encoding_cl \
+		+ ['-c:a', 'aac', '-b:a', '320k', '-ac', '2',
+		'-y',
+		'-t', str(duration),
+		str(output)]
+
+	# The encode starts as soon as all the inputs generated in previous stages are ready,
+	# streamed annotation frames are generated while encoding
+	def encode():
+		for pipe_writer in pipe_writers:
+			pipe_writer.start()
 		
-		qr_img = qr.make_image(fill_color='white', back_color='black')
-		qr_img.save(str(qr_filename))
+		if beep_synthesis == 'filter' or avsync_periodic:
+			subprocess.run(ffmpeg_cl)
+		else:
+			proc = subprocess.Popen(ffmpeg_cl, stdin=subprocess.PIPE)
+			beep_writer = threading.Thread(target=write_stdin, args=(proc, avsync_sequence['sampleData']),
+										   daemon=True)
+			beep_writer.start()
+			proc.wait()
+			beep_writer.join()
 		
-		frame_pts = round(frame_pts+frame_duration, 10)
+		if annotation_transport == 'pipes':
+			for name, (pipe_filename, pipe_pix_fmt, pipe_size) in pipes.items():
+				unblock_pipe(pipe_filename)
+			for pipe_writer in pipe_writers:
+				pipe_writer.join()
+	
+	if not metadata_gen_only:
+		stages['encode'] = (encode, [name for name in stages.keys() if name != 'sidecar']) 	# The sidecar is not an input
+		stage_timings = run_stages(stages)
+		print()
+		print_stage_timings(stages, stage_timings)
 
-	print("Done")
-	print()
 
-# Generate the bit patterns containing:
-#   current frame (24 bit), total frames (24 bit), frame rate (17 bit),
-#   horizontal (13 bit) and vertical (13 bit) resolution
-# These bit patterns enable easier extraction of this metadata from each frame by automation tools
-# (e.g. for white-box device testing)
-if not metadata_gen_only:
-	print("Generating bitpatterns...")
+	# Output metadata
+	# Import CTA mezzanine license if available
+	mezz_license = ""
+	try:
+		mezz_license_file = open(str(Path(str(input.parent)+'\\'+input.stem+'_CTA_LICENSE.txt')), encoding="utf-8")
+		mezz_license = mezz_license_file.read()
+	except OSError:
+		print("Failed to load mezzanine CTA LICENSE file. Ensure the file is located in the same folder as the source "
+			  "with the name <source_file_name>_CTA_LICENSE.txt.")
+
+	# Calculate MD5 hash
+	BLOCK_SIZE = 65536
+	mezz_file_hash = hashlib.md5()
+	with open(output, 'rb') as mezz_file:
+		mezz_file_block = mezz_file.read(BLOCK_SIZE)
+		while len(mezz_file_block) > 0: 					# Until all data has been read from mezzanine file
+			mezz_file_hash.update(mezz_file_block) 			# Update hash
+			mezz_file_block = mezz_file.read(BLOCK_SIZE) 	# Read the next block from mezzanine file
+
+	# The temporary files and folders are unique to this process (see tmp_suffix), the command line recorded 
+	# in the metadata uses their stable names instead, so it does not change from one run to the next
+	tmp_names = [(str(tmp_path), str(tmp_path).replace(tmp_suffix, '')) 
+				 for tmp_path in [beep_file, flash_cmd_file, bitpat_file_dir, qr_file_dir, annotation_file_dir]]
+	if annotation_transport == 'pipes':
+		tmp_names.append((str(pipe_dir), '_tmp_pipes'))
+	mezz_ffmpeg_cl = ' '.join(ffmpeg_cl).replace('\t', '')
+	for tmp_name, stable_name in tmp_names:
+		mezz_ffmpeg_cl = mezz_ffmpeg_cl.replace(tmp_name, stable_name)
+
+	mezz_metadata = Mezzanine(output.stem, mezz_version, mezz_specification_version, date.today().isoformat(), mezz_license,
+							  './'+output.name, str(Path(__file__).resolve().name)+' '+' '.join(sys.argv[1:]),
+							  mezz_ffmpeg_cl, mezz_file_hash.hexdigest(), mezz_properties, mezz_source)
 
-	if not os.path.isdir(bitpat_file_dir):
-		try:
-			os.mkdir(bitpat_file_dir)
-		except OSError:
-			print("Failed to create the directory for the bitpattern image files.")
+	print()
+	print()
+	print("Name: "+mezz_metadata.name)
+	print("URI: "+mezz_metadata.URI)
+	print("Version: "+str(mezz_metadata.version))
+	print("Spec version: "+str(mezz_metadata.specification_version))
+	print("Creation date: "+mezz_metadata.creation_date)
+	print("License: "+mezz_metadata.license)
+	print("CL used: "+mezz_metadata.command_line)
+	print("FFMPEG CL used: "+mezz_metadata.ffmpeg_command_line)
+	print("MD5: "+mezz_metadata.md5)
+	print()
+	print("Width: "+str(mezz_metadata.properties.width))
+	print("Height: "+str(mezz_metadata.properties.height))
+	print("Frame rate: "+str(mezz_metadata.properties.frame_rate))
+	print("Scan: "+mezz_metadata.properties.scan)
+	print("Px Format: "+mezz_metadata.properties.pixel_format)
+	print("Bit depth: "+str(mezz_metadata.properties.bit_depth))
+	print("Color primaries: "+mezz_metadata.properties.color_primaries)
+	print("Matrix coefficients: "+mezz_metadata.properties.matrix_coefficients)
+	print("Transfer characteristics: "+mezz_metadata.properties.transfer_characteristics)
+	print("Range: "+mezz_metadata.properties.range)
+	print("Duration: "+str(mezz_metadata.properties.duration))
+	print("Frame count: "+str(mezz_metadata.properties.frame_count))
+	print("Start frame: "+str(mezz_metadata.properties.start_frame))
+	print("Start indicator: "+str(mezz_metadata.properties.start_indicator))
+	print("End indicator: "+str(mezz_metadata.properties.end_indicator))
+	print("QR positions: "+str(mezz_metadata.properties.qr_positions))
+	print("Label: "+mezz_metadata.properties.label)
+	print("Codec: "+mezz_metadata.properties.codec)
+	print()
+	print("Source name: "+mezz_metadata.source.name)
+	print("Source URI: "+mezz_metadata.source.URI)
+	print("Source license: "+mezz_metadata.source.license)
+	print()
 
-	for i in range(0, frame_count):
-		bp_create(bitpat_file_dir, i+start_frame, frame_count, frame_rate, int(width), int(height))
-		
-	print("Done")
+	# Save metadata to JSON file
+	mezz_metadata_file = open(str(mezz_metadata_filepath), "w")
+	json.dump(mezz_metadata, mezz_metadata_file, indent=4, cls=MezzanineEncoder)
+	mezz_metadata_file.write('\n')
+	mezz_metadata_file.close()
+
+	print("Mezzanine metadata stored in: "+str(mezz_metadata_filepath))
+	if not metadata_gen_only and frame_sidecar == 'enabled':
+		print("Frame sidecar stored in: "+str(frame_sidecar_filepath))
 	print()
 
-# Generate the irregular A/V sync pattern consisting of a still image sequence and
-# corresponding WAV file that contain aligned "beeps" and "flashes"
-if not metadata_gen_only:
-	print("Generating A/V sync pattern...", end='', flush=True)
 
-	if not os.path.isdir(flash_file_dir):
-		try:
-			os.mkdir(flash_file_dir)
-		except OSError:
-			print("Failed to create the directory for the A/V sync pattern image files.")
-
-	subprocess.run(['python', test_sequence_gen_script, 
-		'--duration', str(math.ceil(duration)), 		# int duration in seconds needed
-		'--fps', str(math.ceil(eval(framerate)*2)/2), 	# float needed (used for 12.5fps support)
-		'--frame-filename', str(Path(str(flash_file_dir)+'\\%05d.png')),
-		'--sampleRate', beep_audio_samplerate,
-		'--size', '1x1', 
-		'--wav-filename', beep_file,
-		'--window-len', avsync_pattern_window_len,
-		'--metadata-filename', str(avsync_metadata_filepath)])
-
-
-# This large command accomplishes the Mezzanine transform :
-# - Starts FFMPEG with 5 input sources:
-#   [0] A virtual audio source that contains an irregular pattern of beeps for AV-sync
-#   [1] The original video source seek-ed to the desired point
-#   [2] An image file of frame boundary markers
-#   [3] A series of QR code images generated in a previous step
-#   [4] A series of images generated in a previous step depicting an irregular pattern of flashes
-#       matching the beeps of [0]
-#   [5] A series of bit pattern images generated in a previous step
-#   [6] Black background used as the background video.
-#       Ensures the PTS and frame counter correctly start from the first frame.
-#   [7],[8],[9],[10] Are single colored frames with silent audio, used to signal the start and end of the stream,
-#                    see above for the command line definitions
-# - Applies the following complex filter to the demuxed inputs:
-#     - Takes the black background video stream and sets the start PTS, start time and frame rate
-#     - Takes the video stream from the original source and:
-#       - Applies rudimentary tone mapping from HDR to SDR when --tonemap enabled
-#       - Scales it to the desired output size while preserving original ratio
-#       - Adds top/bottom black bars to enforce a 16:9 frame
-#       - Fixes the output format based on the desired output (SDR/BT.709 or HDR/BT.2020)
-#       - Forces the frame rate to the desired frame rate
-#     - Takes the QR code stream and:
-#       - Scales them relative to their final positioning in the composition
-#     - Frames signalling the start/end of the content are overlayed on the first/last frames
-#       of the video from the original source
-#     - Draws the video frame rate, frame number and timecode of the current frame onto it
-#     - Takes the stream of images depicting the pattern of AV-sync flashes and:
-#       - Scales them relative to their final positioning in the composition
-#       - Overlays the scaled pattern of flashes indicating a beep
-#     - Draws 2px wide border around the video edge:
-#       - Outer 1px black border
-#       - Inner 1px white border
-#     - Takes the boundary marker and:
-#       - Scales it to the desired output size
-#       - Full screen overlays the scaled boundary marker
-#     - Takes the scaled QR code stream and:
-#       - Places the QR codes in a pattern based on frame number
-#     - Takes the bitpattern stream and:
-#       - Places the bitpatterns in a fixed position relative to the resolution at the top left of the video 
-#     - Takes the audio stream from the original source and:
-#       - Resamples it to the chosen sample rate
-#       - Mixes it with the audio stream containing the AV-sync beeps
-#       - Mixes it with the audio streams containing the start/end indicator beeps
-# - Post filter the output is mapped as follows:
-#     - Video is the output of the last overlay composition
-#     - Audio is the output of the audio mix filter
-# - The mapped outputs are then:
-#     - Encoded in h264 or h265 for video depending on the source content, and aac for audio
-#     - Fixed to the desired output frame rate
-#     - Fixed to the desired duration
-#     - Written to the supplied output location (overwriting is enabled)
-ffmpeg_cl = ['ffmpeg', 
-	'-t', str(content_duration), '-i', beep_file,
-	'-ss', seek, '-t', str(content_duration), '-stream_loop', '-1', '-i', str(input),
-	'-framerate', framerate, '-i', str(boundaries),
-	'-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
-			 '-i', str(Path(str(qr_file_dir)+'\\'+'%05d.png')),
-	'-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
-			 '-i', str(Path(str(flash_file_dir)+'\\'+'%05d.png')),
-	'-framerate', framerate, '-thread_queue_size', '1024', '-start_number', '0',
-			 '-i', str(Path(str(bitpat_file_dir)+'\\'+'%05d.png'))] \
-	+ ['-f', 'lavfi', '-i', 'color=black:d='+str(duration)+':s='+width+'x'+height] \
-	+ start_end_indicators_cl \
-	+ ['-filter_complex',
-		'[6]\
-			setpts=PTS-STARTPTS,\
-			fps=\
-				fps='+framerate+':\
-				start_time=0\
-		[bg_video];\
-		[1:v]\
-			'+tonemap_cl+'\
-			scale=\
-				size='+width+'x'+height+':\
-				force_original_aspect_ratio=decrease,\
-			setsar=1,\
-			pad=\
-				w='+width+':\
-				h='+height+':\
-				x=(ow-iw)/2:\
-				y=(oh-ih)/2,\
-			format='+output_video_encoding_cl[output_video_encoding_cl.index('-pix_fmt')+1]+',\
-			fps=\
-				fps='+framerate+':\
-				start_time='+str(round(start_indicator_offset, 3))+'\
-		[content_video];\
-		[3]\
-			scale=\
-				w='+str(qr_size)+':\
-				h=-1\
-		[qrs];\
-		'+start_end_indicators_vmix_cl+'\
-		[main_video]\
-			drawtext=\
-				fontfile=\''+font+'\':\
-				text=\''+label+'\':\
-				x=(w-tw)/10:\
-				y=(3*lh):\
-				fontcolor=white:\
-				fontsize=h*0.06:\
-				box=1:\
-				boxborderw=10:\
-				boxcolor=black,\
-			drawbox=\
-				x=\'('+width+'*0.1)-4\':\
-				y=\'('+height+'/2)-'+str(qr_size)+'-4\':\
-				w='+str(2*qr_size)+'+4:\
-				h='+str(2*qr_size)+'+4:\
-				t=fill:\
-				color=black,\
-			drawtext=\
-				fontfile=\''+font+'\':\
-				text=\'%{pts\:hms\:'
-					+str((lambda x: x/eval(framerate) if x > 0 else 0)(start_frame))
-					+'};%{eif\:n+'+str(start_frame)+'\:d\:'+str(frame_number_padding)
-					+'};'+str(frame_rate)+'\':\
-				x=(w-tw)/2:\
-				y=h-(4*lh):\
-				fontcolor=white:\
-				fontsize=h*0.06:\
-				box=1:\
-				boxborderw=10:\
-				boxcolor=black\
-		[annotated_main_video];\
-		[4]\
-			scale=\
-				size='+str(flash_block_size)+'x'+str(flash_block_size)+'\
-		[avsync_flash];\
-		[annotated_main_video][avsync_flash]\
-			overlay=\
-				x=\'main_w*0.925-overlay_w\':\
-				y=\'main_h*0.1\':\
-				shortest=1:\
-				repeatlast=0\
-		[video_with_avsync_flash];\
-		[video_with_avsync_flash]\
-			drawbox=\
-				x=1:\
-				y=1:\
-				w='+str(eval(width)-2)+':\
-				h='+str(eval(height)-2)+':\
-				c=black:\
-				t=1\
-		[video_with_inner_border];\
-		[video_with_inner_border]\
-			drawbox=\
-				x=0:\
-				y=0:\
-				w='+str(eval(width))+':\
-				h='+str(eval(height))+':\
-				c=white:\
-				t=1\
-		[video_with_borders];\
-		[2]\
-			scale=\
-				size='+width+'x'+height+'\
-		[boundary_arrows];\
-		[video_with_borders][boundary_arrows]\
-			overlay=\
-				repeatlast=1\
-		[bounded_video];\
-		[bounded_video][qrs]\
-			overlay=\
-				x=\'(main_w*0.1)+if(between(mod(n,'+str(qr_positions)+'),2,3),overlay_w)\':\
-				y=\'(main_h/2)-ifnot(between(mod(n,'+str(qr_positions)+'),1,2),overlay_h)\':\
-				shortest=1:\
-				repeatlast=0\
-		[bounded_video_with_qrs];\
-		[bounded_video_with_qrs][5]\
-			overlay=\
-				x=4/480*'+width+':\
-				y=4/270*'+height+'\
-		[vout];\
-		[1:a]\
-			aresample='+str(audio_samplerate)+'\
-		[resampled_main_audio];\
-		[0][resampled_main_audio]\
-			amix=\
-				inputs=2:\
-				duration=shortest:\
-		[audio_with_avsync];'+start_end_indicators_amix_cl,
-	'-map', '[vout]',
-	'-map', '[aout]',
-	'-c:v'] + output_video_encoding_cl \
-	+ ['-c:a', 'aac', '-b:a', '320k', '-ac', '2',
-	'-y',
-	'-t', str(duration),
-	str(output)]
-
-if not metadata_gen_only:
-	proc = subprocess.run(ffmpeg_cl)
-
-
-# Output metadata
-# Import CTA mezzanine license if available
-mezz_license = ""
-try:
-	mezz_license_file = open(str(Path(str(input.parent)+'\\'+input.stem+'_CTA_LICENSE.txt')), encoding="utf-8")
-	mezz_license = mezz_license_file.read()
-except OSError:
-	print("Failed to load mezzanine CTA LICENSE file. Ensure the file is located in the same folder as the source "
-		  "with the name <source_file_name>_CTA_LICENSE.txt.")
-
-# Calculate MD5 hash
-BLOCK_SIZE = 65536
-mezz_file_hash = hashlib.md5()
-with open(output, 'rb') as mezz_file:
-	mezz_file_block = mezz_file.read(BLOCK_SIZE)
-	while len(mezz_file_block) > 0: 					# Until all data has been read from mezzanine file
-		mezz_file_hash.update(mezz_file_block) 			# Update hash
-		mezz_file_block = mezz_file.read(BLOCK_SIZE) 	# Read the next block from mezzanine file
-
-mezz_metadata = Mezzanine(output.stem, mezz_version, mezz_specification_version, date.today().isoformat(), mezz_license,
-						  './'+output.name, str(Path(__file__).resolve().name)+' '+' '.join(sys.argv[1:]),
-						  ' '.join(ffmpeg_cl).replace('\t', ''), mezz_file_hash.hexdigest(), mezz_properties, mezz_source)
-
-print()
-print()
-print("Name: "+mezz_metadata.name)
-print("URI: "+mezz_metadata.URI)
-print("Version: "+str(mezz_metadata.version))
-print("Spec version: "+str(mezz_metadata.specification_version))
-print("Creation date: "+mezz_metadata.creation_date)
-print("License: "+mezz_metadata.license)
-print("CL used: "+mezz_metadata.command_line)
-print("FFMPEG CL used: "+mezz_metadata.ffmpeg_command_line)
-print("MD5: "+mezz_metadata.md5)
-print()
-print("Width: "+str(mezz_metadata.properties.width))
-print("Height: "+str(mezz_metadata.properties.height))
-print("Frame rate: "+str(mezz_metadata.properties.frame_rate))
-print("Scan: "+mezz_metadata.properties.scan)
-print("Px Format: "+mezz_metadata.properties.pixel_format)
-print("Bit depth: "+str(mezz_metadata.properties.bit_depth))
-print("Color primaries: "+mezz_metadata.properties.color_primaries)
-print("Matrix coefficients: "+mezz_metadata.properties.matrix_coefficients)
-print("Transfer characteristics: "+mezz_metadata.properties.transfer_characteristics)
-print("Range: "+mezz_metadata.properties.range)
-print("Duration: "+str(mezz_metadata.properties.duration))
-print("Frame count: "+str(mezz_metadata.properties.frame_count))
-print("Start frame: "+str(mezz_metadata.properties.start_frame))
-print("Start indicator: "+str(mezz_metadata.properties.start_indicator))
-print("End indicator: "+str(mezz_metadata.properties.end_indicator))
-print("QR positions: "+str(mezz_metadata.properties.qr_positions))
-print("Label: "+mezz_metadata.properties.label)
-print("Codec: "+mezz_metadata.properties.codec)
-print()
-print("Source name: "+mezz_metadata.source.name)
-print("Source URI: "+mezz_metadata.source.URI)
-print("Source license: "+mezz_metadata.source.license)
-print()
-
-# Save metadata to JSON file
-mezz_metadata_file = open(str(mezz_metadata_filepath), "w")
-json.dump(mezz_metadata, mezz_metadata_file, indent=4, cls=MezzanineEncoder)
-mezz_metadata_file.write('\n')
-mezz_metadata_file.close()
-
-print("Mezzanine metadata stored in: "+str(mezz_metadata_filepath))
-print()
-
-
-# Remove the temporary files for the QR codes, flashes and beeps
-if not metadata_gen_only:
-	print("Removing temporary files...", end='', flush=True)
-
-	os.remove(beep_file)
-	frame_count = int(round(math.ceil(eval(framerate))*math.ceil(duration), 0))
-	for i in range(0, frame_count):
-		qr_filename = str(Path(str(qr_file_dir)+'\\'+(str(i).zfill(5)+'.png')))
-		flash_filename = str(Path(str(flash_file_dir)+'\\'+(str(i).zfill(5)+'.png')))
-		bitpattern_filename = str(Path(str(bitpat_file_dir)+'\\'+(str(i+start_frame).zfill(5)+'.png')))
-		try:
-			os.remove(qr_filename)
-		except OSError as e:
-			if e.errno != errno.ENOENT:		# No such file or directory
-				raise
-		try:
-			os.remove(flash_filename)
-		except OSError as e:
-			if e.errno != errno.ENOENT:		# No such file or directory
-				raise
-		try:
-			os.remove(bitpattern_filename)
-		except OSError as e:
-			if e.errno != errno.ENOENT:		# No such file or directory
-				raise
-	print("Done")
+	# Remove the temporary files for the annotations, flashes and beeps
+	if not metadata_gen_only:
+		print("Removing temporary files...", end='', flush=True)
+
+		os.remove(flash_cmd_file)
+		if beep_synthesis == 'samples' and avsync_periodic and not beep_file_cached:
+			os.remove(beep_file)
+		frame_count = int(round(math.ceil(eval(framerate))*math.ceil(duration), 0))
+		if annotation_transport == 'pipes':
+			frame_count = 0 	# No annotation image files were written
+		for i in range(0, frame_count):
+			qr_filename = str(Path(str(qr_file_dir)+'\\'+(str(i).zfill(5)+qr_file_ext[qr_raster])))
+			bitpattern_filename = str(Path(str(bitpat_file_dir)+'\\'+(str(i+start_frame).zfill(5)+'.png')))
+			annotation_filename = str(Path(str(annotation_file_dir)+'\\'+(str(i).zfill(5)+'.png')))
+			try:
+				os.remove(qr_filename)
+			except OSError as e:
+				if e.errno != errno.ENOENT:		# No such file or directory
+					raise
+			try:
+				os.remove(bitpattern_filename)
+			except OSError as e:
+				if e.errno != errno.ENOENT:		# No such file or directory
+					raise
+			try:
+				os.remove(annotation_filename)
+			except OSError as e:
+				if e.errno != errno.ENOENT:		# No such file or directory
+					raise
+		print("Done")
 	
-	print("Removing temporary folders...", end='', flush=True)
-	if len(os.listdir(str(qr_file_dir))) == 0:
-		os.rmdir(str(qr_file_dir))
-	if len(os.listdir(str(flash_file_dir))) == 0:
-		os.rmdir(str(flash_file_dir))
-	if len(os.listdir(str(bitpat_file_dir))) == 0:
-		os.rmdir(str(bitpat_file_dir))
+		print("Removing temporary folders...", end='', flush=True)
+		if annotation_transport == 'pipes':
+			for name, (pipe_filename, pipe_pix_fmt, pipe_size) in pipes.items():
+				os.remove(pipe_filename)
+			os.rmdir(str(pipe_dir))
+		else:
+			for file_dir in [qr_file_dir, bitpat_file_dir, annotation_file_dir]:
+				if os.path.isdir(file_dir) and len(os.listdir(str(file_dir))) == 0:
+					os.rmdir(str(file_dir))
 		
-	print("Done")
-	print()
+		print("Done")
+		print()
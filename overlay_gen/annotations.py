@@ -0,0 +1,89 @@
+# Composites the annotations changing on every frame (QR code and bit pattern) into a single gray + alpha image per frame,
+# so ffmpeg overlays one image per frame instead of one per annotation.
+# The image only covers the smallest area containing the bit pattern and all QR code positions,
+# everything else in that area is transparent.
+# Note: the A/V sync flash is not part of the composite, it is drawn by ffmpeg in its own small block (see mezzanine.py),
+# including it would extend the composite to almost the full width of the video.
+import os
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+
+def align(v):
+	# Positions are truncated to an even pixel, as done by the ffmpeg overlay filter for 4:2:0 video
+	return int(v) & ~1
+
+
+def annotation_layout(width, height, qr_size, bp_width, bp_height):
+	# Returns the position and size of the composite in the video, as (x, y, w, h),
+	# the position of the QR code for each of the 4 QR code positions and the position of the bit pattern,
+	# relative to the composite.
+	# QR code position n: x=(w*0.1)+if(between(n,2,3),qr_size), y=(h/2)-ifnot(between(n,1,2),qr_size)
+	qr_xy = [(align(width*0.1+(qr_size if n in (2, 3) else 0)), align(height/2-(0 if n in (1, 2) else qr_size)))
+			 for n in range(4)]
+	bp_xy = (align(4/480*width), align(4/270*height))
+
+	x = min([bp_xy[0]]+[qr_x for qr_x, qr_y in qr_xy])
+	y = min([bp_xy[1]]+[qr_y for qr_x, qr_y in qr_xy])
+	w = max([bp_xy[0]+bp_width]+[qr_x+qr_size for qr_x, qr_y in qr_xy])-x
+	h = max([bp_xy[1]+bp_height]+[qr_y+qr_size for qr_x, qr_y in qr_xy])-y
+
+	return (x, y, w, h), [(qr_x-x, qr_y-y) for qr_x, qr_y in qr_xy], (bp_xy[0]-x, bp_xy[1]-y)
+
+
+def annotation_frames(qr_imgs, bp_imgs, layout, qr_positions):
+	# Yields the composite of each frame, as an array of shape (h, w, 2) containing the gray and alpha planes
+	(x, y, w, h), qr_xy, bp_xy = layout
+	for n, (qr_img, bp_img) in enumerate(zip(qr_imgs, bp_imgs)):
+		frame = np.zeros((h, w, 2), dtype='uint8')
+		qr_x, qr_y = qr_xy[n % qr_positions]
+		frame[qr_y:qr_y+qr_img.shape[0], qr_x:qr_x+qr_img.shape[1], 0] = qr_img
+		frame[qr_y:qr_y+qr_img.shape[0], qr_x:qr_x+qr_img.shape[1], 1] = 255
+		frame[bp_xy[1]:bp_xy[1]+bp_img.shape[0], bp_xy[0]:bp_xy[0]+bp_img.shape[1], 0] = bp_img
+		frame[bp_xy[1]:bp_xy[1]+bp_img.shape[0], bp_xy[0]:bp_xy[0]+bp_img.shape[1], 1] = 255
+		yield frame
+
+
+def annotation_filename(annotation_file_dir, index):
+	return Path(str(annotation_file_dir)+'\\'+str(index).zfill(5)+'.png')
+
+
+def annotation_save(filename, frame):
+	# Composites are saved as gray + alpha images, with fast PNG compression as they are mostly transparent
+	try:
+		Image.fromarray(frame, 'LA').save(str(filename), format='PNG', compress_level=1)
+	except OSError:
+		return False
+	return True
+
+
+def annotation_generate(annotation_file_dir, frames, workers=None, block_size=100):
+	# Composite i is written to <annotation_file_dir>\<i zero padded to 5 digits>.png
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	# PNG encoding releases the GIL, so the images of a block are saved using a pool of threads.
+	# Frames are consumed one block at a time, so memory use does not depend on the number of frames.
+	def save_block(executor, block, index):
+		statuses = list(executor.map(annotation_save,
+									 [annotation_filename(annotation_file_dir, index+i) for i in range(len(block))], block))
+		print(str(index+len(block))+" | "+{True: 'saved', False: 'failed'}[all(statuses)], end='\r', flush=True)
+
+	index = 0
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		block = []
+		for frame in frames:
+			block.append(frame)
+			if len(block) == block_size:
+				save_block(executor, block, index)
+				index += len(block)
+				block = []
+		if len(block) > 0:
+			save_block(executor, block, index)
+			index += len(block)
+	print()
+	return index
@@ -0,0 +1,79 @@
+# Generates the static overlay layer, containing the annotations that are identical on every frame of a mezzanine stream:
+#   - the label, drawn on a black box
+#   - the black box behind the QR codes
+#   - the 2px wide border around the video edge (outer 1px white border, inner 1px black border)
+#   - the boundary markers, scaled to the output resolution
+# The layer is a transparent RGBA image rendered once per resolution, label, font and boundaries image,
+# so ffmpeg only overlays a single image instead of scaling, drawing and overlaying each element on every frame.
+# Layers are cached, the cache key includes the content of the font and boundaries files.
+import hashlib
+import os
+
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+
+
+overlay_version = 1 	# Part of the cache key, to be incremented when the layout of the layer changes
+label_font_scale = 0.06 	# Label font size relative to the video height
+label_box_border = 10 		# Width of the black box drawn around the label, in pixels
+
+
+def file_sha256(filename):
+	file_hash = hashlib.sha256()
+	with open(filename, 'rb') as f:
+		for block in iter(lambda: f.read(65536), b''):
+			file_hash.update(block)
+	return file_hash.hexdigest()
+
+
+def overlay_cache_filename(overlay_cache_dir, width, height, label, font, boundaries, qr_size):
+	key_items = [str(overlay_version), str(width)+'x'+str(height), label, file_sha256(font), file_sha256(boundaries),
+				 str(qr_size)]
+	key = hashlib.sha256(';'.join(key_items).encode('utf-8')).hexdigest()
+	return Path(overlay_cache_dir, str(width)+'x'+str(height)+'_'+key+'.png')
+
+
+def overlay_create(filename, width, height, label, font, boundaries, qr_size):
+	layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+	draw = ImageDraw.Draw(layer)
+
+	# Label drawn at x=(w-tw)/10, y=3*lh, where tw is the text width and lh the line height, on a black box
+	label_font = ImageFont.truetype(str(font), int(height*label_font_scale))
+	ascent, descent = label_font.getmetrics()
+	lh = ascent+descent
+	if hasattr(label_font, 'getlength'):
+		tw = label_font.getlength(label)
+	else:
+		tw = label_font.getsize(label)[0] 	# Pillow < 8.0
+	x = int((width-tw)/10)
+	y = 3*lh
+	draw.rectangle([x-label_box_border, y-label_box_border, x+tw+label_box_border-1, y+lh+label_box_border-1],
+				   fill=(0, 0, 0, 255))
+	draw.text((x, y), label, font=label_font, fill=(255, 255, 255, 255))
+
+	# Black box behind the QR codes, covering the 4 QR code positions
+	x = int(width*0.1)-4
+	y = int(height/2)-qr_size-4
+	draw.rectangle([x, y, x+2*qr_size+4-1, y+2*qr_size+4-1], fill=(0, 0, 0, 255))
+
+	# Inner 1px black border and outer 1px white border
+	draw.rectangle([1, 1, width-2, height-2], outline=(0, 0, 0, 255))
+	draw.rectangle([0, 0, width-1, height-1], outline=(255, 255, 255, 255))
+
+	# Boundary markers scaled to the output resolution, on top of the other elements
+	boundary_markers = Image.open(boundaries).convert('RGBA').resize((width, height), Image.BICUBIC)
+	layer = Image.alpha_composite(layer, boundary_markers)
+
+	# Write to a temporary file first, so concurrent jobs never read a partially written layer
+	os.makedirs(Path(filename).parent, exist_ok=True)
+	tmp_filename = Path(filename).with_name(Path(filename).stem+'.'+str(os.getpid())+'.tmp.png')
+	layer.save(str(tmp_filename), format='PNG')
+	os.replace(tmp_filename, filename)
+
+
+def overlay_generate(overlay_cache_dir, width, height, label, font, boundaries, qr_size):
+	# Returns the filename of the static overlay layer, only rendered when not found in the cache
+	filename = overlay_cache_filename(overlay_cache_dir, width, height, label, font, boundaries, qr_size)
+	if not os.path.isfile(filename):
+		overlay_create(filename, width, height, label, font, boundaries, qr_size)
+	return filename
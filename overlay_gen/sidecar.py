@@ -0,0 +1,56 @@
+# Writes a sidecar file describing the annotations of each frame of a mezzanine stream,
+# so test tools can look up what a frame should look like without re-deriving the annotations or parsing JSON.
+# The sidecar is a NumPy .npy file containing a structured array with one row per frame, row n describing frame n:
+#   - frame_number: the frame number in the QR code and bit pattern
+#   - pts: the timecode in the QR code, in seconds (not rounded to milliseconds, see qr_frame_pts())
+#   - qr_position: the QR code position index (0 to number of QR code positions-1)
+#   - flash: 1 when the A/V sync flash is shown, 0 otherwise
+#   - bitpattern: the data bits of the bit pattern, packed into 24 bytes (bit i is bit i%8 of byte i//8)
+# Rows have a fixed size, so the sidecar can be memory-mapped and any frame looked up directly,
+# e.g. np.load(filename, mmap_mode='r')[n]
+import itertools
+import os
+
+import numpy as np
+
+from bp_gen.bitpattern import bits_per_ln, bp_data_bits, nof_data_ln
+from pathlib import Path
+from qr_gen.qrcodes import qr_frame_pts
+
+
+sidecar_dtype = np.dtype([
+	('frame_number', '<u4'),
+	('pts', '<f8'),
+	('qr_position', 'u1'),
+	('flash', 'u1'),
+	('bitpattern', 'u1', (bits_per_ln*nof_data_ln//8,))])
+
+
+def sidecar_filename(output):
+	return Path(str(Path(output).parent)+'\\'+str(Path(output).stem)+'_frames.npy')
+
+
+def sidecar_generate(filename, frame_count, start_frame, frame_rate, frame_duration, width, height, qr_positions,
+					 flash_intervals, block_size=10000):
+	# The rows are written block by block to the memory-mapped file, so memory use does not depend on the number of frames
+	tmp_filename = Path(filename).with_name(Path(filename).stem+'.'+str(os.getpid())+'.tmp.npy')
+	frames = np.lib.format.open_memmap(str(tmp_filename), mode='w+', dtype=sidecar_dtype, shape=(frame_count,))
+
+	flash = np.zeros(frame_count, dtype='u1')
+	for flash_start, flash_end in flash_intervals:
+		flash[flash_start:flash_end] = 1
+
+	frame_pts = qr_frame_pts(frame_count, start_frame, frame_duration)
+	for i in range(0, frame_count, block_size):
+		frame_numbers = np.arange(i, min(i+block_size, frame_count))+start_frame
+		block = frames[i:i+len(frame_numbers)]
+		block['frame_number'] = frame_numbers
+		block['pts'] = np.fromiter(itertools.islice(frame_pts, len(frame_numbers)), dtype='float64', count=len(frame_numbers))
+		block['qr_position'] = (frame_numbers-start_frame) % qr_positions
+		block['flash'] = flash[i:i+len(frame_numbers)]
+		block['bitpattern'] = np.packbits(
+			bp_data_bits(frame_numbers, frame_count, frame_rate, width, height), axis=1, bitorder='little')
+
+	frames.flush()
+	del frames
+	os.replace(tmp_filename, filename)
@@ -0,0 +1,223 @@
+# Generates the QR codes containing label, timecode, frame number and frame rate for each frame
+# Step 1: build the QR code payloads for all frames (sequentially, so timecode rounding is deterministic)
+# Step 2: look up each payload in the QR code cache (when enabled), to skip encoding QR codes rendered previously
+# Step 3: encode and save the remaining QR code images across a pool of worker processes
+# QR code images are either:
+#   - rasterized directly from the QR code module matrix at the final overlay size, saved as PGM ("matrix"), or
+#   - drawn by the qrcode PIL image factory at a fixed box size, saved as PNG and scaled by ffmpeg ("pil")
+# Alternatively, QR code images rasterized from the QR code matrix can be yielded in order as arrays
+# (e.g. to stream them to ffmpeg), without writing them to the output folder.
+# Note: the worker functions live in this module (not in mezzanine.py) so they can be imported by spawned processes
+import hashlib
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import qrcode
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+# QR code settings, part of the cache key as they change the image rendered for the same payload
+qr_box_size = 6
+qr_border = 4
+qr_error_correction = 'H'
+qr_file_ext = {'matrix': '.pgm', 'pil': '.png'}
+qr_error_correction_levels = {
+	'L': qrcode.constants.ERROR_CORRECT_L, 'M': qrcode.constants.ERROR_CORRECT_M,
+	'Q': qrcode.constants.ERROR_CORRECT_Q, 'H': qrcode.constants.ERROR_CORRECT_H}
+
+# The worker processes are spawned rather than forked: the pools are created from the stage threads of mezzanine.py,
+# and forking a process with other threads running can deadlock the child on a lock held by one of these threads
+qr_mp_context = multiprocessing.get_context('spawn')
+
+
+def qr_frame_pts(frame_count, start_frame, frame_duration):
+	# Yields the timecode of each frame in seconds, before it is rounded to milliseconds in the QR code.
+	# The timecode is accumulated frame by frame, rounded at each frame, so other files describing the frames
+	# (e.g. the frame sidecar) must use these values to match the QR codes exactly.
+	frame_pts = start_frame*round(frame_duration, 10)
+	for i in range(0, frame_count):
+		yield frame_pts
+		frame_pts = round(frame_pts+frame_duration, 10)
+
+
+def qr_payloads(label, frame_count, start_frame, frame_number_padding, frame_rate, frame_duration):
+	payloads = []
+	for i, frame_pts in enumerate(qr_frame_pts(frame_count, start_frame, frame_duration)):
+		frame_pts_rounded = round(frame_pts, 3)
+		timecode = '{:02d}:{:02d}:{:06.3f}'.format(int(frame_pts_rounded/3600), int(frame_pts_rounded/60) % 60, frame_pts_rounded % 60)
+		padded_frame = str(i+start_frame).zfill(frame_number_padding)
+		payloads.append(label+';'+timecode+';'+padded_frame+';'+str(frame_rate))
+	return payloads
+
+
+def qr_filename(qr_file_dir, index, qr_raster='pil'):
+	return Path(str(qr_file_dir)+'\\'+(str(index).zfill(5)+qr_file_ext[qr_raster]))
+
+
+def qr_cache_filename(qr_cache_dir, payload, qr_raster='pil', qr_size=None):
+	# The cache is content addressed: the key only depends on the payload and the QR code settings,
+	# so cached images are shared between sources and mezzanine (specification) versions,
+	# and also between resolutions for QR codes drawn by PIL, as these are scaled by ffmpeg
+	key_items = [payload, str(qr_box_size), str(qr_border), qr_error_correction]
+	if qr_raster == 'matrix':
+		key_items += [qr_raster, str(qr_size)]
+	key = hashlib.sha256(';'.join(key_items).encode('utf-8')).hexdigest()
+	return Path(qr_cache_dir, key[0:2], key+qr_file_ext[qr_raster])
+
+
+def qr_rasterize(matrix, qr_size):
+	# Nearest neighbour expansion of the module matrix (which includes the border) to exactly qr_size x qr_size pixels.
+	# Each module becomes a block of floor or ceil(qr_size/modules) pixels, so the modules stay sharp.
+	modules = np.array(matrix, dtype='uint8')*255
+	edges = (np.arange(modules.shape[0]+1)*qr_size)//modules.shape[0]
+	block_sizes = np.diff(edges)
+	return np.repeat(np.repeat(modules, block_sizes, axis=0), block_sizes, axis=1)
+
+
+def pgm_save(filename, image):
+	with open(filename, 'wb') as pgm_file:
+		pgm_file.write(b'P5\n%d %d\n255\n' % (image.shape[1], image.shape[0]))
+		pgm_file.write(np.ascontiguousarray(image, dtype='uint8').tobytes())
+
+
+def pgm_load(filename):
+	# Only supports the binary 8 bit PGM files written by pgm_save
+	with open(filename, 'rb') as pgm_file:
+		magic, width, height, maxval = pgm_file.readline(), *pgm_file.readline().split(), pgm_file.readline()
+		return np.frombuffer(pgm_file.read(), dtype='uint8').reshape((int(height), int(width)))
+
+
+def qr_link(source, destination):
+	# Hard link cached images to avoid copying them, fall back to a copy (e.g. when on another drive)
+	try:
+		os.remove(destination)
+	except FileNotFoundError:
+		pass
+	try:
+		os.link(source, destination)
+	except OSError:
+		shutil.copyfile(source, destination)
+
+
+def qr_encode(payload):
+	qr = qrcode.QRCode(
+		version=None,
+		error_correction=qr_error_correction_levels[qr_error_correction],
+		box_size=qr_box_size,
+		border=qr_border,
+		)
+	qr.add_data(payload)
+	qr.make(fit=True)
+	return qr
+
+
+def qr_cache_store(cache_filename, save):
+	# Write to a temporary file first, so concurrent jobs never read a partially written cache entry
+	os.makedirs(cache_filename.parent, exist_ok=True)
+	tmp_filename = cache_filename.with_name(cache_filename.stem+'.'+str(os.getpid())+'.tmp')
+	save(tmp_filename)
+	os.replace(tmp_filename, cache_filename)
+
+
+def qr_create(qr_file_dir, index, payload, qr_cache_dir=None, qr_raster='pil', qr_size=None):
+	qr = qr_encode(payload)
+
+	if qr_raster == 'matrix':
+		qr_img = qr_rasterize(qr.get_matrix(), qr_size)
+		save = lambda filename: pgm_save(filename, qr_img)
+	else:
+		qr_img = qr.make_image(fill_color='white', back_color='black')
+		save = lambda filename: qr_img.save(str(filename), format='PNG')
+
+	if qr_cache_dir is None:
+		save(qr_filename(qr_file_dir, index, qr_raster))
+	else:
+		cache_filename = qr_cache_filename(qr_cache_dir, payload, qr_raster, qr_size)
+		qr_cache_store(cache_filename, save)
+		qr_link(cache_filename, qr_filename(qr_file_dir, index, qr_raster))
+
+
+def qr_create_batch(qr_file_dir, indices, payloads, qr_cache_dir=None, qr_raster='pil', qr_size=None):
+	for index, payload in zip(indices, payloads):
+		qr_create(qr_file_dir, index, payload, qr_cache_dir, qr_raster, qr_size)
+	return len(indices)
+
+
+def qr_generate(qr_file_dir, payloads, workers=None, qr_cache_dir=None, qr_raster='pil', qr_size=None, batch_size=100):
+	# QR code i is always written to <qr_file_dir>\<i zero padded to 5 digits>.png (or .pgm),
+	# whichever worker encodes it, so the output does not depend on the number of workers
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	# Only QR codes not found in the cache are encoded
+	if qr_cache_dir is not None:
+		indices = []
+		for i, payload in enumerate(payloads):
+			cache_filename = qr_cache_filename(qr_cache_dir, payload, qr_raster, qr_size)
+			if os.path.isfile(cache_filename):
+				qr_link(cache_filename, qr_filename(qr_file_dir, i, qr_raster))
+			else:
+				indices.append(i)
+		print("QR code cache: "+str(len(payloads)-len(indices))+" found, "+str(len(indices))+" to encode")
+	else:
+		indices = list(range(len(payloads)))
+
+	batches = [indices[i:i+batch_size] for i in range(0, len(indices), batch_size)]
+	nb_created = 0
+	if workers <= 1 or len(batches) <= 1:
+		for batch in batches:
+			nb_created += qr_create_batch(qr_file_dir, batch, [payloads[j] for j in batch], qr_cache_dir, qr_raster, qr_size)
+			print(str(nb_created)+"/"+str(len(indices)), end='\r', flush=True)
+	else:
+		with ProcessPoolExecutor(max_workers=workers, mp_context=qr_mp_context) as executor:
+			results = executor.map(qr_create_batch,
+								   [qr_file_dir]*len(batches), batches,
+								   [[payloads[j] for j in batch] for batch in batches],
+								   [qr_cache_dir]*len(batches), [qr_raster]*len(batches), [qr_size]*len(batches))
+			for nb_batch_created in results: 	# Results are returned in submission order
+				nb_created += nb_batch_created
+				print(str(nb_created)+"/"+str(len(indices)), end='\r', flush=True)
+	print()
+	return nb_created
+
+
+def qr_raster_batch(payloads, qr_size, qr_cache_dir=None):
+	qr_imgs = np.zeros((len(payloads), qr_size, qr_size), dtype='uint8')
+	for i, payload in enumerate(payloads):
+		if qr_cache_dir is not None:
+			cache_filename = qr_cache_filename(qr_cache_dir, payload, 'matrix', qr_size)
+			if os.path.isfile(cache_filename):
+				qr_imgs[i] = pgm_load(cache_filename)
+				continue
+		qr_imgs[i] = qr_rasterize(qr_encode(payload).get_matrix(), qr_size)
+		if qr_cache_dir is not None:
+			qr_cache_store(cache_filename, lambda filename: pgm_save(filename, qr_imgs[i]))
+	return qr_imgs
+
+
+def qr_frames(payloads, qr_size, workers=None, qr_cache_dir=None, batch_size=100):
+	# Yields the QR code images rasterized from the QR code matrix, in frame order.
+	# The number of batches in progress is limited, so memory use does not depend on the number of frames
+	# when the consumer (e.g. ffmpeg) is slower than the workers.
+	if workers is None:
+		workers = os.cpu_count() or 1
+	batches = [payloads[i:i+batch_size] for i in range(0, len(payloads), batch_size)]
+
+	if workers <= 1:
+		for batch in batches:
+			yield from qr_raster_batch(batch, qr_size, qr_cache_dir)
+		return
+
+	with ProcessPoolExecutor(max_workers=workers, mp_context=qr_mp_context) as executor:
+		pending = deque()
+		for batch in batches:
+			pending.append(executor.submit(qr_raster_batch, batch, qr_size, qr_cache_dir))
+			if len(pending) >= 2*workers:
+				yield from pending.popleft().result()
+		while pending:
+			yield from pending.popleft().result()
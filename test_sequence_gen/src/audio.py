@@ -38,6 +38,11 @@ Example usage:
     
     savAsWavFile(seq, "audio.wav", sampleRateHz)
     
+When NumPy is available, genBeepSequenceArray() generates the same sample values
+as a NumPy array, without generating them one at a time.
+genBeepSequenceBlocks() generates them block by block, and saveBlocksAsWavFile()
+writes each block as it is generated, so memory use does not depend on the duration.
+
 """
 
 import itertools
@@ -46,35 +51,86 @@ import struct
 import wave
 
 from eventTimingGen import calcNearestDurationForExactNumberOfCycles
-from eventTimingGen import genSequenceStartEnds
+from eventTimingGen import genSequenceStartEnds, genSequenceStartEndsArray
 from eventTimingGen import secsToTicks
 from eventTimingGen import genSequenceFromSampleIndices
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
-def saveAsWavFile(seq, filename, sampleRateHz):
+def saveAsWavFile(seq, filename, sampleRateHz, blockSize=65536):
     """\
     Saves sample data in a list (or iterable object) to a file as a mono WAV file.
+    The sample data is written in blocks, so an iterable is never held in memory in full.
     
-    :param seq: list or iterable containing numbers corresponding to 16 bit signed sample values
+    :param seq: list, iterable or NumPy array containing numbers corresponding to 16 bit signed sample values
     :param filename: The filename to write to
     :param sampleRateHz: The sample rate of the sample data
+    :param blockSize: The number of samples written at a time
     """
-    # turn into signed 16 bit little-endian raw samples
-    values = list(seq) 
-    num = len(values)
-    sampleData = struct.pack("<"+str(num)+"h", *values)
+    saveBlocksAsWavFile(genSampleBlocks(seq, blockSize), filename, sampleRateHz)
+
+
+def saveBlocksAsWavFile(blocks, filename, sampleRateHz):
+    """\
+    Saves sample data provided as consecutive blocks to a file as a mono WAV file.
+    Each block is written as soon as it is obtained, so memory use does not depend on the duration.
     
-    # write data out as a WAV file
+    :param blocks: iterable of blocks (lists, iterables or NumPy arrays) of 16 bit signed sample values
+    :param filename: The filename to write to
+    :param sampleRateHz: The sample rate of the sample data
+    """
     wav = wave.open(filename, "wb")
     
     wav.setnchannels(1)            # mono
     wav.setsampwidth(2)            # 16 bit (2 byte) samples
     wav.setframerate(sampleRateHz) 
     wav.setcomptype("NONE","NONE")
-    wav.writeframes(sampleData)
+    for block in blocks:
+        # turn into signed 16 bit little-endian raw samples
+        wav.writeframes(samplesToBytes(block))
     wav.close()
 
 
+def genSampleBlocks(seq, blockSize):
+    """\
+    Splits sample data into consecutive blocks.
+
+    :param seq: list, iterable or NumPy array containing numbers corresponding to 16 bit signed sample values
+    :param blockSize: The maximum number of samples per block
+
+    :returns: iterator yielding blocks (lists, or NumPy arrays when seq is a NumPy array) of at most blockSize samples
+    """
+    if np is not None and isinstance(seq, np.ndarray):
+        for i in range(0, len(seq), blockSize):
+            yield seq[i:i+blockSize]
+        return
+    seqIter = iter(seq)
+    while True:
+        block = list(itertools.islice(seqIter, blockSize))
+        if not block:
+            return
+        yield block
+
+
+def samplesToBytes(seq):
+    """\
+    Converts sample data to signed 16 bit little-endian raw samples.
+
+    :param seq: list, iterable or NumPy array containing numbers corresponding to 16 bit signed sample values
+
+    :returns: bytes containing the raw samples
+    """
+    if np is not None and isinstance(seq, np.ndarray):
+        return seq.astype("<i2").tobytes()
+    values = list(seq) 
+    num = len(values)
+    return struct.pack("<"+str(num)+"h", *values)
+
+
 def GenTone(sampleRateHz, peakValue, toneHz, phaseOffsetCycles=0.0):
     """\
     Generator that yields audio sample values for a tone at the specified amplitude and frequency for a given sample rate.
@@ -129,6 +185,121 @@ def genBeepSequence(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDuration
 
 
 
+def genBeepSampleRanges(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude):
+    """\
+    Calculates where the beeps generated by genBeepSequence() are placed, for the NumPy based generators.
+
+    As each beep restarts the tone at phase 0, all beeps are a prefix of a single tone burst.
+    A beep overlapping the previous one starts where the previous one ended, as done by genSequenceFromSampleIndices(),
+    and beeps are truncated at the end of the sequence.
+
+    Parameters are the same as for genBeepSequence().
+
+    :returns: tuple (startSampleNums, endSampleNums, burst, nSamples), where startSampleNums and endSampleNums are
+              NumPy arrays of the start and end sample indices of each beep, burst is a NumPy int16 array containing
+              the tone burst (long enough for the longest beep) and nSamples is the number of samples of the sequence
+    """
+    beepDurationSamples = calcNearestDurationForExactNumberOfCycles(idealBeepDurationSecs, toneHz)
+
+    nSamples = int(sequenceDurationSecs * sampleRateHz)
+
+    # only the beeps starting before the end of the sequence are needed (beep centre times are in ascending order)
+    halfBeepDurationNumSamples = beepDurationSamples / 2.0 / 1.0 * sampleRateHz
+    centreTimes = []
+    for centreTime in beepCentreTimesSecs:
+        if int(round(centreTime / 1.0 * sampleRateHz - halfBeepDurationNumSamples)) >= nSamples:
+            break
+        centreTimes.append(centreTime)
+
+    startSampleNums, endSampleNums = genSequenceStartEndsArray(centreTimes, beepDurationSamples, 1.0, sampleRateHz)
+
+    if len(centreTimes) > 0:
+        previousEnds = np.maximum.accumulate(np.concatenate(([0], endSampleNums[:-1])))
+        startSampleNums = np.maximum(startSampleNums, previousEnds)
+        endSampleNums = np.minimum(endSampleNums, nSamples)
+        burstLen = max(0, int(np.max(endSampleNums - startSampleNums)))
+    else:
+        burstLen = 0
+
+    # the tone burst, calculated as GenTone() does (math.sin, as np.sin may differ in the last bit)
+    samplesPerCycle = sampleRateHz / float(toneHz)
+    burst = np.array([int(amplitude * math.sin(math.modf(n / samplesPerCycle + 0.0)[0] * 2 * math.pi))
+                      for n in range(burstLen)], dtype=np.int16)
+
+    return startSampleNums, endSampleNums, burst, nSamples
+
+
+def genBeepSequenceArray(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude):
+    """\
+    Generates the same audio sample values as genBeepSequence(), as a NumPy int16 array.
+
+    Rather than generating the samples one at a time, a single tone burst is generated
+    and copied into a silent buffer for each beep (see genBeepSampleRanges()).
+
+    Parameters are the same as for genBeepSequence().
+
+    :returns: A NumPy int16 array containing the sample values starting with the first sample value
+    """
+    startSampleNums, endSampleNums, burst, nSamples = genBeepSampleRanges(
+        beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude)
+
+    samples = np.zeros(nSamples, dtype=np.int16)
+    for startIndex, endIndex in zip(startSampleNums.tolist(), endSampleNums.tolist()):
+        if endIndex > startIndex:
+            samples[startIndex:endIndex] = burst[:endIndex-startIndex]
+    return samples
+
+
+def genBeepSequenceBlocks(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude, blockSize=65536):
+    """\
+    Generates the same audio sample values as genBeepSequence(), as consecutive NumPy int16 arrays of blockSize samples
+    (the last one may be shorter). Only one block is held in memory at a time, whatever the duration.
+
+    Parameters are the same as for genBeepSequence(), plus:
+
+    :param blockSize: The number of samples per block
+
+    :returns: iterator yielding NumPy int16 arrays containing the sample values starting with the first sample value
+    """
+    startSampleNums, endSampleNums, burst, nSamples = genBeepSampleRanges(
+        beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude)
+
+    for blockStart in range(0, nSamples, blockSize):
+        blockEnd = min(blockStart + blockSize, nSamples)
+        block = np.zeros(blockEnd - blockStart, dtype=np.int16)
+        # beeps overlapping the block (beeps do not overlap each other, so both arrays are in ascending order)
+        first = int(np.searchsorted(endSampleNums, blockStart, side="right"))
+        last = int(np.searchsorted(startSampleNums, blockEnd, side="left"))
+        for startIndex, endIndex in zip(startSampleNums[first:last].tolist(), endSampleNums[first:last].tolist()):
+            if endIndex > startIndex:
+                a, b = max(startIndex, blockStart), min(endIndex, blockEnd)
+                block[a-blockStart:b-blockStart] = burst[a-startIndex:b-startIndex]
+        yield block
+
+
+def genBeepSamples(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude):
+    """\
+    Generates the audio sample values of genBeepSequence(), using genBeepSequenceArray() when NumPy is available.
+
+    :returns: A NumPy int16 array, or a list when NumPy is not available, containing the sample values
+    """
+    if np is not None:
+        return genBeepSequenceArray(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude)
+    return list(genBeepSequence(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude))
+
+
+def genBeepSampleBlocks(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude, blockSize=65536):
+    """\
+    Generates the audio sample values of genBeepSequence() as consecutive blocks of blockSize samples,
+    using genBeepSequenceBlocks() when NumPy is available.
+
+    :returns: iterator yielding NumPy int16 arrays, or lists when NumPy is not available, containing the sample values
+    """
+    if np is not None:
+        return genBeepSequenceBlocks(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude, blockSize)
+    return genSampleBlocks(genBeepSequence(beepCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude), blockSize)
+
+
 def secsToSamples(tSecs, startSample=0, sampleRateHz = 480000):
     return secsToTicks(tSecs, startSample, sampleRateHz)
 
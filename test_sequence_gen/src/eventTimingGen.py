@@ -33,11 +33,23 @@ Includes:
   a flash
   
 * a means to generate a stream of values corresponding to audio samples or frames
+
+When NumPy is available, the maximal-length-sequence, the pulse timings and the
+start and end times of events can also be computed as NumPy arrays (see mlsArray(),
+encodeBitStreamAsPulseTimingsArray() and genSequenceStartEndsArray()), with the
+same values as their generator counterparts.
 """
 
 
 import itertools
 
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def lfsr(bitLen, polycoeffs, iterationLimit=None):
     """\
@@ -109,8 +121,58 @@ _mls_taps = {
 """\
 With an MLS of N bits, you only need to observe N consecutive bits to uniquely
 locate yourself anywhere in the (2**N)-1 length sequence
+
+mlsWindowIndex() provides the index used to do so, and locateMlsWindows() looks up
+each window of N consecutive bits observed.
 """
 
+@lru_cache(maxsize=None)
+def mlsArray(bitLen):
+    """\
+    Maximum length bit sequence, computed with NumPy. Requires NumPy.
+    
+    :param bitLen: The number of bits in the shift register.
+    
+    :returns: A read-only NumPy uint8 array containing one period (2**bitLen - 1 bits) of the sequence,
+              identical to the bits yielded by mls(bitLen). Arrays are cached, so must not be modified.
+    
+    Each output bit of the shift register used by lfsr() is the XOR of the bits output
+    'tap' iterations earlier (the start state providing the bits before the first one).
+    Squaring the feedback polynomial (over GF(2)) spaces the taps twice as far apart,
+    so with taps spaced 'stride' times as far apart, a block of min(taps)*stride
+    bits only depends on earlier blocks and is computed at once.
+    """
+    taps = _mls_taps[bitLen]
+    period = 2**bitLen - 1
+    stride = 2**(bitLen//2)
+    
+    # bits output before the first one, as held by the start state of lfsr()
+    bits = np.zeros(bitLen + period, dtype=np.uint8)
+    bits[0] = 1
+    
+    # first bits, until the taps spaced stride times further apart can be used
+    head = min(bitLen + period, bitLen + max(taps)*stride)
+    headBits = [1] + [0]*(bitLen-1)
+    for k in range(bitLen, head):
+        newBit = 0
+        for i in taps:
+            newBit = newBit ^ headBits[k-i]
+        headBits.append(newBit)
+    bits[:head] = headBits
+    
+    blockLen = min(taps)*stride
+    for k in range(head, bitLen + period, blockLen):
+        end = min(k + blockLen, bitLen + period)
+        block = np.zeros(end - k, dtype=np.uint8)
+        for i in taps:
+            block ^= bits[k-i*stride:end-i*stride]
+        bits[k:end] = block
+    
+    bits = bits[bitLen:]
+    bits.setflags(write=False)
+    return bits
+
+
 def mls(bitLen, limitRepeats=1):
     """\
     Maximum length bit sequence generator.
@@ -120,6 +182,13 @@ def mls(bitLen, limitRepeats=1):
     
     :returns: Generator function that yields a bit at a time for the sequence.
     """
+    if np is not None:
+        # one period is computed (and cached) by mlsArray(), then repeated
+        bits = itertools.cycle(mlsArray(bitLen).tolist())
+        if limitRepeats is None:
+            return bits
+        return itertools.islice(bits, limitRepeats*(2**bitLen - 1))
+    
     if limitRepeats is None:
         return lfsr(bitLen, _mls_taps[bitLen], iterationLimit=None)
     else:
@@ -128,6 +197,53 @@ def mls(bitLen, limitRepeats=1):
 
 
 
+@lru_cache(maxsize=None)
+def mlsWindowIndex(bitLen):
+    """\
+    Index of the windows of bitLen consecutive bits of the maximum length bit sequence.
+    
+    :param bitLen: The number of bits in the shift register.
+    
+    :returns: A list where entry w is the position (in bits since the start of the sequence) of the window
+              whose bits, read as a binary number with the first bit as most significant bit, are w.
+              Entry 0 is None, as a window of only 0 bits never occurs. Indexes are cached, so must not be modified.
+    """
+    period = 2**bitLen - 1
+    bits = list(mls(bitLen))
+    bits = bits + bits[:bitLen-1]   # windows starting near the end of the sequence wrap around
+    
+    index = [None] * (period + 1)
+    mask = period
+    window = 0
+    for n, bit in enumerate(bits):
+        window = ((window << 1) | bit) & mask
+        if n >= bitLen-1:
+            index[window] = n - (bitLen-1)
+    return index
+
+
+def locateMlsWindows(bits, bitLen):
+    """\
+    Locates each window of bitLen consecutive bits of a bit stream within the maximum length bit sequence.
+    
+    :param bits: list of consecutive bit values (0s and 1s) observed
+    :param bitLen: The number of bits in the shift register.
+    
+    :returns: A list containing, for each window of bitLen bits (starting with the window starting at the first bit),
+              the position of the window in the sequence (in bits since the start of the sequence), or None when the
+              window does not occur in the sequence (i.e. bits were not decoded correctly)
+    """
+    index = mlsWindowIndex(bitLen)
+    mask = 2**bitLen - 1
+    positions = []
+    window = 0
+    for n, bit in enumerate(bits):
+        window = ((window << 1) | bit) & mask
+        if n >= bitLen-1:
+            positions.append(index[window])
+    return positions
+
+
 def encodeBitStreamAsPulseTimings(bitStream, bitInterval, bitZeroTimings, bitOneTimings):
     """\
     :param bitStream: iterable or list of bit values (0s and 1s)
@@ -153,6 +269,81 @@ def encodeBitStreamAsPulseTimings(bitStream, bitInterval, bitZeroTimings, bitOne
 
 
 
+def encodeBitStreamAsPulseTimingsArray(bits, bitInterval, bitZeroTimings, bitOneTimings, firstBitNum=0):
+    """\
+    Same as encodeBitStreamAsPulseTimings(), but computed with NumPy. Requires NumPy.
+    
+    :param bits: list or NumPy array of bit values (0s and 1s)
+    :param bitInterval: the spacing to be used between each bit
+    :param bitZeroTimings: a list of one or more timings for pulses used to represent a 0 bit
+    :param bitOneTimings: a list of one or more timings for pulses used to represent a 1 bit
+    :param firstBitNum: (default 0) the position of the first bit in the bit stream, to continue the timings of
+                        a previous call (the timings are identical to those for the whole bit stream at once)
+    
+    :return: A NumPy float64 array of the timings for pulses representing the encoded bits
+    """
+    bits = np.asarray(bits, dtype=bool)
+    
+    # timings of each bit value, padded to the same number of pulses (padding pulses are removed below)
+    numTimings = max(len(bitZeroTimings), len(bitOneTimings))
+    timingsTable = np.full((2, numTimings), np.nan)
+    timingsTable[0, :len(bitZeroTimings)] = bitZeroTimings
+    timingsTable[1, :len(bitOneTimings)] = bitOneTimings
+    
+    timings = timingsTable[bits.astype(np.intp)]
+    bitNums = np.arange(firstBitNum, firstBitNum + len(bits), dtype=np.int64)
+    pulseTimings = (bitNums * bitInterval)[:, np.newaxis] + timings
+    return pulseTimings[~np.isnan(timings)]
+
+
+
+def decodePulseTimingsAsBitStream(pulseTimings, bitInterval, bitZeroTimings, bitOneTimings, tolerance):
+    """\
+    Decodes timings of pulses (e.g. measured times of beeps or flashes) back into bits, reversing
+    encodeBitStreamAsPulseTimings(). The timings may have an unknown offset. The first pulse representing
+    a 0 and a 1 bit must have the same timing, it determines the start of each bit.
+    
+    :param pulseTimings: list of timings of pulses, in ascending order
+    :param bitInterval: the spacing used between each bit
+    :param bitZeroTimings: a list of one or more timings for pulses used to represent a 0 bit
+    :param bitOneTimings: a list of one or more timings for pulses used to represent a 1 bit
+    :param tolerance: maximum difference between the timing of a pulse and the timing it is expected to have
+    
+    :return: A list of runs of consecutive bits, as tuples (bits, bitStartTimings), where bits is a list of bit values
+             and bitStartTimings a list of the timing of the start of each bit (derived from its first pulse).
+             A new run starts wherever the pulses do not follow on from the previous bit (e.g. missed or spurious pulses).
+    """
+    if bitZeroTimings[0] != bitOneTimings[0]:
+        raise ValueError("The first pulse of a 0 bit and of a 1 bit must have the same timing")
+    
+    # the bit represented by more pulses is matched first, as the pulses of the other bit are then a subset of these
+    bitPatterns = sorted([(0, bitZeroTimings), (1, bitOneTimings)], key=lambda bitTimings: -len(bitTimings[1]))
+    
+    runs = []
+    bits = []
+    bitStartTimings = []
+    n = 0
+    while n < len(pulseTimings):
+        bitStart = pulseTimings[n] - bitZeroTimings[0]
+        for bit, timings in bitPatterns:
+            if n + len(timings) <= len(pulseTimings) and \
+                    all(abs(pulseTimings[n+i] - (bitStart + timing)) <= tolerance for i, timing in enumerate(timings)):
+                break
+        
+        if bits and abs(bitStart - (bitStartTimings[-1] + bitInterval)) > tolerance:
+            runs.append((bits, bitStartTimings))
+            bits = []
+            bitStartTimings = []
+        bits.append(bit)
+        bitStartTimings.append(bitStart)
+        n = n + len(timings)
+    
+    if bits:
+        runs.append((bits, bitStartTimings))
+    return runs
+
+
+
 def genSequenceFromSampleIndices(toneStartEndTimings, gapGenFactory, eventGenFactory):
     """\
     :param toneStartEndTimings: An list or iterable (e.g. generator) that provides a sequence of tuples (start,end) indicating when tone is to occur.
@@ -210,6 +401,28 @@ def genSequenceStartEnds(centreTimes, eventDuration, unitsPerSecond, sampleRate)
         yield (startSampleNum,endSampleNum)
         
 
+def genSequenceStartEndsArray(centreTimes, eventDuration, unitsPerSecond, sampleRate):
+    """\
+    Same as genSequenceStartEnds(), but computed with NumPy for a finite number of events. Requires NumPy.
+    
+    :param centreTimes: A list or NumPy array for the times (in whatever units) since beginning of the sequence corresponding to the middle of each beep.
+    :param eventDuration: The event duration (in units again)
+    :param unitsPerSecond: The units of the list of times (e.g. 1.0 = seconds, 10.0 = 10ths of a second)
+    :param sampleRate: The final sample rate we're aiming for.
+    
+    :returns: tuple (starts, ends) of NumPy int64 arrays, the start and end sample indices of each event.
+    """
+    halfEventDurationNumSamples = eventDuration / 2.0 / unitsPerSecond * sampleRate
+    
+    centreSampleNums = np.asarray(centreTimes, dtype=np.float64) / unitsPerSecond * sampleRate
+    
+    # np.round rounds half to even, as round() does
+    startSampleNums = np.round(centreSampleNums - halfEventDurationNumSamples).astype(np.int64)
+    endSampleNums   = np.round(centreSampleNums + halfEventDurationNumSamples).astype(np.int64)
+    
+    return startSampleNums, endSampleNums
+
+
 def calcNearestDurationForExactNumberOfCycles(idealDurationSecs, cycleHz):
     """\
     Calculate and return the nearest duration (in seconds) to a specified ideal
@@ -24,6 +24,10 @@ up a test sequence that can be used to measure synchronisation timing.
 
 Use ``--help`` for command line options.
 
+The beep audio samples, flash timings and metadata can also be generated
+in memory, without writing any files, by importing this module and calling
+genAvSyncSequence().
+
 The program also outputs a file containing a list of the timings of the
 beeps and flashes in a variety of units (seconds, milliseconds, frames, and
 PTS for MPEG transport stream).
@@ -42,18 +46,26 @@ beeps/flashes anywhere else in the sequence.
 
 """
 
-from eventTimingGen import mls, _mls_taps
-from eventTimingGen import encodeBitStreamAsPulseTimings
+from eventTimingGen import mls, mlsArray, _mls_taps
+from eventTimingGen import encodeBitStreamAsPulseTimings, encodeBitStreamAsPulseTimingsArray
 from eventTimingGen import calcNearestDurationForExactNumberOfCycles
 from eventTimingGen import genSequenceStartEnds
 from eventTimingGen import genSequenceFromSampleIndices
 from eventTimingGen import secsToTicks
 
-from audio import genBeepSequence, saveAsWavFile
-from video import genFlashSequence, genFrameImages, genSimpleFrameImages
+from audio import genBeepSampleRanges, genBeepSamples, genBeepSampleBlocks, saveBlocksAsWavFile
+from video import genFlashSequence, genFlashIntervals, genFrameImages, genSimpleFrameImages
 
+import itertools
 import re
 
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # timings for how we will generate pulses depending on framerates
 # each bit is represented by pulse(s). The first always occurs at the same
 # moment. the second is only present if it is a one bit. For a zero bit, there
@@ -98,6 +110,10 @@ fpsBitTimings = {
 flashNumDurationFrames = 3.0
 idealBeepDurationFrames = 3.0
 
+# beep tone frequency and peak amplitude (samples are 16 bit signed)
+toneHz = 3000
+amplitude = 32767*0.5
+
 
 def genEventCentreTimes(seqBits, fps):
     """\
@@ -115,6 +131,11 @@ def genEventCentreTimes(seqBits, fps):
 
     :returns: generator that yields a sequence of timings in units of seconds.
     """
+    if np is not None:
+        # the timings of each period of the sequence are computed once (see genEventTimeline()),
+        # and shared by all the users of the sequence (beeps, flashes, metadata)
+        return itertools.chain.from_iterable(genEventTimeline(seqBits, fps, repeat) for repeat in itertools.count())
+
     # decide what events (beeps or flashes) are going to be at what times
     # we generate a maximal length sequence (sequence of bits with no repeating patterns)
     bitStream = mls(bitLen=seqBits, limitRepeats=None)
@@ -130,6 +151,117 @@ def genEventCentreTimes(seqBits, fps):
 
 
 
+@lru_cache(maxsize=None)
+def genEventTimeline(seqBits, fps, repeat=0):
+    """\
+    Computes the times at which beeps/flashes occur during one period of the maximal-length sequence,
+    identical to the times yielded by genEventCentreTimes(). Requires NumPy.
+
+    Timelines are cached, so they are only computed once per maximal-length sequence size, frame rate and period.
+
+    :param seqBits: maximal-length sequence size in bits
+    :param fps: Frame rate in frames per second.
+    :param repeat: The period of the sequence (0 for the first period, starting at time 0)
+
+    :returns: tuple of timings in units of seconds.
+    """
+    bitInterval = 1.0
+    timings = encodeBitStreamAsPulseTimingsArray(mlsArray(seqBits), bitInterval, fpsBitTimings[fps][0], fpsBitTimings[fps][1],
+                                                 firstBitNum=repeat*(2**seqBits - 1))
+    return tuple(timings.tolist())
+
+
+def genMetadata(seqBitLen, fps, sequenceDurationSecs, pixelsSize):
+    """\
+    Generates the metadata describing the test sequence, including the timings of the beeps/flashes.
+
+    :param seqBitLen: maximal-length sequence size in bits
+    :param fps: Frame rate in frames per second.
+    :param sequenceDurationSecs: total sequence duration in seconds
+    :param pixelsSize: (width, height) dimensions in pixels of the video frame
+
+    :returns: dict containing the metadata, as written to the metadata JSON file
+    """
+    # obtain a generator that can yield a never ending stream of flash timings
+    eventCentreTimesSecs = genEventCentreTimes(seqBitLen, fps)
+
+    timings = []
+    for eventTime in eventCentreTimesSecs:
+
+        # check if we've reached the end, and exit the loop if we have
+        if eventTime >= sequenceDurationSecs:
+            break
+        else:
+            timings.append(eventTime)
+
+    return {
+        "size" : [ pixelsSize[0], pixelsSize[1] ],
+        "fps" : fps,
+        "durationSecs" : sequenceDurationSecs,
+        "patternWindowLength" : seqBitLen,
+        "eventCentreTimes" : timings,
+        "approxBeepDurationSecs" : idealBeepDurationFrames/fps,
+        "approxFlashDurationSecs" : flashNumDurationFrames/fps,
+    }
+
+
+def genAvSyncSequence(seqBitLen, fps, sequenceDurationSecs, sampleRateHz, pixelsSize=(1,1), blockSize=None, periodic=False):
+    """\
+    Generates the test sequence in memory: the beep audio samples, the frame intervals of the flashes and the metadata.
+    The results are identical to the WAV file, flash frames and metadata JSON file written when run from the command line.
+
+    :param seqBitLen: maximal-length sequence size in bits
+    :param fps: Frame rate in frames per second.
+    :param sequenceDurationSecs: total sequence duration in seconds
+    :param sampleRateHz: The audio sample rate in Hz
+    :param pixelsSize: (width, height) dimensions in pixels of the video frame, only used in the metadata
+    :param blockSize: If not None, the audio samples are generated lazily in blocks of blockSize samples
+                      (see genBeepSampleBlocks()) instead of all at once
+    :param periodic: If True, the audio samples only cover one period of the maximal-length sequence (2^n-1 seconds),
+                     to be looped. As the pattern repeats every period and each beep starts and ends within its
+                     bit interval, the looped samples match the samples of the whole sequence (to within one sample
+                     where the beep boundaries are rounded). The flashes and metadata still cover the whole sequence.
+
+    :returns: dict with "samples" (NumPy int16 array, or list when NumPy is not available, of 16 bit signed audio sample values,
+              or an iterator yielding blocks of these when blockSize is not None),
+              "flashIntervals" (list of (start,end) frame intervals during which a flash is shown, see genFlashIntervals())
+              and "metadata" (dict containing the metadata)
+    """
+    audioDurationSecs = 2**seqBitLen - 1 if periodic else sequenceDurationSecs
+    if blockSize is None:
+        samples = genBeepSamples(genEventCentreTimes(seqBitLen, fps), idealBeepDurationFrames/fps,
+                                 audioDurationSecs, sampleRateHz, toneHz, amplitude)
+    else:
+        samples = genBeepSampleBlocks(genEventCentreTimes(seqBitLen, fps), idealBeepDurationFrames/fps,
+                                      audioDurationSecs, sampleRateHz, toneHz, amplitude, blockSize)
+    flashIntervals = genFlashIntervals(genEventCentreTimes(seqBitLen, fps), flashNumDurationFrames/fps,
+                                       sequenceDurationSecs, fps)
+    return {
+        "samples" : samples,
+        "flashIntervals" : flashIntervals,
+        "metadata" : genMetadata(seqBitLen, fps, sequenceDurationSecs, pixelsSize),
+    }
+
+
+def genBeepRanges(seqBitLen, fps, sequenceDurationSecs, sampleRateHz, periodic=False):
+    """\
+    Computes the sample ranges of the beeps of the test sequence, e.g. to synthesize them elsewhere. Requires NumPy.
+
+    :param seqBitLen: maximal-length sequence size in bits
+    :param fps: Frame rate in frames per second.
+    :param sequenceDurationSecs: total sequence duration in seconds
+    :param sampleRateHz: The audio sample rate in Hz
+    :param periodic: If True, only the beeps of one period of the maximal-length sequence (see genAvSyncSequence())
+
+    :returns: list of tuples (start,end) in ascending order, where 'start' is the index of the first sample of a beep
+              and 'end' the index of the first sample after the beep. The tone starts at phase 0 at the start of each beep.
+    """
+    audioDurationSecs = 2**seqBitLen - 1 if periodic else sequenceDurationSecs
+    startSampleNums, endSampleNums, burst, nSamples = genBeepSampleRanges(
+        genEventCentreTimes(seqBitLen, fps), idealBeepDurationFrames/fps, audioDurationSecs, sampleRateHz, toneHz, amplitude)
+    return [(start, end) for start, end in zip(startSampleNums.tolist(), endSampleNums.tolist()) if end > start]
+
+
 def parseSizeArg(arg):
     match = re.match(r"^([1-9][0-9]*)x([1-9][0-9]*)$", arg)
     if not match:
@@ -354,8 +486,6 @@ if __name__ == "__main__":
     # FIRST generate a WAV file containing audio with beeps of a fixed duration
     # with the centre of each beep corresponding to the time of the event
 
-    toneHz = 3000
-    amplitude = 32767*0.5
     idealBeepDurationSecs = idealBeepDurationFrames/fps
 
     if audioFilename is not None:
@@ -364,7 +494,7 @@ if __name__ == "__main__":
 
         # now we resolve that into an actual stream of sample data...
 
-        # the genBeepSequence() generator converts the sequence of event times into
+        # genBeepSampleBlocks() converts the sequence of event times into
         # start and end times for the beep
         # corresponding to each event and also converts to audio sample data
 
@@ -373,10 +503,10 @@ if __name__ == "__main__":
         # tone sine wave to make it really nice and clean and symmetrical
 
         print("Generating audio...")
-        seqIter = genBeepSequence(eventCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude)
+        seqIter = genBeepSampleBlocks(eventCentreTimesSecs, idealBeepDurationSecs, sequenceDurationSecs, sampleRateHz, toneHz, amplitude)
 
         print("Saving audio...")
-        saveAsWavFile(seqIter, audioFilename, sampleRateHz)
+        saveBlocksAsWavFile(seqIter, audioFilename, sampleRateHz)
     else:
         print("NOT generating audio (no filename provided)")
 
@@ -451,30 +581,7 @@ if __name__ == "__main__":
     if metadataFilename is not None:
         print("Generating and writing metadata...")
 
-        # obtain a generator that can yield a never ending stream of flash timings
-        eventCentreTimesSecs = genEventCentreTimes(seqBitLen, fps)
-
-        timings = []
-        for eventTime in eventCentreTimesSecs:
-
-            # check if we've reached the end, and exit the loop if we have
-            if eventTime >= sequenceDurationSecs:
-                break
-            else:
-                timings.append(eventTime)
-
-
-
-        # assemble the metadata into a structure and write out as JSON file
-        metadata = {
-            "size" : [ pixelsSize[0], pixelsSize[1] ],
-            "fps" : fps,
-            "durationSecs" : sequenceDurationSecs,
-            "patternWindowLength" : seqBitLen,
-            "eventCentreTimes" : timings,
-            "approxBeepDurationSecs" : idealBeepDurationSecs,
-            "approxFlashDurationSecs" : idealFlashDurationSecs,
-        }
+        metadata = genMetadata(seqBitLen, fps, sequenceDurationSecs, pixelsSize)
 
         f=open(metadataFilename, "w")
         json.dump(metadata,f)
@@ -18,9 +18,14 @@
 
 import itertools
 import math
+import os
+import re
 import struct
 import sys
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 from eventTimingGen import calcNearestDurationForExactNumberOfCycles
 from eventTimingGen import genSequenceStartEnds
 from eventTimingGen import secsToTicks
@@ -74,6 +79,40 @@ def genFlashSequence(flashCentreTimesSecs, idealFlashDurationSecs, sequenceDurat
     return itertools.islice(seqIter, 0, nSamples)
 
 
+def genFlashIntervals(flashCentreTimesSecs, idealFlashDurationSecs, sequenceDurationSecs, frameRate):
+    """\
+    Generates the frame intervals during which a flash is shown, matching the frames genFlashSequence() renders as flash.
+
+    :param flashCentreTimesSecs: A list or iterable of the centre times of each flash (in seconds since the beginning of the sequence)
+    :param idealFlashDurationSecs: ideal duration of a flash in seconds
+    :param sequenceDurationSecs: total sequence duration in seconds
+    :param frameRate: The frame rate in Hz
+
+    :returns: A list of tuples (start,end) in ascending order, where 'start' is the index of the first flash frame
+              and 'end' the index of the first frame after the flash. Consecutive flashes are merged into one interval.
+    """
+    flashDurationSamples = calcNearestDurationForExactNumberOfCycles(idealFlashDurationSecs, frameRate)
+
+    flashStartEndSamples = genSequenceStartEnds(flashCentreTimesSecs, flashDurationSamples, 1.0, frameRate)
+
+    nSamples = math.ceil(sequenceDurationSecs * frameRate)
+
+    intervals = []
+    n=0
+    for (startIndex, endIndex) in flashStartEndSamples:
+        if startIndex >= nSamples:
+            break
+        startIndex = max(startIndex, n)
+        endIndex = min(endIndex, nSamples)
+        if endIndex > startIndex:
+            if intervals and intervals[-1][1] == startIndex:
+                intervals[-1] = (intervals[-1][0], endIndex)
+            else:
+                intervals.append((startIndex, endIndex))
+            n = endIndex
+    return intervals
+
+
 
 
 
@@ -206,89 +245,190 @@ def precise_filled_pieslice(draw, xy, start, end, *options, **kwoptions):
         draw.polygon([centre, p1, p2, centre], *options, **kwoptions)
 
 
-def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrain, numFrames, FPS, superSamplingScale=8, BG_COLOUR=(0,0,0), TEXT_COLOUR=(255,255,255), GFX_COLOUR=(255,255,255), title="", TITLE_COLOUR=(255,255,255), FRAMES_AS_FIELDS=False, frameSkipChecker=None, segments=[]):
+class TranslatedCoordinateScaler(AspectPreservingCoordinateScaler):
     """\
-    Generator that yields PIL Image objects representing video frames, one at a time
-
-    :param (widthPixels, heightPixels): desired dimensions (in pixels) of the image as a tuple
-    :param flashColourGen: a list or iterable (e.g. generator) that returns the colour to use for the flashing box
-    :param flashCOlourGen: a list or iterable (e.g. generator) that returns the colour to use for the pip train
-    :param numFrames: the number of frames to create
-    :param FPS: the frame rate
-    :param superSamplingScale: Scale factor used to achieve anti-aliasing. e.g. 8 means the image will be drawn x8 too large then scaled down by a factor of 8 to smooth it before it is yielded
-    :param BG_COLOUR: background colour as (r,g,b) tuple
-    :param TEXT_COLOUR: text label colour as (r,g,b) tuple
-    :param GFX_COLOUR: colour for graphical indicators (except the pips) as (r,g,b) tuple
-    :param title: title text label
-    :param TITLE_COLOUR: colour for the title text as (r,g,b) tuple
-    :param FRAMES_AS_FIELDS: false if frames will be used as frames. True if outputted frames will be encoded as fields.
-    :param frameSkipChecker: None or a function that takes the frame number as input and returns True if the frame should not be generated (in which case None will be yielded in place of a frame image)
-    :param segments: Array of dict structures describing segments with labels and descriptions. Each entry has following key/value pairs: "label":string label shown on the pie. "startSecs":number of seconds (including fractions) at which segment begins. "description":string - descriptive string given for the segment
-    :returns: Generator that yields a PIL.Image object for every frame in sequence
+    Same as AspectPreservingCoordinateScaler, but coordinates are relative to
+    a given (x,y) origin in the output bounding box (e.g. the top left corner of
+    a region being drawn separately). The translated coordinates are exactly the
+    untranslated ones minus the origin.
     """
-    (widthPixels, heightPixels) = widthHeightPixelsTuple
-    width = widthPixels * superSamplingScale
-    height = heightPixels * superSamplingScale
 
-    flashCols = list(flashColourGen)[0:numFrames]
-    flashColsPipTrain = list(flashColourGenPipTrain)[0:numFrames]
+    def __init__(self, inputWidthHeightTuple, outputWidthHeightTuple, originTuple):
+        super(TranslatedCoordinateScaler,self).__init__(inputWidthHeightTuple, outputWidthHeightTuple)
+        self.origin = originTuple
 
-    # we'll pretend we're working within a rectangle (0,0) - (160,90)
-    # and use a scaling function to map to out actual dimensions
-    scaler = AspectPreservingCoordinateScaler((160,90),(width,height))
+    def xy(self, xyCoordinatesTuple):
+        """Translate (x,y) coordinate"""
+        (x,y) = super(TranslatedCoordinateScaler,self).xy(xyCoordinatesTuple)
+        return (x - self.origin[0], y - self.origin[1])
 
-    # load a font for text
-    font = loadFont(sizePt = scaler.s(4))
-    smallfont = loadFont(sizePt = scaler.s(4))
-    
-    # work out the segment description text, then check its size and adjust the fontsize to ensure it fits within bounding area
-    if segments:
-        segment_description_text = "\n".join([seg["description"] for seg in segments])
-        tmpimg = Image.new("RGB", (width, height), color=BG_COLOUR)
-        tmpdraw = ImageDraw.Draw(tmpimg)
-        w,h = tmpdraw.multiline_textsize(segment_description_text, font=smallfont)
-        max_w, max_h = scaler.xy((140,13))
-        
-        shrink_factor = min(float(max_w) / w, float(max_h) / h, 1)
-        smallfont = loadFont(sizePt = scaler.s(4*shrink_factor))
-    
-    poy = 0 # pie Y offset
-    dfy = 65 # duration and FPS labels Y offset
-    if segments:
-        poy = -10
-        dfy = 19
 
+def textSize(font, text):
+    """\
+    :returns: (width,height) of text drawn with font, including the offset of the text
+    """
+    if hasattr(font, "getbbox"):
+        left, top, right, bottom = font.getbbox(text)
+        return right, bottom
+    return font.getsize(text)   # Pillow < 8.0
 
 
-    WHITE=(255,255,255)
-    BLACK=(0,0,0)
+class FrameRenderer(object):
+    """\
+    Renders the video frames of genFrameImages().
 
-    if FRAMES_AS_FIELDS:
-        imageName = "field"
-        labelFps = FPS / 2
-    else:
-        imageName = "frame"
-        labelFps = FPS
+    Most of a frame is static, so a frame is rendered once in full (drawn
+    superSamplingScale times too large then downsampled), and only the regions
+    containing the time-varying elements (timecode and frame number labels,
+    flashing box, pies and pip train) are drawn and downsampled again for each
+    frame, then pasted over that static frame.
 
+    A region is drawn with some surrounding pixels, so the downsampling filter has
+    the same input as for the whole frame. The region is drawn by replaying all
+    drawing operations with coordinates translated by a whole number of pixels,
+    so frames are identical to frames rendered in full.
 
-    for frameNum in range(0,numFrames):
-        if frameSkipChecker is not None:
-            shouldSkip=frameSkipChecker(frameNum)
-            if shouldSkip:
-                yield None
-                continue
+    The flashing box only has two states, so it is only rendered once per flash colour.
+    """
+
+    # margin around a region (in pixels of the downsampled frame) that is replaced on each frame,
+    # as the downsampling filter spreads the time-varying elements beyond their region
+    regionMargin = 4
+    
+    # margin around the replaced area (in pixels of the downsampled frame) that is drawn,
+    # at least the support of the downsampling filter (3 pixels for Lanczos)
+    filterMargin = 4
+
+    def __init__(self, widthHeightPixelsTuple, flashCols, flashColsPipTrain, numFrames, FPS, superSamplingScale=8, BG_COLOUR=(0,0,0), TEXT_COLOUR=(255,255,255), GFX_COLOUR=(255,255,255), title="", TITLE_COLOUR=(255,255,255), FRAMES_AS_FIELDS=False, segments=[]):
+        super(FrameRenderer,self).__init__()
+
+        (self.widthPixels, self.heightPixels) = widthHeightPixelsTuple
+        self.superSamplingScale = superSamplingScale
+        self.width = self.widthPixels * superSamplingScale
+        self.height = self.heightPixels * superSamplingScale
+
+        self.flashCols = flashCols
+        self.flashColsPipTrain = flashColsPipTrain
+        self.numFrames = numFrames
+        self.FPS = FPS
+        self.BG_COLOUR = BG_COLOUR
+        self.TEXT_COLOUR = TEXT_COLOUR
+        self.GFX_COLOUR = GFX_COLOUR
+        self.title = title
+        self.TITLE_COLOUR = TITLE_COLOUR
+        self.FRAMES_AS_FIELDS = FRAMES_AS_FIELDS
+        self.segments = segments
+
+        # we'll pretend we're working within a rectangle (0,0) - (160,90)
+        # and use a scaling function to map to out actual dimensions
+        self.scaler = AspectPreservingCoordinateScaler((160,90),(self.width,self.height))
+
+        # load a font for text
+        self.font = loadFont(sizePt = self.scaler.s(4))
+        self.smallfont = loadFont(sizePt = self.scaler.s(4))
+
+        # work out the segment description text, then check its size and adjust the fontsize to ensure it fits within bounding area
+        if segments:
+            self.segment_description_text = "\n".join([seg["description"] for seg in segments])
+            tmpimg = Image.new("RGB", (self.width, self.height), color=BG_COLOUR)
+            tmpdraw = ImageDraw.Draw(tmpimg)
+            if hasattr(tmpdraw, "multiline_textbbox"):
+                w,h = tmpdraw.multiline_textbbox((0,0), self.segment_description_text, font=self.smallfont)[2:]
+            else:
+                w,h = tmpdraw.multiline_textsize(self.segment_description_text, font=self.smallfont)   # Pillow < 8.0
+            max_w, max_h = self.scaler.xy((140,13))
+
+            shrink_factor = min(float(max_w) / w, float(max_h) / h, 1)
+            self.smallfont = loadFont(sizePt = self.scaler.s(4*shrink_factor))
+
+        self.poy = 0 # pie Y offset
+        self.dfy = 65 # duration and FPS labels Y offset
+        if segments:
+            self.poy = -10
+            self.dfy = 19
+
+        if FRAMES_AS_FIELDS:
+            self.imageName = "field"
+            self.labelFps = FPS / 2
+        else:
+            self.imageName = "frame"
+            self.labelFps = FPS
 
-        timecode = frameNumToTimecode(frameNum, FPS, framesAreFields=FRAMES_AS_FIELDS)
+        # shrink the image using high quality downsampling
+        try:
+            self.scalingMode = Image.LANCZOS
+        except AttributeError:
+            self.scalingMode = Image.BICUBIC
+
+        # regions containing the time-varying elements, in the (0,0) - (160,90) coordinates,
+        # with None or a function returning the state the content of the region depends on for a given frame number
+        # (regions are then only rendered once per state)
+        labelsWidth, labelsHeight = self.maxLabelsSize()
+        dynamicRegions = [
+            ((9, 3, 11 + labelsWidth, 15 + labelsHeight), None),                          # timecode and frame number labels
+            ((9, 29, 41, 61), lambda frameNum: self.flashCols[frameNum]),                 # flashing box
+            ((104, 19+self.poy, 156, 71+self.poy), None),                                 # pies
+            ((4, 79, 156, 86), None),                                                     # pips of the pip train
+        ]
+
+        # areas (in pixels of the downsampled frame) replaced on each frame, and the areas drawn for them
+        # (the drawn areas start on even pixels, so coordinates are translated by an even number of pixels
+        # and fractional coordinates are rounded in the same way)
+        outputScaler = AspectPreservingCoordinateScaler((160,90),(self.widthPixels,self.heightPixels))
+        self.regions = []
+        for (x1, y1, x2, y2), regionState in dynamicRegions:
+            (left, top) = outputScaler.xy((x1, y1))
+            (right, bottom) = outputScaler.xy((x2, y2))
+            pasteBox = (max(0, left - self.regionMargin), max(0, top - self.regionMargin),
+                        min(self.widthPixels, right + 1 + self.regionMargin), min(self.heightPixels, bottom + 1 + self.regionMargin))
+            drawBox = (max(0, (pasteBox[0] - self.filterMargin) & ~1), max(0, (pasteBox[1] - self.filterMargin) & ~1),
+                       min(self.widthPixels, pasteBox[2] + self.filterMargin), min(self.heightPixels, pasteBox[3] + self.filterMargin))
+            self.regions.append((pasteBox, drawBox, regionState, {}))
+
+        self.staticFrame = None
+
+    def maxLabelsSize(self):
+        """\
+        :returns: (width,height) in the (0,0) - (160,90) coordinates of the largest timecode and frame number labels
+        """
+        lastFrameNum = max(0, self.numFrames - 1)
+        labels = [
+            frameNumToTimecode(lastFrameNum, self.FPS, framesAreFields=self.FRAMES_AS_FIELDS),
+            "%06d of %d %ss" % (lastFrameNum, self.numFrames, self.imageName),
+            "%08.3f \u2264 t < %08.3f secs" % (float(lastFrameNum) / self.FPS, float(lastFrameNum+1) / self.FPS),
+        ]
+        # digits are replaced by each digit in turn, in case digits do not all have the same width
+        sizes = [textSize(self.font, re.sub("[0-9]", digit, label)) for label in labels for digit in "0123456789"]
+        return max(w for w,h in sizes) / self.scaler.scale, max(h for w,h in sizes) / self.scaler.scale
+
+    def drawFrame(self, draw, scaler, frameNum):
+        """\
+        Draws all the elements of a frame.
+
+        :param draw: PIL ImageDraw object to draw with
+        :param scaler: coordinate scaler mapping the (0,0) - (160,90) coordinates to the image drawn on
+        :param frameNum: the frame number
+        """
+        FPS = self.FPS
+        numFrames = self.numFrames
+        font = self.font
+        poy = self.poy
+        dfy = self.dfy
+        segments = self.segments
+        BG_COLOUR = self.BG_COLOUR
+        TEXT_COLOUR = self.TEXT_COLOUR
+        GFX_COLOUR = self.GFX_COLOUR
+
+        WHITE=(255,255,255)
+        BLACK=(0,0,0)
+
+        timecode = frameNumToTimecode(frameNum, FPS, framesAreFields=self.FRAMES_AS_FIELDS)
         timeSecs = float(frameNum) / FPS
         nextTimeSecs = float(frameNum+1) / FPS  # time of next frame after this
         durationTimecode = frameNumToTimecode(numFrames, FPS)
 
-        # create black image and an object to let us draw on it
-        img = Image.new("RGB", (width, height), color=BG_COLOUR)
-        draw = ImageDraw.Draw(img)
-
         # draw a flashing rectangular box on the left side
-        flashColour = flashCols[frameNum]
+        flashColour = self.flashCols[frameNum]
         topLeft     = scaler.xy((10, 30))
         bottomRight = scaler.xy((40, 60))
         draw.rectangle(topLeft + bottomRight, outline=None, fill=GFX_COLOUR)
@@ -308,21 +448,21 @@ def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrai
         topLeft = scaler.xy((10, 4))
         draw.text(topLeft, timecode, font=font, fill=TEXT_COLOUR)
         topLeft = scaler.xy((10, 9))
-        draw.text(topLeft, "%06d of %d %ss" % (frameNum, numFrames, imageName), font=font, fill=TEXT_COLOUR)
+        draw.text(topLeft, "%06d of %d %ss" % (frameNum, numFrames, self.imageName), font=font, fill=TEXT_COLOUR)
         topLeft = scaler.xy((10, 14))
         draw.text(topLeft, "%08.3f \u2264 t < %08.3f secs" % (timeSecs, nextTimeSecs), font=font, fill=TEXT_COLOUR)
 
         topLeft = scaler.xy((10,dfy))
         draw.text(topLeft, "Duration: " + durationTimecode, font=font, fill=TEXT_COLOUR)
         topLeft = scaler.xy((10,dfy+5))
-        draw.text(topLeft, "%d fps" % labelFps, font=font, fill=TEXT_COLOUR)
+        draw.text(topLeft, "%d fps" % self.labelFps, font=font, fill=TEXT_COLOUR)
 
         # and more text labels, but this time right justified
-        text = title
-        w,h = font.getsize(text)
+        text = self.title
+        w,h = textSize(font, text)
         topLeft = scaler.xy((150,4))
         topLeft = topLeft[0] - w, topLeft[1]
-        draw.text(topLeft, text, font=font, fill=TITLE_COLOUR)
+        draw.text(topLeft, text, font=font, fill=self.TITLE_COLOUR)
 
         # draw an outer ring segment indicating the time period covered by the current frame
         topLeft = scaler.xy((105, 20+poy))
@@ -379,14 +519,14 @@ def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrai
                 if nextStartFrame <= segStartFrame:
                     nextStartFrame += numFrames
                 midAngle = math.radians(270 + 360.0* (segStartFrame+nextStartFrame)/2/numFrames)
-                w,h = font.getsize(segments[i]["label"])
+                w,h = textSize(font, segments[i]["label"])
                 centre = scaler.xy((130 + 15*math.cos(midAngle)*0.7, 45+poy + 15*math.sin(midAngle)*0.7))
                 topLeft = centre[0] - w/2, centre[1] - h/2
                 draw.text(topLeft, segments[i]["label"], fill=WHITE, font=font)
 
             # draw segment long labels
             topLeft = scaler.xy((10,61))
-            draw.multiline_text(topLeft, segment_description_text, fill=WHITE, font=smallfont)
+            draw.multiline_text(topLeft, self.segment_description_text, fill=WHITE, font=self.smallfont)
         
         # draw pulse train at the bottom
         LIM=FPS
@@ -402,7 +542,7 @@ def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrai
 
             seqIndex = offset + frameNum
             if seqIndex >= 0 and seqIndex < numFrames:
-                colour = flashColsPipTrain[seqIndex]
+                colour = self.flashColsPipTrain[seqIndex]
                 draw.rectangle(topLeft + bottomRight, outline=None, fill = colour)
 
             if offset == 0:
@@ -416,15 +556,122 @@ def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrai
                 bottomRight = scaler.xy(( right, 90 ))
                 draw.rectangle(topLeft + bottomRight, outline=None, fill = GFX_COLOUR)
 
-        # shrink the image using high quality downsampling
-        try:
-            scalingMode = Image.LANCZOS
-        except AttributeError:
-            scalingMode = Image.BICUBIC
+    def renderFullFrame(self, frameNum):
+        """\
+        Renders a frame in full (without using the static frame).
+
+        :returns: PIL.Image object
+        """
+        # create black image and an object to let us draw on it
+        img = Image.new("RGB", (self.width, self.height), color=self.BG_COLOUR)
+        self.drawFrame(ImageDraw.Draw(img), self.scaler, frameNum)
+        return img.resize((self.widthPixels,self.heightPixels), self.scalingMode)
+
+    def renderFrame(self, frameNum):
+        """\
+        Renders a frame, only drawing the regions containing the time-varying elements.
+
+        :returns: PIL.Image object
+        """
+        if self.staticFrame is None:
+            self.staticFrame = self.renderFullFrame(frameNum)
+            return self.staticFrame.copy()
+
+        frame = self.staticFrame.copy()
+        s = self.superSamplingScale
+        for (pasteBox, drawBox, regionState, renderedRegions) in self.regions:
+            state = regionState(frameNum) if regionState is not None else None
+            region = renderedRegions.get(state) if regionState is not None else None
+            if region is None:
+                origin = (drawBox[0]*s, drawBox[1]*s)
+                scaler = TranslatedCoordinateScaler((160,90), (self.width,self.height), origin)
+                img = Image.new("RGB", ((drawBox[2]-drawBox[0])*s, (drawBox[3]-drawBox[1])*s), color=self.BG_COLOUR)
+                self.drawFrame(ImageDraw.Draw(img), scaler, frameNum)
+                region = img.resize((drawBox[2]-drawBox[0], drawBox[3]-drawBox[1]), self.scalingMode)
+                region = region.crop((pasteBox[0]-drawBox[0], pasteBox[1]-drawBox[1], pasteBox[2]-drawBox[0], pasteBox[3]-drawBox[1]))
+                if regionState is not None:
+                    renderedRegions[state] = region
+            frame.paste(region, pasteBox[0:2])
+        return frame
+
+
+# frame renderer of a worker process of genFrameImages()
+workerFrameRenderer = None
+
+def initFrameRendererWorker(*args, **kwargs):
+    global workerFrameRenderer
+    workerFrameRenderer = FrameRenderer(*args, **kwargs)
+
+def renderFramesInWorker(frameNums):
+    return [workerFrameRenderer.renderFrame(frameNum) for frameNum in frameNums]
+
+
+def genFrameImages(widthHeightPixelsTuple, flashColourGen, flashColourGenPipTrain, numFrames, FPS, superSamplingScale=8, BG_COLOUR=(0,0,0), TEXT_COLOUR=(255,255,255), GFX_COLOUR=(255,255,255), title="", TITLE_COLOUR=(255,255,255), FRAMES_AS_FIELDS=False, frameSkipChecker=None, segments=[], workers=None, batchSize=25):
+    """\
+    Generator that yields PIL Image objects representing video frames, one at a time
 
-        rescaledImage = img.resize((widthPixels,heightPixels), scalingMode)
+    Frames are rendered by a FrameRenderer, in a pool of worker processes when there is more than one worker.
+    Frames are yielded in order, and the number of frames rendered in advance is limited.
 
-        yield rescaledImage
+    :param (widthPixels, heightPixels): desired dimensions (in pixels) of the image as a tuple
+    :param flashColourGen: a list or iterable (e.g. generator) that returns the colour to use for the flashing box
+    :param flashCOlourGen: a list or iterable (e.g. generator) that returns the colour to use for the pip train
+    :param numFrames: the number of frames to create
+    :param FPS: the frame rate
+    :param superSamplingScale: Scale factor used to achieve anti-aliasing. e.g. 8 means the image will be drawn x8 too large then scaled down by a factor of 8 to smooth it before it is yielded
+    :param BG_COLOUR: background colour as (r,g,b) tuple
+    :param TEXT_COLOUR: text label colour as (r,g,b) tuple
+    :param GFX_COLOUR: colour for graphical indicators (except the pips) as (r,g,b) tuple
+    :param title: title text label
+    :param TITLE_COLOUR: colour for the title text as (r,g,b) tuple
+    :param FRAMES_AS_FIELDS: false if frames will be used as frames. True if outputted frames will be encoded as fields.
+    :param frameSkipChecker: None or a function that takes the frame number as input and returns True if the frame should not be generated (in which case None will be yielded in place of a frame image)
+    :param segments: Array of dict structures describing segments with labels and descriptions. Each entry has following key/value pairs: "label":string label shown on the pie. "startSecs":number of seconds (including fractions) at which segment begins. "description":string - descriptive string given for the segment
+    :param workers: number of worker processes rendering frames, or None for the number of CPUs
+    :param batchSize: number of frames rendered at a time by a worker process
+    :returns: Generator that yields a PIL.Image object for every frame in sequence
+    """
+    flashCols = list(flashColourGen)[0:numFrames]
+    flashColsPipTrain = list(flashColourGenPipTrain)[0:numFrames]
+
+    rendererArgs = (widthHeightPixelsTuple, flashCols, flashColsPipTrain, numFrames, FPS, superSamplingScale,
+                    BG_COLOUR, TEXT_COLOUR, GFX_COLOUR, title, TITLE_COLOUR, FRAMES_AS_FIELDS, segments)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # frames that are skipped are not rendered
+    frameNums = range(0,numFrames)
+    if frameSkipChecker is not None:
+        skipped = set(frameNum for frameNum in frameNums if frameSkipChecker(frameNum))
+    else:
+        skipped = set()
+    batches = [frameNums[i:i+batchSize] for i in range(0, numFrames, batchSize)]
+
+    def yieldBatch(batch, frames):
+        frames = iter(frames)
+        for frameNum in batch:
+            if frameNum in skipped:
+                yield None
+            else:
+                yield next(frames)
+
+    if workers <= 1:
+        renderer = FrameRenderer(*rendererArgs)
+        for batch in batches:
+            yield from yieldBatch(batch, (renderer.renderFrame(frameNum) for frameNum in batch if frameNum not in skipped))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initFrameRendererWorker, initargs=rendererArgs) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, executor.submit(renderFramesInWorker, [frameNum for frameNum in batch if frameNum not in skipped])))
+            if len(pending) >= 2*workers:
+                batch, future = pending.popleft()
+                yield from yieldBatch(batch, future.result())
+        while pending:
+            batch, future = pending.popleft()
+            yield from yieldBatch(batch, future.result())
 
 
 def genSimpleFrameImages(widthHeightPixelsTuple, flashColourGen, numFrames, BG_COLOUR=(0,0,0), frameSkipChecker=None):